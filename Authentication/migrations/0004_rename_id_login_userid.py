@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:29
+
+# The Login model already named its primary key userId while the migrations
+# still created an "id" column, so existing databases may have either one.
+# The state always gets the rename; the database only where the column is
+# still called "id", so the migration applies without --fake on both.
+
+from django.db import migrations, models
+
+
+def login_columns(schema_editor, state):
+    Login = state.apps.get_model('Authentication', 'Login')
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        return {column.name for column in connection.introspection.get_table_description(cursor, Login._meta.db_table)}
+
+
+class RenameLoginColumn(migrations.SeparateDatabaseAndState):
+    """
+    Runs its database operations only while the Login table still has the
+    column they rename from ("id" forwards, "userId" backwards).
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        columns = login_columns(schema_editor, from_state)
+        if 'id' in columns and 'userId' not in columns:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        columns = login_columns(schema_editor, from_state)
+        if 'userId' in columns and 'id' not in columns:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def rename_operations():
+    return [
+        migrations.RenameField(
+            model_name='login',
+            old_name='id',
+            new_name='userId',
+        ),
+        migrations.AlterField(
+            model_name='login',
+            name='userId',
+            field=models.AutoField(primary_key=True, serialize=False),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Authentication', '0003_login_last_login_alter_login_username'),
+    ]
+
+    operations = [
+        RenameLoginColumn(database_operations=rename_operations(), state_operations=rename_operations()),
+    ]
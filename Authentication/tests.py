@@ -1,3 +1,64 @@
 from django.test import TestCase
 
-# Create your tests here.
+from IDS_GraphQL.testing import QueryCountMixin
+
+from .models import Login
+from .schema import login_schema
+
+PASSWORD = 'secret-password'
+
+
+# Each operation runs against both user tables; its query count must not change
+class LoginQueryCountTests(QueryCountMixin, TestCase):
+    sizes = (5, 50)
+
+    def seed(self, size):
+        Login.objects.all().delete()
+        self.user = Login.objects.create_user(
+            'tester', phone_num='1000000000', email='tester@example.com', password=PASSWORD,
+            designation='QA', location='Local', business_unit='IDS', role='admin', status='active',
+        )
+        Login.objects.bulk_create([
+            Login(
+                username=f'user{i}', phone_num=f'2{i:09d}', email=f'user{i}@example.com', password=self.user.password,
+                designation='Picker', location='Local', business_unit='IDS', role='user', status='active',
+            )
+            for i in range(size)
+        ])
+
+    def get_user(self):
+        return self.user
+
+    def other_user_pk(self):
+        return Login.objects.exclude(pk=self.user.pk).order_by('pk').values_list('pk', flat=True).first()
+
+    def test_all_logins(self):
+        self.assertConstantQueries(login_schema, '{ allLogins { userId username email role status lastLogin } }')
+
+    def test_login(self):
+        self.assertConstantQueries(
+            login_schema,
+            'mutation ($password: String!) { login(username: "tester", password: $password) { success token login { username } } }',
+            {'password': PASSWORD},
+        )
+
+    def test_create_login(self):
+        self.assertConstantQueries(
+            login_schema,
+            'mutation { createLogin(username: "new", phoneNum: "3000000000", designation: "D", location: "L", '
+            'businessUnit: "B", role: "user", email: "new@example.com", status: true, password: "pw") { login { userId } } }',
+        )
+
+    def test_update_login(self):
+        self.assertConstantQueries(
+            login_schema,
+            'mutation ($id: String!) { updateLogin(userId: $id, role: "manager") { login { username role } } }',
+            lambda: {'id': str(self.other_user_pk())},
+        )
+
+    def test_delete_login(self):
+        self.assertConstantQueries(
+            login_schema,
+            'mutation ($id: String!) { deleteLogin(userId: $id) { success } }',
+            lambda: {'id': str(self.other_user_pk())},
+        )
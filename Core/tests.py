@@ -1,3 +1,55 @@
 from django.test import TestCase
 
-# Create your tests here.
+from Authentication.models import Login
+from IDS_GraphQL.testing import QueryCountMixin
+
+from .models import IDSProductDetails
+from .schema import productdetails_schema
+
+
+# Each operation runs against both product tables; its query count must not change
+class ProductDetailsQueryCountTests(QueryCountMixin, TestCase):
+    sizes = (5, 50)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Login.objects.create_user(
+            'tester', phone_num='1000000000', email='tester@example.com', password='secret-password',
+            designation='QA', location='Local', business_unit='IDS', role='admin', status='active',
+        )
+
+    def seed(self, size):
+        IDSProductDetails.objects.all().delete()
+        IDSProductDetails.objects.bulk_create([
+            IDSProductDetails(
+                productId=f'P{i:05d}', category='Fasteners', item=f'Item {i}', description=f'Item {i}',
+                units='pcs', thresholdValue=10, images=[f'https://example.com/{i}.png'],
+            )
+            for i in range(size)
+        ])
+
+    def get_user(self):
+        return self.user
+
+    def test_all_products(self):
+        self.assertConstantQueries(
+            productdetails_schema, '{ allProducts { productId category item description units thresholdValue images } }'
+        )
+
+    def test_product(self):
+        self.assertConstantQueries(productdetails_schema, '{ product(id: "P00000") { productId item units } }')
+
+    def test_create_product(self):
+        self.assertConstantQueries(
+            productdetails_schema,
+            'mutation { createProduct(productId: "NEW", category: "C", item: "I", description: "D", units: "pcs", thresholdValue: 1, images: ["a.png"]) '
+            '{ product { productId } } }',
+        )
+
+    def test_update_product(self):
+        self.assertConstantQueries(
+            productdetails_schema, 'mutation { updateProduct(id: "P00000", item: "Renamed", thresholdValue: 5) { product { item } } }'
+        )
+
+    def test_delete_product(self):
+        self.assertConstantQueries(productdetails_schema, 'mutation { deleteProduct(id: "P00000") { ok } }')
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'IDS_GraphQL.settings')
+# Serve the GraphQL endpoints with the native async views (see IDS_GraphQL.views)
+os.environ.setdefault('IDS_GRAPHQL_ASYNC', '1')
 
 application = get_asgi_application()
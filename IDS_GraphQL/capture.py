@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from graphql import StringValueNode, VariableNode, Visitor, print_ast, visit
+from graphql_jwt.utils import get_http_authorization
+
+logger = logging.getLogger('IDS_GraphQL.capture')
+
+# Stands in for values that must not (or cannot) be written to the capture file
+REDACTED = '[redacted]'
+UPLOADED_FILE = '[file]'
+
+DEFAULT_REDACT = ('password', 'token', 'refreshToken', 'secret', 'apiKey')
+
+
+## Traffic capture
+def redact(value, keys):
+    """
+    Copies `value` with every dict entry whose key is in `keys` (case
+    insensitive) replaced by REDACTED and uploaded files replaced by
+    UPLOADED_FILE.
+
+    Args:
+    - value: Variables, or any JSON-like value inside them.
+    - keys: Set of lower-cased keys to redact.
+
+    Returns:
+    - value: JSON-serializable copy.
+    """
+    if isinstance(value, dict):
+        return {key: REDACTED if key.lower() in keys else redact(item, keys) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item, keys) for item in value]
+    if isinstance(value, UploadedFile):
+        return UPLOADED_FILE
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class SensitiveArguments(Visitor):
+    """
+    Collects the variables passed to sensitive arguments / input fields and
+    replaces sensitive literals (e.g. `password: "..."`) with REDACTED.
+    """
+
+    def __init__(self, keys):
+        super().__init__()
+        self.keys = keys
+        self.variables = set()
+        self.literals = False
+
+    def enter_argument(self, node, *_):
+        return self.check(node)
+
+    def enter_object_field(self, node, *_):
+        return self.check(node)
+
+    def check(self, node):
+        if node.name.value.lower() not in self.keys:
+            return None
+        if isinstance(node.value, VariableNode):
+            self.variables.add(node.value.name.value.lower())
+            return None
+        self.literals = True
+        return node.__class__(name=node.name, value=StringValueNode(value=REDACTED))
+
+
+def redact_operation(document, query, variables, keys):
+    """
+    Redacts sensitive values from an operation: variables named like a key,
+    variables passed to an argument named like a key, and literal values of
+    such arguments in the query text.
+
+    Returns:
+    - query: Query text, re-printed when a literal had to be redacted.
+    - variables: Redacted, JSON-serializable copy of the variables.
+    - redacted_query: True when the query text itself was changed.
+    """
+    visitor = SensitiveArguments(keys)
+    redacted_document = visit(document, visitor)
+    if visitor.literals:
+        query = print_ast(redacted_document)
+    return query, redact(variables or {}, keys | visitor.variables), visitor.literals
+
+
+def capture_enabled():
+    if not getattr(settings, 'GRAPHQL_CAPTURE', False):
+        return False
+    return random.random() < getattr(settings, 'GRAPHQL_CAPTURE_SAMPLE_RATE', 1.0)
+
+
+def capture_operation(request, prepared, variables, duration, result):
+    """
+    Writes one executed operation as a JSON line on the `IDS_GraphQL.capture`
+    logger (a rotating NDJSON file in settings.LOGGING), for replay with
+    `manage.py replay_graphql`.
+
+    Args:
+    - request: Django request the operation ran on.
+    - prepared: PreparedOperation that was executed.
+    - variables: Variables sent by the client.
+    - duration: Seconds spent preparing and executing the operation.
+    - result: ExecutionResult returned to the client.
+    """
+    keys = {key.lower() for key in getattr(settings, 'GRAPHQL_CAPTURE_REDACT', DEFAULT_REDACT)}
+    query, variables, redacted_query = redact_operation(prepared.document, prepared.query, variables, keys)
+    logger.info(json.dumps({
+        'timestamp': round(time.time(), 6),
+        'path': request.path,
+        'operationName': prepared.operation_name,
+        'operationType': prepared.operation_ast.operation.value if prepared.operation_ast is not None else None,
+        # A hash of the original text would let anyone check guesses of the redacted literal
+        'queryHash': hashlib.sha256(query.encode('utf-8')).hexdigest() if redacted_query else prepared.query_hash,
+        'query': query,
+        'redactedQuery': redacted_query,
+        'variables': variables,
+        # Replay signs in again; only whether a token was sent is kept
+        'authenticated': get_http_authorization(request) is not None,
+        'duration': round(duration * 1000, 3),
+        'errors': len(result.errors or ()) if result is not None else 0,
+    }))
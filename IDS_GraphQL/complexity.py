@@ -0,0 +1,239 @@
+from django.conf import settings
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError, IntValueNode, VariableNode,
+    get_named_type, get_nullable_type, is_list_type, is_composite_type,
+)
+from graphql.validation import ValidationRule
+
+
+## Static query cost analysis
+class QueryCost:
+    """
+    Estimated cost and depth of one operation.
+    """
+
+    def __init__(self, cost=0, depth=0):
+        self.cost = cost
+        self.depth = depth
+
+    def as_extension(self):
+        return {
+            'requestedQueryCost': self.cost,
+            'maximumQueryCost': settings.GRAPHQL_MAX_QUERY_COST,
+            'depth': self.depth,
+            'maximumDepth': settings.GRAPHQL_MAX_QUERY_DEPTH,
+        }
+
+    def __repr__(self):
+        return f"<QueryCost cost={self.cost} depth={self.depth}>"
+
+
+class CostAnalyzer:
+    """
+    Walks an operation and estimates how much work it asks for, without
+    executing it.
+
+    Every field costs its weight (1 for object fields, 0 for scalars, unless
+    GRAPHQL_FIELD_COSTS says otherwise) plus the cost of its sub-selection,
+    multiplied by the number of items it is expected to return:
+
+    - the `first` / `last` argument of a connection field,
+    - GRAPHQL_LIST_SIZES for a known list field,
+    - GRAPHQL_DEFAULT_LIST_SIZE for any other list or connection.
+
+    Arguments passed as variables use the value sent in `variable_values`,
+    then the variable's default value, then the default list size, so a
+    document is costed for the request that actually runs it. Introspection
+    fields are free.
+    """
+
+    def __init__(self, schema, fragments, variable_values=None):
+        self.schema = schema
+        self.fragments = fragments
+        self.variable_values = variable_values if isinstance(variable_values, dict) else {}
+        self.field_costs = getattr(settings, 'GRAPHQL_FIELD_COSTS', {})
+        self.list_sizes = getattr(settings, 'GRAPHQL_LIST_SIZES', {})
+        self.default_list_size = getattr(settings, 'GRAPHQL_DEFAULT_LIST_SIZE', 50)
+        self.variable_defaults = {}
+
+    def analyze(self, operation):
+        """
+        Args:
+        - operation: OperationDefinitionNode to estimate.
+
+        Returns:
+        - cost: QueryCost of the operation.
+        """
+        root_type = self.schema.get_root_type(operation.operation)
+        if root_type is None:
+            return QueryCost()
+
+        self.variable_defaults = {
+            definition.variable.name.value: definition.default_value
+            for definition in operation.variable_definitions or ()
+        }
+        return self._selection_cost(root_type, operation.selection_set, visited=frozenset())
+
+    def _selection_cost(self, parent_type, selection_set, visited):
+        total = QueryCost()
+        if selection_set is None:
+            return total
+
+        for selection in selection_set.selections:
+            if self._skipped(selection):
+                continue
+
+            if isinstance(selection, FieldNode):
+                child = self._field_cost(parent_type, selection, visited)
+                total.cost += child.cost
+                total.depth = max(total.depth, child.depth)
+                continue
+
+            if isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                # Unknown and cyclic fragments are reported by the standard rules
+                if fragment is None or name in visited:
+                    continue
+                visited = visited | {name}
+            else:
+                fragment = selection
+
+            fragment_type = self._condition_type(fragment, parent_type)
+            child = self._selection_cost(fragment_type, fragment.selection_set, visited)
+            total.cost += child.cost
+            total.depth = max(total.depth, child.depth)
+
+        return total
+
+    def _field_cost(self, parent_type, node, visited):
+        name = node.name.value
+        if name.startswith('__'):
+            return QueryCost()
+
+        field = getattr(parent_type, 'fields', {}).get(name)
+        if field is None:
+            return QueryCost()
+
+        field_type = get_named_type(field.type)
+        weight = self.field_costs.get(f'{parent_type.name}.{name}', 1 if is_composite_type(field_type) else 0)
+        child = self._selection_cost(field_type, node.selection_set, visited)
+        multiplier = self._multiplier(parent_type, name, field, node)
+
+        return QueryCost(cost=multiplier * (weight + child.cost), depth=child.depth + 1)
+
+    def _multiplier(self, parent_type, name, field, node):
+        # Connection fields are sized by their pagination arguments
+        arguments = {argument.name.value: argument.value for argument in node.arguments or ()}
+        for argument in ('first', 'last'):
+            if argument in arguments:
+                size = self._int_value(arguments[argument])
+                return self.default_list_size if size is None else size
+
+        key = f'{parent_type.name}.{name}'
+        if key in self.list_sizes:
+            return self.list_sizes[key]
+        if 'first' in field.args or 'last' in field.args:
+            return self.default_list_size
+        if name == 'edges' and parent_type.name.endswith('Connection'):
+            # Already counted on the connection field
+            return 1
+        if is_list_type(get_nullable_type(field.type)):
+            return self.default_list_size
+        return 1
+
+    def _int_value(self, value):
+        if isinstance(value, VariableNode):
+            name = value.name.value
+            sent = self.variable_values.get(name)
+            if isinstance(sent, int) and not isinstance(sent, bool):
+                return max(sent, 0)
+            value = self.variable_defaults.get(name)
+        if isinstance(value, IntValueNode):
+            return max(int(value.value), 0)
+        return None
+
+    def _condition_type(self, fragment, parent_type):
+        condition = fragment.type_condition
+        if condition is None:
+            return parent_type
+        return self.schema.get_type(condition.name.value) or parent_type
+
+    @staticmethod
+    def _skipped(selection):
+        # Only literal @skip(if: true) / @include(if: false) can be applied statically
+        for directive in selection.directives or ():
+            argument = next((a for a in directive.arguments or () if a.name.value == 'if'), None)
+            if argument is None or isinstance(argument.value, VariableNode):
+                continue
+            if directive.name.value == 'skip' and argument.value.value is True:
+                return True
+            if directive.name.value == 'include' and argument.value.value is False:
+                return True
+        return False
+
+
+def fragments_of(document):
+    return {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+
+
+def operation_cost(schema, document, operation, variable_values=None):
+    """
+    Estimates the cost of one operation of `document`.
+
+    Args:
+    - schema: GraphQLSchema the document is executed against.
+    - document: Parsed DocumentNode.
+    - operation: OperationDefinitionNode to estimate.
+    - variable_values: Variables of the request, used for `first` / `last`
+      arguments passed as variables.
+
+    Returns:
+    - cost: QueryCost with the estimated cost and depth.
+    """
+    return CostAnalyzer(schema, fragments_of(document), variable_values).analyze(operation)
+
+
+def operation_label(node):
+    return f"Operation '{node.name.value}'" if node.name else "Operation"
+
+
+def cost_errors(cost, node):
+    """
+    Returns:
+    - errors: GraphQLError for an operation costing more than
+      GRAPHQL_MAX_QUERY_COST, empty otherwise.
+    """
+    max_cost = settings.GRAPHQL_MAX_QUERY_COST
+    if max_cost is None or cost.cost <= max_cost:
+        return []
+    return [GraphQLError(
+        f"{operation_label(node)} has a cost of {cost.cost}, which exceeds the maximum of {max_cost}.",
+        node,
+        extensions={'code': 'QUERY_TOO_COMPLEX', 'cost': cost.as_extension()},
+    )]
+
+
+class QueryCostRule(ValidationRule):
+    """
+    Rejects operations deeper than GRAPHQL_MAX_QUERY_DEPTH before they
+    execute. The depth depends on the document only; the cost also depends
+    on the variables, so the view checks it per request with cost_errors().
+    """
+
+    def enter_operation_definition(self, node, *_args):
+        cost = operation_cost(self.context.schema, self.context.document, node)
+
+        max_depth = settings.GRAPHQL_MAX_QUERY_DEPTH
+        if max_depth is not None and cost.depth > max_depth:
+            self.report_error(GraphQLError(
+                f"{operation_label(node)} has a depth of {cost.depth}, which exceeds the maximum of {max_depth}.",
+                node,
+                extensions={'code': 'QUERY_TOO_DEEP', 'cost': cost.as_extension()},
+            ))
+
+        return self.SKIP
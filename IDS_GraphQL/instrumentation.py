@@ -0,0 +1,283 @@
+import inspect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import QuerySet
+
+logger = logging.getLogger('IDS_GraphQL.profile')
+
+# (profile, path) of the resolver running in the current thread / task
+_current_field = ContextVar('graphql_current_field', default=None)
+
+
+## Per-resolver timing and SQL attribution
+class FieldStats:
+    """
+    Totals for one resolver path (list indexes removed, so every item of a
+    list adds to the same entry).
+    """
+
+    __slots__ = ('count', 'duration', 'sql_count', 'sql_duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.sql_count = 0
+        self.sql_duration = 0.0
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'duration': round(self.duration * 1000, 3),
+            'sqlCount': self.sql_count,
+            'sqlDuration': round(self.sql_duration * 1000, 3),
+        }
+
+
+class OperationProfile:
+    """
+    Resolver timings and SQL of one executed operation, keyed by resolver path.
+    """
+
+    def __init__(self, operation_name):
+        self.operation_name = operation_name
+        self.started = time.perf_counter()
+        self.duration = None
+        self.fields = {}
+        self._lock = threading.Lock()
+
+    def stats(self, path):
+        with self._lock:
+            stats = self.fields.get(path)
+            if stats is None:
+                stats = self.fields[path] = FieldStats()
+            return stats
+
+    def add_resolve(self, path, duration):
+        stats = self.stats(path)
+        with self._lock:
+            stats.count += 1
+            stats.duration += duration
+
+    def add_sql(self, path, duration):
+        stats = self.stats(path)
+        with self._lock:
+            stats.sql_count += 1
+            stats.sql_duration += duration
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def as_dict(self):
+        fields = sorted(self.fields.items(), key=lambda item: item[1].duration, reverse=True)
+        return {
+            'operationName': self.operation_name,
+            'duration': round((self.duration or 0.0) * 1000, 3),
+            'resolverCount': sum(stats.count for stats in self.fields.values()),
+            'sqlCount': sum(stats.sql_count for stats in self.fields.values()),
+            'sqlDuration': round(sum(stats.sql_duration for stats in self.fields.values()) * 1000, 3),
+            'fields': {path: stats.as_dict() for path, stats in fields},
+        }
+
+
+class OperationSummary:
+    """
+    Totals of every profiled operation with the same name since the last
+    summary, so slow operations show up even when no single request is
+    slow enough to be logged.
+    """
+
+    __slots__ = ('count', 'duration', 'max_duration', 'sql_count', 'sql_duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.max_duration = 0.0
+        self.sql_count = 0
+        self.sql_duration = 0.0
+
+    def add(self, profile):
+        self.count += 1
+        self.duration += profile.duration
+        self.max_duration = max(self.max_duration, profile.duration)
+        for stats in profile.fields.values():
+            self.sql_count += stats.sql_count
+            self.sql_duration += stats.sql_duration
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'duration': round(self.duration * 1000, 3),
+            'meanDuration': round(self.duration / self.count * 1000, 3),
+            'maxDuration': round(self.max_duration * 1000, 3),
+            'sqlCount': self.sql_count,
+            'sqlDuration': round(self.sql_duration * 1000, 3),
+        }
+
+
+class ProfileAggregator:
+    """
+    Per-process OperationSummary of every operation name, logged as one JSON
+    line every GRAPHQL_PROFILE_SUMMARY_INTERVAL seconds (None: only on
+    flush()) and then reset.
+    """
+
+    def __init__(self):
+        self.operations = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            summary = self.operations.get(profile.operation_name)
+            if summary is None:
+                summary = self.operations[profile.operation_name] = OperationSummary()
+            summary.add(profile)
+
+            interval = getattr(settings, 'GRAPHQL_PROFILE_SUMMARY_INTERVAL', 60)
+            if interval is None or time.monotonic() - self.started < interval:
+                return
+            operations, self.operations, self.started = self.operations, {}, time.monotonic()
+        self.log(operations)
+
+    @staticmethod
+    def log(operations):
+        logger.info(json.dumps({
+            'event': 'graphql.summary',
+            'operations': {
+                name or '(anonymous)': summary.as_dict()
+                for name, summary in sorted(operations.items(), key=lambda item: item[1].duration, reverse=True)
+            },
+        }))
+
+    def flush(self):
+        with self._lock:
+            operations, self.operations, self.started = self.operations, {}, time.monotonic()
+        if operations:
+            self.log(operations)
+        return operations
+
+
+profile_aggregator = ProfileAggregator()
+
+
+def resolver_path(info):
+    return '.'.join(str(key) for key in info.path.as_list() if not isinstance(key, int))
+
+
+def record_sql(execute, sql, params, many, context):
+    # Attributes every statement to the resolver that issued it
+    current = _current_field.get()
+    if current is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile, path = current
+        profile.add_sql(path, time.perf_counter() - start)
+
+
+@contextmanager
+def execute_wrapper_once(wrapper):
+    """
+    Installs `wrapper` on the current thread's connection for the block,
+    unless an enclosing block already did, and removes it again on the way
+    out, exceptions included.
+    """
+    if wrapper in connection.execute_wrappers:
+        yield
+        return
+    with connection.execute_wrapper(wrapper):
+        yield
+
+
+def recording_sql():
+    # Resolver pool threads run their SQL on their own connections, so they enter this too
+    return execute_wrapper_once(record_sql)
+
+
+def start_profile(request, operation_name):
+    profile = OperationProfile(operation_name)
+    request.__dict__['graphql_profile'] = profile
+    return profile
+
+
+def finish_profile(request):
+    """
+    Closes the profile of the operation that just ran on `request`, adds it
+    to the per-operation-name summary and, when it took at least
+    GRAPHQL_PROFILE_LOG_MIN_DURATION ms, logs it as one JSON line on the
+    `IDS_GraphQL.profile` logger.
+
+    Args:
+    - request: Django request the operation ran on.
+
+    Returns:
+    - profile: Finished OperationProfile, or None when nothing was recorded.
+    """
+    profile = request.__dict__.pop('graphql_profile', None)
+    if profile is None:
+        return None
+
+    profile.finish()
+    profile_aggregator.add(profile)
+    if profile.duration * 1000 >= getattr(settings, 'GRAPHQL_PROFILE_LOG_MIN_DURATION', 500):
+        logger.info(json.dumps({'event': 'graphql.operation', 'path': request.path, **profile.as_dict()}))
+    return profile
+
+
+class InstrumentationMiddleware:
+    """
+    Records wall time, SQL query count and SQL time for every resolver path of
+    an operation. Listed first in GRAPHENE['MIDDLEWARE'] so it sits closest to
+    the resolver and does not count other middleware (e.g. JWT authentication).
+
+    Lazy querysets are evaluated inside the measurement, so their SQL is
+    charged to the field that returned them.
+    """
+
+    def resolve(self, next, root, info, **kwargs):
+        if not getattr(settings, 'GRAPHQL_PROFILE', False):
+            return next(root, info, **kwargs)
+
+        request = info.context
+        profile = getattr(request, 'graphql_profile', None)
+        if profile is None:
+            operation = info.operation.name.value if info.operation.name else None
+            profile = start_profile(request, operation)
+
+        path = resolver_path(info)
+        token = _current_field.set((profile, path))
+        start = time.perf_counter()
+        try:
+            with recording_sql():
+                result = next(root, info, **kwargs)
+                if isinstance(result, QuerySet):
+                    result = list(result)
+        except Exception:
+            profile.add_resolve(path, time.perf_counter() - start)
+            raise
+        finally:
+            _current_field.reset(token)
+
+        if inspect.isawaitable(result):
+            return self._resolve_async(result, profile, path, start)
+
+        profile.add_resolve(path, time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    async def _resolve_async(result, profile, path, start):
+        try:
+            return await result
+        finally:
+            profile.add_resolve(path, time.perf_counter() - start)
@@ -0,0 +1,197 @@
+import logging
+import re
+import threading
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.models import QuerySet
+
+from .instrumentation import execute_wrapper_once, resolver_path
+
+logger = logging.getLogger('IDS_GraphQL.nplusone')
+
+# Tracker of the operation executing in the current thread / task
+_current_tracker = ContextVar('graphql_query_tracker', default=None)
+# Path of the resolver executing in the current thread / task, set by RepeatedQueryMiddleware
+_current_path = ContextVar('graphql_query_tracker_path', default=None)
+
+# Frames shown for the first occurrence of a repeated query
+STACK_DEPTH = 12
+
+
+## Repeated-query (N+1) detection
+class RepeatedQueryError(Exception):
+    """
+    Raised in "raise" mode when an operation runs the same SQL template more
+    often than GRAPHQL_NPLUSONE_THRESHOLD allows.
+    """
+
+    def __init__(self, violations):
+        self.violations = violations
+        super().__init__('\n\n'.join(violation.describe() for violation in violations))
+
+
+_SQL_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),                      # string literals
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),                    # numeric literals
+    (re.compile(r'%s|%\(\w+\)s'), '?'),                         # driver placeholders
+    (re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.I), 'IN (...)'),
+    (re.compile(r'\bVALUES\s*(?:\((?:[^()]*)\)\s*,?\s*)+', re.I), 'VALUES (...) '),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def sql_template(sql):
+    """
+    Normalises a statement so that every execution of the same query shape
+    maps to the same string, whatever its parameters.
+
+    Args:
+    - sql: SQL text as sent to the cursor.
+
+    Returns:
+    - template: SQL with literals and placeholders replaced by `?` and IN /
+      VALUES lists collapsed.
+    """
+    for pattern, replacement in _SQL_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def application_stack():
+    # Skip Django / graphene internals and this module so the resolver code stands out
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if str(settings.BASE_DIR) in frame.filename and 'site-packages' not in frame.filename
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_DEPTH:]))
+
+
+class TemplateStats:
+    __slots__ = ('template', 'count', 'path', 'stack')
+
+    def __init__(self, template, path, stack):
+        self.template = template
+        self.count = 0
+        self.path = path
+        self.stack = stack
+
+    def describe(self):
+        return (
+            f"{self.count}x {self.template}\n"
+            f"first run by resolver '{self.path or '(outside a resolver)'}' at:\n{self.stack}"
+        )
+
+
+class QueryTracker:
+    """
+    Counts the SQL templates executed by one GraphQL operation.
+    """
+
+    def __init__(self, operation_name, threshold):
+        self.operation_name = operation_name
+        self.threshold = threshold
+        self.templates = {}
+        self._lock = threading.Lock()
+
+    def add(self, sql):
+        template = sql_template(sql)
+        with self._lock:
+            stats = self.templates.get(template)
+            if stats is None:
+                stats = self.templates[template] = TemplateStats(template, _current_path.get(), application_stack())
+            stats.count += 1
+
+    def violations(self):
+        return [stats for stats in self.templates.values() if stats.count > self.threshold]
+
+    def report(self, mode):
+        violations = self.violations()
+        if not violations:
+            return
+        if mode == 'raise':
+            raise RepeatedQueryError(violations)
+        for violation in violations:
+            logger.warning(
+                "Operation %s ran the same query more than %s times: %s",
+                self.operation_name or '(anonymous)', self.threshold, violation.describe(),
+            )
+
+
+def track_repeated_sql(execute, sql, params, many, context):
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.add(sql)
+    return execute(sql, params, many, context)
+
+
+def tracking_queries():
+    # Resolver pool threads run their SQL on their own connections, so they enter this too
+    return execute_wrapper_once(track_repeated_sql)
+
+
+class RepeatedQueryMiddleware:
+    """
+    Names the resolver that runs each statement in the N+1 report. Only does
+    anything inside an operation tracked by detect_repeated_queries, so it
+    costs nothing while GRAPHQL_NPLUSONE is off.
+
+    Lazy querysets are evaluated inside the resolver's scope, so their SQL is
+    charged to the field that returned them rather than to graphene.
+    """
+
+    def resolve(self, next, root, info, **kwargs):
+        if _current_tracker.get() is None:
+            return next(root, info, **kwargs)
+
+        token = _current_path.set(resolver_path(info))
+        try:
+            result = next(root, info, **kwargs)
+            if isinstance(result, QuerySet):
+                result = list(result)
+            return result
+        finally:
+            _current_path.reset(token)
+
+
+@contextmanager
+def detect_repeated_queries(operation_name=None, threshold=None, mode='raise'):
+    """
+    Tracks every statement executed inside the block (including resolver pool
+    threads started from it) and warns or raises when one SQL template runs
+    more than `threshold` times.
+
+    Args:
+    - operation_name: Name reported in the warning.
+    - threshold: Runs allowed per template (default GRAPHQL_NPLUSONE_THRESHOLD).
+    - mode: "raise" (default, for tests) or "warn".
+
+    Returns:
+    - tracker: QueryTracker with the counted templates.
+    """
+    threshold = getattr(settings, 'GRAPHQL_NPLUSONE_THRESHOLD', 5) if threshold is None else threshold
+
+    tracker = QueryTracker(operation_name, threshold)
+    token = _current_tracker.set(tracker)
+    try:
+        with tracking_queries():
+            yield tracker
+    finally:
+        _current_tracker.reset(token)
+    tracker.report(mode)
+
+
+@contextmanager
+def operation_query_tracking(operation_name):
+    """
+    Runs `detect_repeated_queries` around an operation when GRAPHQL_NPLUSONE
+    is enabled; does nothing otherwise.
+    """
+    mode = getattr(settings, 'GRAPHQL_NPLUSONE', None)
+    if not mode:
+        yield None
+        return
+    with detect_repeated_queries(operation_name, mode=mode) as tracker:
+        yield tracker
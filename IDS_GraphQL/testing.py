@@ -0,0 +1,83 @@
+import difflib
+from collections import Counter
+
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from graphql_jwt.shortcuts import get_token
+
+from .nplusone import sql_template
+
+
+## Query-count regression tests
+class QueryCountMixin:
+    """
+    Mixin for TestCase classes asserting that an operation runs the same
+    number of SQL statements whatever the size of the data.
+
+    Subclasses list the sizes to compare in `sizes` and implement
+    `seed(size)`, which replaces the test data with a dataset of the given
+    size, and `get_user()`, which returns the user the requests run as.
+    """
+
+    sizes = ()
+
+    def make_request(self):
+        user = self.get_user()
+        request = RequestFactory().post('/graphql/', HTTP_AUTHORIZATION=f'Bearer {get_token(user)}')
+        request.user = user
+        return request
+
+    def execute(self, schema, query, variables=None):
+        """
+        Runs `query` on a fresh request and returns the result with the SQL it
+        executed.
+        """
+        request = self.make_request()
+        with CaptureQueriesContext(connection) as captured:
+            result = schema.execute(query, variable_values=variables, context_value=request)
+        return result, [query['sql'] for query in captured.captured_queries]
+
+    def assertConstantQueries(self, schema, query, variables=None):
+        """
+        Seeds every size in `sizes`, runs the operation on each and fails with
+        a diff of the captured SQL when the statement count changes.
+
+        Args:
+        - schema: graphene Schema to execute against.
+        - query: GraphQL document.
+        - variables: Variables dict, or a callable returning one, called after
+          seeding so it can refer to the new rows.
+        """
+        runs = []
+        for size in self.sizes:
+            self.seed(size)
+            values = variables() if callable(variables) else variables
+            result, statements = self.execute(schema, query, values)
+            self.assertFalse(result.errors, f"Operation failed at size {size}: {result.errors}")
+            # Mutations report failures through statusCode instead of GraphQL errors
+            for payload in (result.data or {}).values():
+                if isinstance(payload, dict):
+                    self.assertIn(payload.get('statusCode'), (None, 200, 201), f"Operation failed at size {size}: {payload}")
+            runs.append((size, statements))
+
+        (small, baseline), *others = runs
+        for size, statements in others:
+            if len(statements) != len(baseline):
+                self.fail(self._query_diff(small, baseline, size, statements))
+
+    @staticmethod
+    def _query_diff(small, baseline, size, statements):
+        before = [sql_template(sql) for sql in baseline]
+        after = [sql_template(sql) for sql in statements]
+        grown = Counter(after) - Counter(before)
+        lines = [
+            f"Query count grew from {len(before)} (size {small}) to {len(after)} (size {size}).",
+            "",
+            "Statements that ran more often:",
+            *(f"  +{count} x {template}" for template, count in grown.most_common()),
+            "",
+            "Captured SQL:",
+            *difflib.unified_diff(before, after, f'size {small}', f'size {size}', lineterm='', n=1),
+        ]
+        return '\n'.join(lines)
@@ -0,0 +1,384 @@
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from graphql import parse
+from graphql_jwt.shortcuts import get_token
+
+from idscore.models import Category
+from idscore.schema import idscore_schema
+from idscore.seeding import get_seed_user, seed_idscore
+
+from .capture import REDACTED
+from .instrumentation import ProfileAggregator, record_sql
+from .nplusone import RepeatedQueryError, detect_repeated_queries, track_repeated_sql
+from .views import AsyncIDSGraphQLView, IDSGraphQLView, _resolve_in_thread, document_cache, query_hash
+
+urlpatterns = [
+    path('sync/idsdetails/', csrf_exempt(IDSGraphQLView.as_view(schema=idscore_schema, batch_operations=True, cost_analysis=True))),
+    path('idsdetails/', csrf_exempt(AsyncIDSGraphQLView.as_view(schema=idscore_schema, batch_operations=True, cost_analysis=True))),
+]
+
+CREATE_CATEGORY = 'mutation ($name: String!) { createCategory(name: $name) { statusCode message } }'
+CATEGORY_PAGE = 'query ($first: Int) { categories(first: $first) { edges { node { name } } } }'
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class ViewTestCase(TestCase):
+
+    def setUp(self):
+        # Validated documents outlive a test; start each one from an empty cache
+        document_cache.clear()
+        self.headers = {'Authorization': f'Bearer {get_token(get_seed_user())}'}
+
+    def post(self, body):
+        response = self.client.post('/sync/idsdetails/', json.dumps(body), content_type='application/json', headers=self.headers)
+        return response.status_code, response.json()
+
+
+# Batches on the sync view; every entry gets its own status, the response the worst of them
+class BatchTests(ViewTestCase):
+    PRODUCT_CATEGORY = '{ placements(first: 1) { edges { node { productId { category { name } } } } } }'
+
+    def test_empty_batch(self):
+        status, payload = self.post([])
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['errors'][0]['message'], 'Received an empty list in the batch request.')
+
+    @override_settings(GRAPHQL_BATCH_MAX_OPERATIONS=2)
+    def test_too_many_operations(self):
+        status, payload = self.post([{'query': '{ allCategories { name } }'}] * 3)
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['errors'][0]['message'], 'A batch may contain at most 2 operations.')
+
+        status, payload = self.post([{'query': '{ allCategories { name } }'}] * 2)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(payload), 2)
+
+    def test_entries_must_be_objects(self):
+        status, payload = self.post([{'query': '{ allCategories { name } }'}, '{ allCategories { name } }'])
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['errors'][0]['message'], 'Every batch entry must be a JSON object.')
+
+    def test_mixed_results(self):
+        Category.objects.create(name='Batched')
+        status, payload = self.post([
+            {'id': 'ok', 'query': '{ allCategories { name } }'},
+            {'id': 'invalid', 'query': '{ allCategories { missing } }'},
+            {'id': 'failed', 'query': '{ category(id: 0) { name } }'},
+        ])
+        self.assertEqual(status, 400)
+        self.assertEqual([entry['id'] for entry in payload], ['ok', 'invalid', 'failed'])
+        self.assertEqual([entry['status'] for entry in payload], [200, 400, 200])
+        self.assertEqual(payload[0]['data'], {'allCategories': [{'name': 'Batched'}]})
+        self.assertNotIn('data', payload[1])
+        self.assertIn("Cannot query field 'missing'", payload[1]['errors'][0]['message'])
+        # A resolver error only nulls its field; the entry still carries data
+        self.assertEqual(payload[2]['data'], {'category': None})
+        self.assertEqual(payload[2]['errors'][0]['path'], ['category'])
+
+    def test_loaders_dropped_after_a_mutation(self):
+        seed_idscore(placements=4, warehouses=1, locations=1, categories=1)
+        category = Category.objects.get()
+        status, payload = self.post([
+            {'query': self.PRODUCT_CATEGORY},
+            {'query': 'mutation ($id: ID!) { updateCategory(categoryId: $id, name: "Renamed") { statusCode } }', 'variables': {'id': category.pk}},
+            {'query': self.PRODUCT_CATEGORY},
+        ])
+        self.assertEqual(status, 200)
+        self.assertEqual(payload[1]['data']['updateCategory']['statusCode'], 200)
+        names = [entry['data']['placements']['edges'][0]['node']['productId']['category']['name'] for entry in (payload[0], payload[2])]
+        self.assertEqual(names, [category.name, 'Renamed'])
+
+
+# categories(first: n) { edges { node { name } } } costs 3 per category
+@override_settings(GRAPHQL_MAX_QUERY_COST=300)
+class QueryCostTests(ViewTestCase):
+
+    def test_cost_in_extensions(self):
+        status, payload = self.post({'query': CATEGORY_PAGE, 'variables': {'first': 10}})
+        self.assertEqual(status, 200)
+        self.assertNotIn('errors', payload)
+        self.assertEqual(payload['extensions']['cost']['requestedQueryCost'], 30)
+        self.assertEqual(payload['extensions']['cost']['maximumQueryCost'], 300)
+
+    def test_rejects_over_the_limit(self):
+        status, payload = self.post({'query': '{ categories(first: 200) { edges { node { name } } } }'})
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['errors'][0]['extensions']['code'], 'QUERY_TOO_COMPLEX')
+        self.assertEqual(payload['extensions']['cost']['requestedQueryCost'], 600)
+
+    def test_rejects_over_the_limit_through_a_variable(self):
+        status, payload = self.post({'query': CATEGORY_PAGE, 'variables': {'first': 200}})
+        self.assertEqual(status, 400)
+        self.assertNotIn('data', payload)
+        self.assertEqual(payload['errors'][0]['extensions']['code'], 'QUERY_TOO_COMPLEX')
+
+        # The validated document is cached; the cost is still checked against each request's variables
+        status, payload = self.post({'query': CATEGORY_PAGE, 'variables': {'first': 10}})
+        self.assertEqual(status, 200)
+        status, payload = self.post({'query': CATEGORY_PAGE, 'variables': {'first': 200}})
+        self.assertEqual(status, 400)
+
+    @override_settings(GRAPHQL_MAX_QUERY_DEPTH=2)
+    def test_rejects_too_deep(self):
+        status, payload = self.post({'query': CATEGORY_PAGE, 'variables': {'first': 1}})
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['errors'][0]['extensions']['code'], 'QUERY_TOO_DEEP')
+
+
+class PersistedQueryTests(ViewTestCase):
+    QUERY = '{ allCategories { name } }'
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        Category.objects.create(name='Persisted')
+
+    def persisted(self, sha256_hash):
+        return {'extensions': {'persistedQuery': {'version': 1, 'sha256Hash': sha256_hash}}}
+
+    def test_miss_register_hit(self):
+        sha256_hash = query_hash(self.QUERY)
+
+        status, payload = self.post(self.persisted(sha256_hash))
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['errors'][0]['message'], 'PersistedQueryNotFound')
+        self.assertEqual(payload['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+
+        status, payload = self.post({'query': self.QUERY, **self.persisted(sha256_hash)})
+        self.assertEqual(status, 200)
+        self.assertEqual(payload['data']['allCategories'], [{'name': 'Persisted'}])
+
+        status, payload = self.post(self.persisted(sha256_hash))
+        self.assertEqual(status, 200)
+        self.assertEqual(payload['data']['allCategories'], [{'name': 'Persisted'}])
+
+    def test_hash_mismatch(self):
+        wrong_hash = query_hash('{ allWarehouses { warehouseName } }')
+        status, payload = self.post({'query': self.QUERY, **self.persisted(wrong_hash)})
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['errors'][0]['extensions']['code'], 'INVALID_PERSISTED_QUERY')
+
+        # Nothing was registered under the wrong hash
+        status, payload = self.post(self.persisted(wrong_hash))
+        self.assertEqual(payload['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+
+    def test_unsupported_version(self):
+        status, payload = self.post({'extensions': {'persistedQuery': {'version': 2, 'sha256Hash': query_hash(self.QUERY)}}})
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_SUPPORTED')
+
+
+class DocumentCacheTests(ViewTestCase):
+
+    def post_counting_parses(self, *queries):
+        with mock.patch('IDS_GraphQL.views.parse', wraps=parse) as parsed:
+            for query in queries:
+                self.post({'query': query})
+        return parsed.call_count
+
+    def test_hit(self):
+        self.assertEqual(self.post_counting_parses('{ allCategories { name } }', '{ allCategories { name } }'), 1)
+        self.assertEqual(len(document_cache), 1)
+
+    def test_least_recently_used_is_evicted(self):
+        a, b, c = '{ allCategories { name } }', '{ allWarehouses { warehouseName } }', '{ allLocations { locationId } }'
+        with mock.patch.object(document_cache, 'maxsize', 2):
+            # a is used again after b, so c evicts b
+            self.assertEqual(self.post_counting_parses(a, b, a, c), 3)
+            self.assertEqual(len(document_cache), 2)
+            self.assertEqual(self.post_counting_parses(a, c), 0)
+            self.assertEqual(self.post_counting_parses(b), 1)
+
+    def test_invalid_documents_are_not_cached(self):
+        status, payload = self.post({'query': '{ noSuchField }'})
+        self.assertEqual(status, 400)
+        self.assertEqual(self.post_counting_parses('{ noSuchField }', '{ allCategories { '), 2)
+        self.assertEqual(len(document_cache), 0)
+
+
+class ProfileTests(ViewTestCase):
+
+    def test_off_by_default(self):
+        status, payload = self.post({'query': '{ allCategories { name } }'})
+        self.assertEqual(status, 200)
+        self.assertNotIn('profile', payload.get('extensions', {}))
+
+    @override_settings(GRAPHQL_PROFILE=True, GRAPHQL_PROFILE_EXTENSIONS=True)
+    def test_profile_in_extensions(self):
+        Category.objects.create(name='Profiled')
+        status, payload = self.post({'query': 'query Categories { allCategories { name } }'})
+        self.assertEqual(status, 200)
+        profile = payload['extensions']['profile']
+        self.assertEqual(profile['operationName'], 'Categories')
+        self.assertEqual(profile['fields']['allCategories']['sqlCount'], 1)
+
+    @override_settings(GRAPHQL_PROFILE=True)
+    def test_sql_recorder_removed_after_a_failing_resolver(self):
+        status, payload = self.post({'query': '{ categories(after: "bad") { edges { node { name } } } }'})
+        self.assertEqual(payload['errors'][0]['message'], "Invalid cursor 'bad'.")
+        self.assertNotIn(record_sql, connection.execute_wrappers)
+
+    @override_settings(GRAPHQL_PROFILE=True, GRAPHQL_PROFILE_SUMMARY_INTERVAL=None)
+    def test_summary_per_operation_name(self):
+        with mock.patch('IDS_GraphQL.instrumentation.profile_aggregator', ProfileAggregator()) as aggregator:
+            for _ in range(3):
+                self.post({'query': 'query Categories { allCategories { name } }'})
+            self.post({'query': 'query Units { allCategories { categoryId } }'})
+            self.assertNotIn('profile', self.post({'query': '{ allCategories { name } }'})[1].get('extensions', {}))
+
+            with self.assertLogs('IDS_GraphQL.profile') as logs:
+                operations = aggregator.flush()
+        self.assertEqual({name: summary.count for name, summary in operations.items()}, {'Categories': 3, 'Units': 1, None: 1})
+        self.assertEqual(json.loads(logs.records[0].getMessage())['operations']['Categories']['sqlCount'], 3)
+
+
+class RepeatedQueryTests(ViewTestCase):
+
+    def load_categories(self, ids):
+        for pk in ids:
+            Category.objects.filter(pk=pk).first()
+
+    def test_raise_mode(self):
+        with self.assertRaises(RepeatedQueryError) as raised:
+            with detect_repeated_queries('Categories', threshold=2, mode='raise'):
+                self.load_categories(range(3))
+        violation, = raised.exception.violations
+        self.assertEqual(violation.count, 3)
+        self.assertIn('FROM "idscore_category"', violation.template)
+        self.assertNotIn(track_repeated_sql, connection.execute_wrappers)
+
+    def test_under_the_threshold(self):
+        with detect_repeated_queries('Categories', threshold=3, mode='raise') as tracker:
+            self.load_categories(range(3))
+        self.assertEqual(tracker.violations(), [])
+
+    def test_wrapper_removed_after_an_exception(self):
+        with self.assertRaises(ValueError):
+            with detect_repeated_queries(threshold=2):
+                raise ValueError
+        self.assertNotIn(track_repeated_sql, connection.execute_wrappers)
+
+    @override_settings(GRAPHQL_NPLUSONE='warn', GRAPHQL_NPLUSONE_THRESHOLD=0)
+    def test_warn_mode_on_an_operation(self):
+        with self.assertLogs('IDS_GraphQL.nplusone', 'WARNING') as logs:
+            status, payload = self.post({'query': 'query Categories { allCategories { name } }'})
+        self.assertEqual(status, 200)
+        self.assertNotIn('errors', payload)
+        self.assertTrue(all('Operation Categories ran the same query more than 0 times' in line for line in logs.output))
+        category_warning, = [line for line in logs.output if 'FROM "idscore_category"' in line]
+        # Named without GRAPHQL_PROFILE, which is off
+        self.assertIn("first run by resolver 'allCategories'", category_warning)
+
+
+# Resolvers run on the resolver thread pool, with connections of their own, so the rows must be committed
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(TransactionTestCase):
+
+    def setUp(self):
+        self.headers = {'Authorization': f'Bearer {get_token(get_seed_user())}'}
+
+    async def post(self, body):
+        response = await self.async_client.post('/idsdetails/', json.dumps(body), content_type='application/json', headers=self.headers)
+        return response.status_code, response.json()
+
+    async def test_query(self):
+        await Category.objects.acreate(name='Async')
+        status, payload = await self.post({'query': '{ allCategories { name } }'})
+        self.assertEqual(status, 200)
+        self.assertEqual(payload['data']['allCategories'], [{'name': 'Async'}])
+
+    @override_settings(GRAPHQL_PROFILE=True, GRAPHQL_PROFILE_EXTENSIONS=True)
+    async def test_profile_counts_resolver_thread_sql(self):
+        status, payload = await self.post({'query': '{ allCategories { name } }'})
+        self.assertEqual(status, 200)
+        self.assertEqual(payload['extensions']['profile']['fields']['allCategories']['sqlCount'], 1)
+
+    def test_worker_connections_closed_between_requests(self):
+        first, second = SimpleNamespace(context=RequestFactory().post('/')), SimpleNamespace(context=RequestFactory().post('/'))
+        with ThreadPoolExecutor(max_workers=1) as worker, mock.patch('IDS_GraphQL.views.close_old_connections') as close:
+            for info in (first, first, second, second, first):
+                worker.submit(_resolve_in_thread, lambda root, info: None, None, info).result()
+        self.assertEqual(close.call_count, 3)
+
+    async def create_category(self, name):
+        status, payload = await self.post({'query': CREATE_CATEGORY, 'variables': {'name': name}})
+        self.assertEqual(status, 200)
+        self.assertNotIn('errors', payload)
+        self.assertEqual(payload['data']['createCategory']['statusCode'], 200)
+        self.assertTrue(await Category.objects.filter(name=name).aexists())
+
+    async def test_mutation(self):
+        await self.create_category('Async mutation')
+
+    async def test_atomic_mutation(self):
+        # The whole mutation runs in one worker thread, without the event loop the resolver pool needs.
+        # Switched on per database: views.py holds the graphene_settings of startup
+        with mock.patch.dict(connection.settings_dict, {'ATOMIC_MUTATIONS': True}):
+            await self.create_category('Atomic mutation')
+
+    async def test_batch(self):
+        status, payload = await self.post([
+            {'query': CREATE_CATEGORY, 'variables': {'name': 'Batched'}},
+            {'query': '{ allCategories { name } }'},
+        ])
+        self.assertEqual(status, 200)
+        self.assertEqual([entry['status'] for entry in payload], [200, 200])
+        self.assertEqual(payload[0]['data']['createCategory']['statusCode'], 200)
+        self.assertEqual(payload[1]['data']['allCategories'], [{'name': 'Batched'}])
+
+
+# Replay sends the operations from a thread pool, whose connections only see committed rows
+@override_settings(ROOT_URLCONF=__name__, GRAPHQL_CAPTURE=True, GRAPHQL_CAPTURE_SAMPLE_RATE=1.0)
+class CaptureReplayTests(TransactionTestCase):
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {get_token(get_seed_user())}'
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def capture(self, *bodies):
+        with self.assertLogs('IDS_GraphQL.capture') as logs:
+            for body in bodies:
+                self.client.post('/sync/idsdetails/', json.dumps(body), content_type='application/json')
+        path = os.path.join(self.directory, 'capture.ndjson')
+        with open(path, 'w') as f:
+            f.writelines(record.getMessage() + '\n' for record in logs.records)
+        return path, [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_round_trip(self):
+        path, entries = self.capture(
+            {'query': CATEGORY_PAGE, 'variables': {'first': 5}},
+            {'query': CREATE_CATEGORY, 'variables': {'name': 'Replayed'}},
+            {'query': CREATE_CATEGORY, 'variables': {'name': 'Secret', 'password': 'hunter2'}},
+        )
+        self.assertEqual([entry['operationType'] for entry in entries], ['query', 'mutation', 'mutation'])
+        self.assertTrue(all(entry['authenticated'] and entry['path'] == '/sync/idsdetails/' for entry in entries))
+        self.assertEqual(entries[0]['variables'], {'first': 5})
+        self.assertEqual(entries[2]['variables']['password'], REDACTED)
+
+        # The mutation runs again on replay
+        Category.objects.all().delete()
+        output = os.path.join(self.directory, 'replay.json')
+        # Replayed operations must not be captured again (into the real capture file)
+        with override_settings(GRAPHQL_CAPTURE=False), self.assertNoLogs('IDS_GraphQL.capture'):
+            call_command('replay_graphql', path, '--speed', '0', '--workers', '1', '--output', output, stdout=io.StringIO())
+
+        with open(output) as f:
+            report = json.load(f)
+        self.assertEqual(report['skipped'], 1)
+        self.assertEqual(sorted(row['replayed']['count'] for row in report['operations']), [1, 1])
+        self.assertEqual([row['errors'] for row in report['operations']], [0, 0])
+        self.assertEqual(list(Category.objects.values_list('name', flat=True)), ['Replayed'])
@@ -1,21 +1,32 @@
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
 from Object_Detection.schema import wordsearch_schema, imageupload_schema
-from graphene_file_upload.django import FileUploadGraphQLView
+from django.conf import settings
+from IDS_GraphQL.views import IDSGraphQLView, IDSFileUploadGraphQLView, AsyncIDSGraphQLView, AsyncIDSFileUploadGraphQLView
 from Authentication.schema import login_schema
 from Core.schema import productdetails_schema
 
 from idscore.schema import idscore_schema
+from idscore.views import export_products
+from IDS_GraphQL.schema import schema
 
 
 
+# asgi.py switches the endpoints to the async views
+if settings.GRAPHQL_ASYNC_VIEWS:
+    GraphQLView, FileUploadGraphQLView = AsyncIDSGraphQLView, AsyncIDSFileUploadGraphQLView
+else:
+    GraphQLView, FileUploadGraphQLView = IDSGraphQLView, IDSFileUploadGraphQLView
+
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('login/', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=login_schema))),
     path('productdetails/', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=productdetails_schema))),
-    path('idsdetails/', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=idscore_schema))),
+    path('idsdetails/', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=idscore_schema, batch_operations=True, cost_analysis=True))),
+    path('idsdetails/export/', export_products),
+    path('graphql/', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema, batch_operations=True, cost_analysis=True))),
 
     path('searchword/', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=wordsearch_schema))),
     path('upload/', csrf_exempt(FileUploadGraphQLView.as_view(graphiql=True, schema=imageupload_schema))),
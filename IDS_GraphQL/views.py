@@ -0,0 +1,598 @@
+import asyncio
+import contextvars
+import hashlib
+import inspect
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import close_old_connections, connection, models, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.http.response import HttpResponseBadRequest
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphene_file_upload.django import FileUploadGraphQLView
+from graphene.types.resolver import get_default_resolver
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast, parse, validate_schema
+from graphql.validation import specified_rules, validate
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.middleware import JSONWebTokenMiddleware
+from graphql_jwt.utils import get_http_authorization
+
+from .capture import capture_enabled, capture_operation
+from .complexity import QueryCostRule, cost_errors, operation_cost
+from .instrumentation import finish_profile, recording_sql, start_profile
+from .nplusone import operation_query_tracking, tracking_queries
+
+
+## Parsed-document cache
+class DocumentCache:
+    """
+    Bounded LRU cache of parsed and validated GraphQL documents, keyed by
+    schema, validation rules and the sha256 of the query text.
+
+    Only documents that parsed and validated cleanly are stored, so a cache
+    hit can skip both steps.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def set(self, key, document):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def __len__(self):
+        return len(self._documents)
+
+
+document_cache = DocumentCache(getattr(settings, 'GRAPHQL_DOCUMENT_CACHE_SIZE', 256))
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+## Automatic persisted queries
+class PersistedQueryError(GraphQLError):
+    def __init__(self, message, code):
+        super().__init__(message, extensions={'code': code})
+
+
+def get_extensions(request, data):
+    extensions = request.GET.get('extensions') or data.get('extensions')
+    if extensions and isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except Exception:
+            raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+    return extensions if isinstance(extensions, dict) else {}
+
+
+def resolve_persisted_query(request, data, query):
+    """
+    Implements the automatic persisted query protocol: a client may send only
+    `extensions.persistedQuery.sha256Hash`; if the hash is unknown it gets a
+    PersistedQueryNotFound error and retries with the full query, which is
+    registered under its hash for later requests.
+
+    Args:
+    - request: Django request.
+    - data: Parsed request body.
+    - query: Query text from the request, if any.
+
+    Returns:
+    - query: Query text to execute.
+    """
+    persisted = get_extensions(request, data).get('persistedQuery')
+    if not isinstance(persisted, dict):
+        return query
+
+    sha256_hash = persisted.get('sha256Hash')
+    if persisted.get('version', 1) != 1 or not isinstance(sha256_hash, str):
+        raise PersistedQueryError("Unsupported persisted query version.", 'PERSISTED_QUERY_NOT_SUPPORTED')
+
+    cache_key = f'graphql:apq:{sha256_hash}'
+    if query:
+        if query_hash(query) != sha256_hash:
+            raise PersistedQueryError("provided sha does not match query", 'INVALID_PERSISTED_QUERY')
+        cache.set(cache_key, query, getattr(settings, 'GRAPHQL_PERSISTED_QUERY_TIMEOUT', None))
+        return query
+
+    query = cache.get(cache_key)
+    if query is None:
+        raise PersistedQueryError("PersistedQueryNotFound", 'PERSISTED_QUERY_NOT_FOUND')
+    return query
+
+
+## GraphQL views
+class IDSGraphQLViewMixin:
+    """
+    Adds the parsed-document cache, automatic persisted queries, optional
+    batched operations and optional query cost limits to a graphene-django
+    GraphQLView.
+    """
+
+    # Accept a JSON array of operations as well as a single operation
+    batch_operations = False
+    # Reject operations over the depth / cost budget and report the cost in `extensions`
+    cost_analysis = False
+
+    def __init__(self, batch_operations=False, cost_analysis=False, **kwargs):
+        super().__init__(**kwargs)
+        self.batch_operations = batch_operations or self.batch_operations
+        self.cost_analysis = cost_analysis or self.cost_analysis
+        if self.cost_analysis:
+            self.validation_rules = (*(self.validation_rules or specified_rules), QueryCostRule)
+
+    def parse_body(self, request):
+        """
+        Switches the request to batch mode when the JSON body is an array.
+        Every operation of a batch runs against the same request, so they
+        share its JWT authentication and DataLoader registry.
+        """
+        if self.batch_operations and self.get_content_type(request) == "application/json":
+            try:
+                body = json.loads(request.body.decode("utf-8"))
+            except (TypeError, ValueError, UnicodeDecodeError):
+                return super().parse_body(request)
+
+            if isinstance(body, list):
+                if not body:
+                    raise HttpError(HttpResponseBadRequest("Received an empty list in the batch request."))
+                max_operations = getattr(settings, 'GRAPHQL_BATCH_MAX_OPERATIONS', 20)
+                if len(body) > max_operations:
+                    raise HttpError(HttpResponseBadRequest(f"A batch may contain at most {max_operations} operations."))
+                if not all(isinstance(entry, dict) for entry in body):
+                    raise HttpError(HttpResponseBadRequest("Every batch entry must be a JSON object."))
+                self.batch = True
+                return body
+
+        return super().parse_body(request)
+
+    def get_document(self, query):
+        """
+        Returns the parsed document for `query` and its validation errors,
+        reusing a previously validated document when one is cached.
+        """
+        schema = self.schema.graphql_schema
+        key = (id(schema), tuple(self.validation_rules or ()), query_hash(query))
+
+        document = document_cache.get(key)
+        if document is not None:
+            return document, []
+
+        document = parse(query)
+        validation_errors = validate(
+            schema,
+            document,
+            self.validation_rules,
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        if not validation_errors:
+            document_cache.set(key, document)
+        return document, validation_errors
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        return self.format_response(request, execution_result, id, show_graphiql)
+
+    def format_response(self, request, execution_result, id, show_graphiql=False):
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response["errors"] = [
+                    self.format_error(e) for e in execution_result.errors
+                ]
+
+            if execution_result.errors and any(
+                not getattr(e, "path", None) for e in execution_result.errors
+            ):
+                status_code = 400
+            else:
+                response["data"] = execution_result.data
+
+            if execution_result.extensions:
+                response["extensions"] = execution_result.extensions
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+    def prepare_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        """
+        Resolves, parses and validates the operation.
+
+        Returns:
+        - prepared: PreparedOperation ready to execute, or the ExecutionResult
+          (or None) to answer with when the operation cannot run.
+        """
+        try:
+            query = resolve_persisted_query(request, data, query)
+        except PersistedQueryError as e:
+            return ExecutionResult(errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document, validation_errors = self.get_document(query)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        extensions = None
+        cost_limit_errors = []
+        if self.cost_analysis and operation_ast is not None:
+            cost = operation_cost(schema, document, operation_ast, variables)
+            extensions = {'cost': cost.as_extension()}
+            cost_limit_errors = cost_errors(cost, operation_ast)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        if validation_errors or cost_limit_errors:
+            return ExecutionResult(data=None, errors=validation_errors or cost_limit_errors, extensions=extensions)
+
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = self.execution_context_class
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        prepared = PreparedOperation(schema, document, operation_ast, execute_options, extensions, query)
+        if getattr(settings, 'GRAPHQL_PROFILE', False):
+            start_profile(request, prepared.operation_name)
+        return prepared
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        started = time.perf_counter()
+        prepared = self.prepare_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+
+        try:
+            result = self.run_operation(request, prepared)
+        except Exception as e:
+            result = ExecutionResult(errors=[e])
+        self.capture(request, prepared, variables, started, result)
+        return result
+
+    def capture(self, request, prepared, variables, started, result):
+        # Opt-in traffic recording for `manage.py replay_graphql` (GRAPHQL_CAPTURE)
+        if capture_enabled():
+            capture_operation(request, prepared, variables, time.perf_counter() - started, result)
+
+    def run_operation(self, request, prepared):
+        if prepared.atomic:
+            with transaction.atomic():
+                result = self.execute_operation(prepared)
+                if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                    transaction.set_rollback(True)
+        else:
+            result = self.execute_operation(prepared)
+
+        return self.finish_operation(request, prepared, result)
+
+    def execute_operation(self, prepared):
+        with operation_query_tracking(prepared.operation_name):
+            return execute(prepared.schema, prepared.document, **prepared.execute_options)
+
+    def finish_operation(self, request, prepared, result):
+        if prepared.is_mutation:
+            # Later operations of a batch must not read rows cached before the mutation
+            request.__dict__.pop('loaders', None)
+        if prepared.extensions:
+            result.extensions = {**(result.extensions or {}), **prepared.extensions}
+
+        profile = finish_profile(request)
+        if profile is not None and getattr(settings, 'GRAPHQL_PROFILE_EXTENSIONS', False):
+            result.extensions = {**(result.extensions or {}), 'profile': profile.as_dict()}
+        return result
+
+
+class PreparedOperation:
+    """
+    A parsed and validated operation together with its execute() options.
+    """
+
+    def __init__(self, schema, document, operation_ast, execute_options, extensions=None, query=None):
+        self.schema = schema
+        self.document = document
+        self.operation_ast = operation_ast
+        self.execute_options = execute_options
+        self.extensions = extensions
+        self.query = query
+
+    @property
+    def query_hash(self):
+        return query_hash(self.query) if self.query is not None else None
+
+    @property
+    def operation_name(self):
+        if self.operation_ast is None or self.operation_ast.name is None:
+            return None
+        return self.operation_ast.name.value
+
+    @property
+    def is_mutation(self):
+        return self.operation_ast is not None and self.operation_ast.operation == OperationType.MUTATION
+
+    @property
+    def atomic(self):
+        return self.is_mutation and (
+            graphene_settings.ATOMIC_MUTATIONS is True
+            or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+        )
+
+
+class IDSGraphQLView(IDSGraphQLViewMixin, GraphQLView):
+    pass
+
+
+class IDSFileUploadGraphQLView(IDSGraphQLViewMixin, FileUploadGraphQLView):
+    pass
+
+
+## Async execution (used when the app is served through asgi.py)
+resolver_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'GRAPHQL_ASYNC_THREAD_POOL_SIZE', 8),
+    thread_name_prefix='graphql-resolver',
+)
+
+
+def run_in_resolver_thread(fn, *args, **kwargs):
+    # Carry context variables (e.g. the resolver being profiled) into the worker thread
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(resolver_executor, partial(context.run, fn, *args, **kwargs))
+
+
+def resolves_in_memory(resolver, root):
+    """
+    True when `resolver` is graphene's default resolver reading a value that is
+    already in memory: a key of a dict / ObjectType, or a loaded, non-relational
+    column of a model instance. Anything else may query the database.
+    """
+    if not (isinstance(resolver, partial) and resolver.func is get_default_resolver()):
+        return False
+    if isinstance(root, models.Model):
+        try:
+            field = root._meta.get_field(resolver.args[0])
+        except FieldDoesNotExist:
+            return False
+        return field.concrete and not field.is_relation and field.attname not in root.get_deferred_fields()
+    return True
+
+
+# The request whose resolvers each worker thread ran last, held weakly so its loaders can be freed
+_worker = threading.local()
+
+
+def _resolve_in_thread(next, root, info, **kwargs):
+    # request_finished never fires in the workers. A worker cannot tell which resolver is the last of
+    # a request, so the first resolver of the next request ends the previous one's batch instead
+    last_request = getattr(_worker, 'request', None)
+    if last_request is None or last_request() is not info.context:
+        close_old_connections()
+        _worker.request = weakref.ref(info.context)
+    try:
+        with recording_sql(), tracking_queries():
+            result = next(root, info, **kwargs)
+            # Lazy querysets must be evaluated here; iterating them on the event loop is not allowed
+            if isinstance(result, QuerySet):
+                result = list(result)
+        return result
+    except Exception:
+        connection.close_if_unusable_or_obsolete()
+        raise
+
+
+class ThreadPoolResolverMiddleware:
+    """
+    Runs every synchronous resolver that may touch the ORM on the bounded
+    resolver thread pool, so the event loop never blocks on the database.
+    Async resolvers and plain in-memory reads run inline.
+
+    Must be the innermost middleware so `next` is the field resolver itself.
+    """
+
+    def resolve(self, next, root, info, **kwargs):
+        if inspect.iscoroutinefunction(next) or resolves_in_memory(next, root):
+            return next(root, info, **kwargs)
+        return run_in_resolver_thread(_resolve_in_thread, next, root, info, **kwargs)
+
+
+class AsyncIDSGraphQLViewMixin:
+    """
+    Native async version of the IDS GraphQL views: operations run on
+    graphql-core's async executor and ORM work is pushed to the resolver
+    thread pool, so one process can serve many slow requests at once.
+    """
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            show_graphiql = self.graphiql and self.can_display_graphiql(request, data)
+
+            if show_graphiql:
+                # GraphiQL is a plain template render; the sync view handles it
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            auth_error = await self.authenticate(request)
+
+            if self.batch:
+                responses = [await self.get_response_async(request, entry, auth_error=auth_error) for entry in data]
+                result = "[{}]".format(",".join([response[0] for response in responses]))
+                status_code = responses and max(responses, key=lambda response: response[1])[1] or 200
+            else:
+                result, status_code = await self.get_response_async(request, data, show_graphiql, auth_error)
+
+            return HttpResponse(status=status_code, content=result, content_type="application/json")
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(request, {"errors": [self.format_error(e)]})
+            return response
+
+    async def authenticate(self, request):
+        """
+        Authenticates the request once, off the event loop, instead of
+        letting JSONWebTokenMiddleware query the user table inside a resolver.
+
+        Returns:
+        - error: The JWT error to report for every operation, or None.
+        """
+        user = await request.auser()
+        if user.is_anonymous and get_http_authorization(request) is not None:
+            try:
+                user = await run_in_resolver_thread(authenticate, request=request) or user
+            except JSONWebTokenError as e:
+                request.user = user
+                return e
+        request.user = user
+        return None
+
+    def get_middleware(self, request):
+        # graphql-core wraps resolvers in list order, so the first entry is the innermost
+        return [ThreadPoolResolverMiddleware()] + self.get_thread_middleware(request)
+
+    def get_thread_middleware(self, request):
+        # Middleware of an operation run entirely in a worker thread: resolvers stay in that thread, as
+        # there is no event loop there to hand them to; the request is already authenticated
+        return [m for m in (self.middleware or []) if not isinstance(m, JSONWebTokenMiddleware)]
+
+    def run_operation_in_thread(self, request, prepared):
+        try:
+            return self.run_operation(request, prepared)
+        finally:
+            # The worker thread outlives the request; don't leave its connection open
+            connection.close()
+
+    async def get_response_async(self, request, data, show_graphiql=False, auth_error=None):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        if auth_error is not None:
+            execution_result = ExecutionResult(errors=[GraphQLError(str(auth_error))])
+        else:
+            execution_result = await self.execute_graphql_request_async(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+
+        return self.format_response(request, execution_result, id, show_graphiql)
+
+    async def execute_graphql_request_async(self, request, data, query, variables, operation_name, show_graphiql=False):
+        started = time.perf_counter()
+        prepared = self.prepare_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+
+        try:
+            if prepared.atomic:
+                # transaction.atomic() cannot wrap async code; run the whole mutation in one worker thread
+                prepared.execute_options = {**prepared.execute_options, 'middleware': self.get_thread_middleware(request)}
+                result = await run_in_resolver_thread(self.run_operation_in_thread, request, prepared)
+            else:
+                with operation_query_tracking(prepared.operation_name):
+                    result = execute(prepared.schema, prepared.document, **prepared.execute_options)
+                    if inspect.isawaitable(result):
+                        result = await result
+                result = self.finish_operation(request, prepared, result)
+        except Exception as e:
+            result = ExecutionResult(errors=[e])
+        self.capture(request, prepared, variables, started, result)
+        return result
+
+
+class AsyncIDSGraphQLView(AsyncIDSGraphQLViewMixin, IDSGraphQLView):
+    pass
+
+
+class AsyncIDSFileUploadGraphQLView(AsyncIDSGraphQLViewMixin, IDSFileUploadGraphQLView):
+    pass
@@ -0,0 +1,167 @@
+"""
+Throughput of the async (asgi.py) GraphQL path against the sync (wsgi.py) path.
+
+Each mode runs in its own process against the configured database:
+
+- wsgi: the sync views driven by a fixed number of worker threads, one
+  request at a time per worker, like a gunicorn sync deployment.
+- asgi: the async views driven by concurrent clients on one event loop,
+  with ORM work on the GRAPHQL_ASYNC_THREAD_POOL_SIZE resolver threads.
+
+A fixed delay is added to every SQL statement to stand in for the round trip
+to the remote Postgres server, which is what makes a request slow in
+production.
+
+Usage:
+    python -m benchmarks.asgi_vs_wsgi --requests 200 --concurrency 50 --latency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_QUERY = '{ allCategories { categoryId name } allWarehouses { warehouseName location { locationName } } }'
+
+
+def setup_django(async_views):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'IDS_GraphQL.settings')
+    os.environ['IDS_GRAPHQL_ASYNC'] = '1' if async_views else '0'
+    import django
+    django.setup()
+
+
+def simulate_latency(latency_ms):
+    # Sleep before every statement to model the network round trip to the database
+    from django.db.backends import utils
+
+    delay = latency_ms / 1000.0
+    execute, executemany = utils.CursorWrapper.execute, utils.CursorWrapper.executemany
+
+    def slow_execute(self, *args, **kwargs):
+        time.sleep(delay)
+        return execute(self, *args, **kwargs)
+
+    def slow_executemany(self, *args, **kwargs):
+        time.sleep(delay)
+        return executemany(self, *args, **kwargs)
+
+    utils.CursorWrapper.execute = slow_execute
+    utils.CursorWrapper.executemany = slow_executemany
+
+
+def get_auth_token(username):
+    from graphql_jwt.shortcuts import get_token
+    from Authentication.models import Login
+
+    user = Login.objects.get(username=username) if username else Login.objects.order_by('pk').first()
+    if user is None:
+        raise SystemExit("No Login user found; create one or pass --username.")
+    return get_token(user)
+
+
+def summarize(mode, latencies, errors, elapsed, args):
+    latencies = sorted(latencies)
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'concurrency': args.concurrency if mode == 'asgi' else args.wsgi_workers,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+    }
+
+
+def run_wsgi(args):
+    setup_django(async_views=False)
+    from django.test import Client
+
+    token = get_auth_token(args.username)
+    simulate_latency(args.latency)
+    body = json.dumps({'query': args.query})
+
+    def one_request(_):
+        client = Client()
+        start = time.perf_counter()
+        response = client.post(args.path, body, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return time.perf_counter() - start, response.status_code != 200 or b'"errors"' in response.content
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.wsgi_workers) as pool:
+        results = list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    return summarize('wsgi', [r[0] for r in results], sum(r[1] for r in results), elapsed, args)
+
+
+def run_asgi(args):
+    setup_django(async_views=True)
+    from django.test import AsyncClient
+
+    token = get_auth_token(args.username)
+    simulate_latency(args.latency)
+    body = json.dumps({'query': args.query})
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one_request():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(args.path, body, content_type='application/json', headers={'Authorization': f'Bearer {token}'})
+                return time.perf_counter() - start, response.status_code != 200 or b'"errors"' in response.content
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one_request() for _ in range(args.requests)))
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+    return summarize('asgi', [r[0] for r in results], sum(r[1] for r in results), elapsed, args)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='requests per mode')
+    parser.add_argument('--concurrency', type=int, default=50, help='concurrent clients against the async view')
+    parser.add_argument('--wsgi-workers', type=int, default=4, help='sync workers serving the wsgi view')
+    parser.add_argument('--latency', type=float, default=20.0, help='simulated database round trip per statement, in ms')
+    parser.add_argument('--path', default='/idsdetails/')
+    parser.add_argument('--query', default=DEFAULT_QUERY)
+    parser.add_argument('--username', help='Login used to sign the JWT (default: first user)')
+    parser.add_argument('--mode', choices=('wsgi', 'asgi'), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.mode:
+        result = run_asgi(args) if args.mode == 'asgi' else run_wsgi(args)
+        print(json.dumps(result))
+        return
+
+    # Run each mode in a fresh process: the URLconf picks its views at import time
+    argv = sys.argv[1:] if argv is None else argv
+    results = []
+    for mode in ('wsgi', 'asgi'):
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.asgi_vs_wsgi', *argv, '--mode', mode],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(json.dumps(results, indent=2))
+    wsgi, asgi = results
+    if wsgi['requests_per_second'] and asgi['requests_per_second']:
+        print(f"asgi/wsgi throughput: {asgi['requests_per_second'] / wsgi['requests_per_second']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
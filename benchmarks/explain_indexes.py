@@ -0,0 +1,149 @@
+"""
+EXPLAIN check: the hot idscore queries must be planned on their dedicated indexes.
+
+Runs against the configured database after `manage.py migrate` and
+`manage.py seed_idscore` (small tables are cheaper to scan, so use at least
+the 100k scale for meaningful plans):
+
+    python manage.py seed_idscore --scale 100k --flush
+    python -m benchmarks.explain_indexes
+    python -m benchmarks.explain_indexes --verbose
+
+Exits with status 1 when a query is not planned on one of its expected
+indexes, printing the plan it got instead.
+"""
+import argparse
+import datetime
+import sys
+
+from benchmarks.idscore_schema import setup_django
+
+
+class IndexCheck:
+    """
+    A queryset taken from a hot path and the indexes (any of) its plan must use.
+    """
+
+    def __init__(self, name, queryset, indexes, vendors=None):
+        self.name = name
+        self.queryset = queryset
+        self.indexes = indexes
+        # Databases the index matters on; None for all of them
+        self.vendors = vendors
+
+
+def checks():
+    from idscore.models import LOW_STOCK, Batch, Inventory, Placement, Product
+
+    return (
+        # allProducts / products connection; like the placements page, only checked on Postgres
+        # since SQLite already stores rows in primary key order
+        IndexCheck('active products page', lambda ids: Product.objects.filter(rowstatus=True).order_by('productId')[:50],
+                   ('product_active_idx',), vendors=('postgresql',)),
+        # placementDetails prefetch of product_queryset
+        IndexCheck('active placements of products', lambda ids: Placement.objects.filter(rowstatus=True, productId__in=ids['products']),
+                   ('placement_active_product_idx', 'placement_product_status_idx')),
+        # placements connection
+        IndexCheck('active placements page', lambda ids: Placement.objects.filter(rowstatus=True).order_by('placementId')[:50],
+                   ('placement_active_idx',), vendors=('postgresql',)),
+        # createPlacement / updatePlacement stock totals
+        IndexCheck('placements of a product in a warehouse',
+                   lambda ids: Placement.objects.filter(productId=ids['product'], warehouseId=ids['warehouse']),
+                   ('placement_product_wh_idx',)),
+        # createProduct / createInventory get_or_create, placement inventory upsert; SQLite names the
+        # index of a unique constraint itself
+        IndexCheck('inventory of a product in a warehouse',
+                   lambda ids: Inventory.objects.filter(productId=ids['product'], warehouseId=ids['warehouse']),
+                   ('inventory_product_wh_uniq', 'sqlite_autoindex_idscore_inventory')),
+        IndexCheck('active batches of a product', lambda ids: Batch.objects.filter(productId=ids['product'], rowstatus=True),
+                   ('batch_active_product_idx', 'batch_product_status_idx')),
+        # lowStockItems, without and with a warehouse
+        IndexCheck('low stock inventories page', lambda ids: Inventory.objects.filter(LOW_STOCK).order_by('inventoryId')[:50],
+                   ('inventory_low_stock_idx',)),
+        IndexCheck('low stock inventories of a warehouse',
+                   lambda ids: Inventory.objects.filter(LOW_STOCK, warehouseId=ids['warehouse']).order_by('inventoryId')[:50],
+                   ('inventory_low_stock_wh_idx',)),
+        # expiringBatches
+        IndexCheck('active batches expiring soon',
+                   lambda ids: Batch.objects.filter(rowstatus=True, expiryDate__gte=ids['today'], expiryDate__lte=ids['today'] + datetime.timedelta(days=30))
+                   .order_by('expiryDate', 'batchId')[:50],
+                   ('batch_active_expiry_idx',)),
+        # binContents and aisleMap
+        IndexCheck('active placements of a bin',
+                   lambda ids: Placement.objects.filter(rowstatus=True, warehouseId=ids['warehouse'], aile=ids['aile'], bin=ids['bin']),
+                   ('placement_active_bin_idx',)),
+        IndexCheck('active placements of a warehouse by bin',
+                   lambda ids: Placement.objects.filter(rowstatus=True, warehouseId=ids['warehouse']).order_by('aile', 'bin', 'placementId'),
+                   ('placement_active_bin_idx',)),
+    )
+
+
+# Products of one products page, sampled as at most 1/PAGE_SHARE of the catalogue
+PAGE_SIZE = 50
+PAGE_SHARE = 20
+
+
+def sample_ids():
+    from idscore.models import Placement, Product
+
+    placement = Placement.objects.filter(rowstatus=True).order_by('pk').values('productId_id', 'warehouseId_id', 'aile', 'bin').first()
+    if placement is None:
+        raise SystemExit("The database has no placements; run `python manage.py seed_idscore` first.")
+    # A page is a small slice of a production catalogue; of a small seeded one it is a large part of the
+    # placements, which any planner rightly reads with a table scan. Keep the slice as selective.
+    page_size = max(1, min(PAGE_SIZE, Product.objects.filter(rowstatus=True).count() // PAGE_SHARE))
+    return {
+        'product': placement['productId_id'],
+        'warehouse': placement['warehouseId_id'],
+        'aile': placement['aile'],
+        'bin': placement['bin'],
+        'products': list(Product.objects.filter(rowstatus=True).order_by('pk').values_list('pk', flat=True)[:page_size]),
+        'today': datetime.date.today(),
+    }
+
+
+def run(args):
+    setup_django()
+    from django.db import connection
+
+    # Plans depend on up-to-date statistics, which a freshly seeded database lacks
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        if args.no_seqscan and connection.vendor == 'postgresql':
+            cursor.execute('SET enable_seqscan = off')
+
+    ids = sample_ids()
+    failures = 0
+    for check in checks():
+        if check.vendors and connection.vendor not in check.vendors:
+            print(f"skip  {check.name:<40} (only checked on {', '.join(check.vendors)})")
+            continue
+        plan = check.queryset(ids).explain()
+        used = [index for index in check.indexes if index in plan]
+        if used:
+            print(f"ok    {check.name:<40} {used[0]}")
+        else:
+            failures += 1
+            print(f"FAIL  {check.name:<40} expected one of {', '.join(check.indexes)}")
+        if args.verbose or not used:
+            print('      ' + plan.replace('\n', '\n      '))
+
+    if failures:
+        print(f"{failures} queries do not use their index on {connection.vendor}.", file=sys.stderr)
+        sys.exit(1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--verbose', action='store_true', help='print every plan, not only the failing ones')
+    parser.add_argument('--no-seqscan', action='store_true',
+                        help='Postgres only: disable sequential scans, to check an index is usable on a small dataset')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    run(parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
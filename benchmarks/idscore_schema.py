@@ -0,0 +1,312 @@
+"""
+Latency, SQL query count and peak memory of every idscore_schema operation.
+
+Runs against the configured database (point DATABASE_URL at a local copy)
+after it has been filled with `manage.py seed_idscore`:
+
+    python manage.py seed_idscore --scale 100k --flush
+    python -m benchmarks.idscore_schema --iterations 20 --output bench.json
+    python -m benchmarks.idscore_schema --compare bench-main.json bench.json
+
+Mutations run inside a transaction that is rolled back, so every iteration
+sees the same data and the dataset is left untouched.
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+PLACEMENT_FIELDS = 'warehouseId warehouseName placements { placementId placementQuantity aile bin batches { batchId expiryDate quantity } }'
+PRODUCT_FIELDS = (
+    'productId productCode productName categoryName reOrderPoint brand images '
+    'inventoryDetails { inventoryId warehouseName quantityAvailable minStockLevel } '
+    f'placementDetails {{ {PLACEMENT_FIELDS} }}'
+)
+
+
+class BenchOperation:
+    """
+    One operation to time; `variables` is called with the ids sampled from
+    the dataset.
+    """
+
+    def __init__(self, name, query, variables=None, mutation=False):
+        self.name = name
+        self.query = query
+        self.variables = variables or (lambda ids: {})
+        self.mutation = mutation
+
+
+def placement_inputs(ids, count=2):
+    return [
+        {'warehouseId': ids['warehouses'][i % len(ids['warehouses'])], 'placementQuantity': '5', 'aile': 'A01', 'bin': f'B{i:03d}'}
+        for i in range(count)
+    ]
+
+
+OPERATIONS = (
+    # Queries
+    BenchOperation('allProducts', f'{{ allProducts {{ {PRODUCT_FIELDS} }} }}'),
+    BenchOperation('allProducts.names', '{ allProducts { productId productName } }'),
+    BenchOperation('productResponse', f'query ($id: Int) {{ productResponse(productId: $id) {{ {PRODUCT_FIELDS} }} }}',
+                   lambda ids: {'id': ids['product']}),
+    BenchOperation('products.first50', f'{{ products(first: 50) {{ totalCount edges {{ cursor node {{ {PRODUCT_FIELDS} }} }} }} }}'),
+    BenchOperation('allCategories', '{ allCategories { categoryId name image } }'),
+    BenchOperation('category', 'query ($id: Int!) { category(id: $id) { categoryId name } }', lambda ids: {'id': ids['category']}),
+    BenchOperation('allInventories', '{ allInventories { inventoryId quantityAvailable warehouseName productId { productName } } }'),
+    BenchOperation('inventory', 'query ($id: Int!) { inventory(id: $id) { inventoryId quantityAvailable warehouseName } }',
+                   lambda ids: {'id': ids['inventory']}),
+    BenchOperation('inventoryByProduct', 'query ($id: Int!) { inventoryByProduct(productId: $id) { inventoryId quantityAvailable warehouseName } }',
+                   lambda ids: {'id': ids['product']}),
+    BenchOperation('allWarehouses', '{ allWarehouses { warehouseId warehouseName location { locationName } } }'),
+    BenchOperation('warehouse', 'query ($id: ID!) { warehouse(id: $id) { warehouseId warehouseName location { locationName } } }',
+                   lambda ids: {'id': ids['warehouses'][0]}),
+    BenchOperation('allLocations', '{ allLocations { locationId locationName locationAddress } }'),
+    BenchOperation('location', 'query ($id: ID!) { location(id: $id) { locationId locationName } }', lambda ids: {'id': ids['location']}),
+    BenchOperation('placementDetails', f'{{ placementDetails {{ {PLACEMENT_FIELDS} }} }}'),
+    BenchOperation('placementById', f'query ($id: Int!) {{ placementById(placementId: $id) {{ {PLACEMENT_FIELDS} }} }}',
+                   lambda ids: {'id': ids['placement']}),
+    BenchOperation('placements.first100', '{ placements(first: 100) { edges { node { placementId placementQuantity aile bin } } } }'),
+
+    # Mutations (rolled back)
+    BenchOperation(
+        'createPlacement',
+        f'mutation ($productId: Int!, $placements: [PlacementInputType]!) {{ createPlacement(productId: $productId, quantity: "10", '
+        f'manufactureDate: "2024-01-01", expiryDate: "2026-01-01", placements: $placements) {{ statusCode message placementDetails {{ {PLACEMENT_FIELDS} }} }} }}',
+        lambda ids: {'productId': ids['product'], 'placements': placement_inputs(ids)},
+        mutation=True,
+    ),
+    BenchOperation(
+        'updatePlacement',
+        'mutation ($placementId: Int!, $productId: Int!, $placements: [PlacementInputType]!) { updatePlacement(placementId: $placementId, '
+        'productId: $productId, quantity: "10", placements: $placements) { statusCode message } }',
+        lambda ids: {'placementId': ids['placement'], 'productId': ids['placement_product'],
+                     'placements': [{**placement_inputs(ids, 1)[0], 'placementId': ids['placement']}]},
+        mutation=True,
+    ),
+    BenchOperation('deletePlacement', 'mutation ($id: Int!) { deletePlacement(placementId: $id) { statusCode message } }',
+                   lambda ids: {'id': ids['placement']}, mutation=True),
+    BenchOperation(
+        'createProduct',
+        'mutation ($category: String!, $inventory: [InventoryInputType]!) { createProduct(productCode: "BENCH-1", productName: "Bench", '
+        'productDescription: "Benchmark product", productCategory: $category, reOrderPoint: 5, images: ["a.png"], '
+        'qrCode: "QR-BENCH-1", brand: "Bench", weight: "1kg", dimensions: "10x10x10", '
+        'inventoryDetails: $inventory) { statusCode message } }',
+        lambda ids: {'category': str(ids['category']), 'inventory': [
+            {'warehouseId': warehouse, 'minStockLevel': '5', 'maxStockLevel': '100', 'quantityAvailable': '10', 'invreOrderPoint': 5}
+            for warehouse in ids['warehouses'][:3]
+        ]},
+        mutation=True,
+    ),
+    BenchOperation('updateProduct', 'mutation ($id: ID!) { updateProduct(productId: $id, productName: "Renamed") { statusCode message } }',
+                   lambda ids: {'id': ids['product']}, mutation=True),
+    BenchOperation('deleteProduct', 'mutation ($id: ID!) { deleteProduct(productId: $id) { statusCode message } }',
+                   lambda ids: {'id': ids['product']}, mutation=True),
+    BenchOperation('createInventory', 'mutation ($p: ID!, $w: ID!) { createInventory(productId: $p, warehouseId: $w, minStockLevel: "1", '
+                   'maxStockLevel: "9", quantityAvailable: "3") { statusCode message } }',
+                   lambda ids: {'p': ids['product'], 'w': ids['warehouses'][0]}, mutation=True),
+    BenchOperation('updateInventory', 'mutation ($id: ID!) { updateInventory(inventoryId: $id, quantityAvailable: "7") { statusCode message } }',
+                   lambda ids: {'id': ids['inventory']}, mutation=True),
+    BenchOperation('createCategory', 'mutation { createCategory(name: "Bench category") { statusCode message } }', mutation=True),
+    BenchOperation('createLocation', 'mutation { createLocation(locationName: "Bench", locationAddress: "Bench") { statusCode message } }',
+                   mutation=True),
+    BenchOperation('createWarehouse', 'mutation ($id: ID!) { createWarehouse(locationId: $id, warehouseName: "Bench") { statusCode message } }',
+                   lambda ids: {'id': ids['location']}, mutation=True),
+)
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'IDS_GraphQL.settings')
+    import django
+    django.setup()
+
+
+def sample_ids():
+    from idscore.models import Category, Inventory, Location, Placement, Product, Warehouse
+
+    placement = Placement.objects.order_by('pk').values('pk', 'productId_id').first()
+    if placement is None:
+        raise SystemExit("The database has no placements; run `python manage.py seed_idscore` first.")
+    return {
+        # The first seeded product is the most popular one, i.e. the widest fan-out
+        'product': Product.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'category': Category.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'inventory': Inventory.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'location': Location.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'warehouses': list(Warehouse.objects.order_by('pk').values_list('pk', flat=True)[:4]),
+        'placement': placement['pk'],
+        'placement_product': placement['productId_id'],
+    }
+
+
+def dataset_counts():
+    from idscore.models import Batch, Category, Inventory, Location, Placement, Product, Warehouse
+
+    return {model.__name__: model.objects.count() for model in (Category, Location, Warehouse, Product, Inventory, Batch, Placement)}
+
+
+def make_request():
+    from django.test import RequestFactory
+    from graphql_jwt.shortcuts import get_token
+    from idscore.seeding import get_seed_user
+
+    user = get_seed_user()
+    request = RequestFactory().post('/idsdetails/', HTTP_AUTHORIZATION=f'Bearer {get_token(user)}')
+    request.user = user
+    return request
+
+
+def execute_once(schema, operation, variables, request_factory):
+    """
+    Runs the operation once on a fresh request (so DataLoader caches do not
+    carry over) and returns (seconds, queries, errors).
+    """
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    request = request_factory()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        if operation.mutation:
+            with transaction.atomic():
+                result = schema.execute(operation.query, variable_values=variables, context_value=request)
+                transaction.set_rollback(True)
+        else:
+            result = schema.execute(operation.query, variable_values=variables, context_value=request)
+        elapsed = time.perf_counter() - start
+
+    errors = [str(error).splitlines()[0] for error in result.errors or ()]
+    data = result.data or {}
+    # Mutations report failures through statusCode instead of GraphQL errors
+    for payload in data.values():
+        if isinstance(payload, dict) and payload.get('statusCode') not in (None, 200, 201):
+            errors.append(payload.get('message') or f"statusCode {payload.get('statusCode')}")
+    return elapsed, len(queries.captured_queries), errors
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+def bench_operation(schema, operation, ids, request_factory, iterations, warmup):
+    variables = operation.variables(ids)
+
+    for _ in range(warmup):
+        execute_once(schema, operation, variables, request_factory)
+
+    latencies, query_counts, errors = [], [], []
+    for _ in range(iterations):
+        elapsed, queries, iteration_errors = execute_once(schema, operation, variables, request_factory)
+        latencies.append(elapsed)
+        query_counts.append(queries)
+        errors.extend(iteration_errors)
+
+    # Measured apart from the timed runs: tracemalloc slows allocation down considerably
+    tracemalloc.start()
+    execute_once(schema, operation, variables, request_factory)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'queries': max(query_counts),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'errors': sorted(set(errors))[:5],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    setup_django()
+    from django.db import connection
+    from idscore.schema import idscore_schema
+
+    ids = sample_ids()
+    selected = [operation for operation in OPERATIONS if not args.only or operation.name in args.only]
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'dataset': dataset_counts(),
+            'iterations': args.iterations,
+        },
+        'operations': {},
+    }
+
+    for operation in selected:
+        result = bench_operation(idscore_schema, operation, ids, make_request, args.iterations, args.warmup)
+        results['operations'][operation.name] = result
+        print(
+            f"{operation.name:<22} p50 {result['p50_ms']:>10.2f} ms  p95 {result['p95_ms']:>10.2f} ms  "
+            f"queries {result['queries']:>5}  peak {result['peak_memory_kb']:>10.1f} KiB"
+            + (f"  errors: {result['errors'][0]}" if result['errors'] else ''),
+            file=sys.stderr,
+        )
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+def compare(baseline_path, current_path):
+    """
+    Prints the change of every metric between two result files.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    print(f"{'operation':<22} {'p50 ms':>21} {'p95 ms':>21} {'queries':>13} {'peak KiB':>23}")
+    for name, now in current['operations'].items():
+        before = baseline['operations'].get(name)
+        if before is None:
+            print(f"{name:<22} (new)")
+            continue
+        cells = []
+        for key, width in (('p50_ms', 21), ('p95_ms', 21), ('queries', 13), ('peak_memory_kb', 23)):
+            delta = now[key] - before[key]
+            ratio = f" {delta / before[key]:+.0%}" if before[key] and key != 'queries' else ''
+            cells.append(f"{before[key]:g} -> {now[key]:g}{ratio}".rjust(width))
+        print(f"{name:<22} " + ' '.join(cells))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=10, help='timed runs per operation')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per operation')
+    parser.add_argument('--only', nargs='+', metavar='OPERATION', help='benchmark only these operations')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='compare two result files and exit')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
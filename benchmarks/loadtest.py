@@ -0,0 +1,416 @@
+"""
+Load test: concurrent clients issuing a weighted mix of the real GraphQL operations.
+
+Drives the app either in-process through Django's test client (`--target client`,
+the default) or over HTTP against a running server (`--target http://127.0.0.1:8000`).
+Each client logs in once to get a JWT, then loops picking operations by weight
+until the duration or request budget runs out. Reports throughput, latency
+percentiles and error rate per operation.
+
+    python manage.py seed_idscore --scale 1k
+    python -m benchmarks.loadtest --clients 16 --duration 30
+    python -m benchmarks.loadtest --target http://127.0.0.1:8000 --clients 64 --mix allProducts=5 searchword=5 upload=0
+
+createPlacement writes real rows, and upload sends the image to the Gemini API
+configured for Object_Detection (set its weight to 0 to leave it out).
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MIX = {
+    'login': 5,
+    'allProducts': 30,
+    'productResponse': 20,
+    'createPlacement': 5,
+    'searchword': 25,
+    'upload': 1,
+}
+
+
+## Transports
+class ClientTransport:
+    """
+    In-process requests through django.test.Client; one instance per client thread.
+    """
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def post_json(self, path, body, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        response = self.client.post(path, json.dumps(body), content_type='application/json', **headers)
+        return response.status_code, response.content
+
+    def post_multipart(self, path, fields, files, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        data = dict(fields)
+        for name, (filename, content, content_type) in files.items():
+            upload = io.BytesIO(content)
+            upload.name = filename
+            data[name] = upload
+        response = self.client.post(path, data, **headers)
+        return response.status_code, response.content
+
+    def close(self):
+        from django.db import connection
+        connection.close()
+
+
+class HTTPTransport:
+    """
+    Requests over HTTP to a running server (runserver, gunicorn, uvicorn...).
+    """
+
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _send(self, path, data, content_type, token):
+        request = urllib.request.Request(self.base_url + path, data=data, method='POST')
+        request.add_header('Content-Type', content_type)
+        if token:
+            request.add_header('Authorization', f'Bearer {token}')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except (urllib.error.URLError, OSError) as e:
+            return 0, str(e).encode()
+
+    def post_json(self, path, body, token=None):
+        return self._send(path, json.dumps(body).encode(), 'application/json', token)
+
+    def post_multipart(self, path, fields, files, token=None):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, (filename, content, content_type) in files.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n'
+            )
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return self._send(path, b''.join(parts), f'multipart/form-data; boundary={boundary}', token)
+
+    def close(self):
+        pass
+
+
+## Operations
+def failed(status, content):
+    """
+    True when the response is an HTTP error, carries GraphQL errors, or a
+    mutation payload reports a non-2xx statusCode.
+    """
+    if status != 200:
+        return True
+    try:
+        body = json.loads(content)
+    except ValueError:
+        return True
+    if body.get('errors'):
+        return True
+    for payload in (body.get('data') or {}).values():
+        if isinstance(payload, dict) and payload.get('statusCode') not in (None, 200, 201):
+            return True
+    return False
+
+
+def sample_image():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (180, 180, 180)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class LoadContext:
+    """
+    Credentials and ids shared by every client, fetched once before the run.
+    """
+
+    def __init__(self, args, transport):
+        self.username = args.username
+        self.password = args.password
+        self.search_words = args.search_words
+        self.image = sample_image()
+
+        token = self.login(transport)
+        if token is None:
+            raise SystemExit(f"Cannot log in as '{self.username}'; run `python manage.py seed_idscore` or pass --username/--password.")
+
+        status, content = transport.post_json(
+            '/idsdetails/', {'query': '{ products(first: 50) { edges { node { productId } } } allWarehouses { warehouseId } }'}, token
+        )
+        data = json.loads(content).get('data') or {}
+        self.product_ids = [int(edge['node']['productId']) for edge in (data.get('products') or {}).get('edges', [])]
+        self.warehouse_ids = [int(warehouse['warehouseId']) for warehouse in data.get('allWarehouses') or []]
+        if not self.product_ids or not self.warehouse_ids:
+            raise SystemExit("No products or warehouses found; run `python manage.py seed_idscore` first.")
+
+    def login(self, transport):
+        status, content = transport.post_json('/login/', {
+            'query': 'mutation ($u: String!, $p: String!) { login(username: $u, password: $p) { token } }',
+            'variables': {'u': self.username, 'p': self.password},
+        })
+        if failed(status, content):
+            return None
+        return json.loads(content)['data']['login']['token']
+
+
+def op_login(context, transport, token, rng):
+    status, content = transport.post_json('/login/', {
+        'query': 'mutation ($u: String!, $p: String!) { login(username: $u, password: $p) { success token } }',
+        'variables': {'u': context.username, 'p': context.password},
+    })
+    return status, content
+
+
+def op_all_products(context, transport, token, rng):
+    return transport.post_json('/idsdetails/', {
+        'query': '{ allProducts { productId productName categoryName inventoryDetails { warehouseName quantityAvailable } } }',
+    }, token)
+
+
+def op_product_response(context, transport, token, rng):
+    return transport.post_json('/idsdetails/', {
+        'query': 'query ($id: Int) { productResponse(productId: $id) { productName inventoryDetails { warehouseName quantityAvailable } '
+                 'placementDetails { warehouseName placements { aile bin placementQuantity batches { batchId expiryDate } } } } }',
+        'variables': {'id': rng.choice(context.product_ids)},
+    }, token)
+
+
+def op_create_placement(context, transport, token, rng):
+    return transport.post_json('/idsdetails/', {
+        'query': 'mutation ($productId: Int!, $placements: [PlacementInputType]!) { createPlacement(productId: $productId, '
+                 'quantity: "1", placements: $placements) { statusCode message } }',
+        'variables': {
+            'productId': rng.choice(context.product_ids),
+            'placements': [{'warehouseId': rng.choice(context.warehouse_ids), 'placementQuantity': '1', 'aile': 'LT', 'bin': 'LOAD'}],
+        },
+    }, token)
+
+
+def op_searchword(context, transport, token, rng):
+    return transport.post_json('/searchword/', {
+        'query': 'query ($word: String) { matchingProducts(searchWord: $word) { productId item } }',
+        'variables': {'word': rng.choice(context.search_words)},
+    })
+
+
+def op_upload(context, transport, token, rng):
+    # graphql-multipart-request-spec, as read by graphene-file-upload
+    operations = {
+        'query': 'mutation ($file: Upload!) { uploadAndProcessImage(file: $file) { objects matchedItems { productId } } }',
+        'variables': {'file': None},
+    }
+    return transport.post_multipart(
+        '/upload/',
+        {'operations': json.dumps(operations), 'map': json.dumps({'0': ['variables.file']})},
+        {'0': ('load-test.png', context.image, 'image/png')},
+        token,
+    )
+
+
+OPERATIONS = {
+    'login': op_login,
+    'allProducts': op_all_products,
+    'productResponse': op_product_response,
+    'createPlacement': op_create_placement,
+    'searchword': op_searchword,
+    'upload': op_upload,
+}
+
+
+## Runner
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, name, elapsed, error):
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            if error:
+                self.errors[name] += 1
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+def summarize(name, latencies, errors, elapsed):
+    return {
+        'operation': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'error_rate': round(errors / len(latencies), 4) if latencies else 0.0,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+    }
+
+
+def run_client(index, args, make_transport, context, mix, deadline, budget, recorder):
+    rng = random.Random(args.seed + index)
+    names, weights = zip(*mix.items())
+    transport = make_transport()
+    token = context.login(transport)
+    try:
+        while time.perf_counter() < deadline and budget.take():
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status, content = OPERATIONS[name](context, transport, token, rng)
+                error = failed(status, content)
+            except Exception:
+                error = True
+            recorder.add(name, time.perf_counter() - start, error)
+    finally:
+        transport.close()
+
+
+class Budget:
+    """
+    Shared request counter; unlimited when `total` is None.
+    """
+
+    def __init__(self, total):
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def parse_mix(entries):
+    mix = dict(DEFAULT_MIX)
+    for entry in entries or ():
+        name, _, weight = entry.partition('=')
+        if name not in OPERATIONS or not weight:
+            raise SystemExit(f"Invalid --mix entry '{entry}'; expected one of {sorted(OPERATIONS)} as name=weight.")
+        mix[name] = float(weight)
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+    if not mix:
+        raise SystemExit("Every operation has weight 0.")
+    return mix
+
+
+def run(args):
+    if args.target == 'client':
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'IDS_GraphQL.settings')
+        import django
+        django.setup()
+        # The test client bypasses ALLOWED_HOSTS checks only for 'testserver'
+        from django.conf import settings
+        if 'testserver' not in settings.ALLOWED_HOSTS and '*' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        # One profile line per request would drown the report
+        logging.getLogger('IDS_GraphQL.profile').setLevel(logging.WARNING)
+        make_transport = ClientTransport
+    else:
+        make_transport = lambda: HTTPTransport(args.target, timeout=args.timeout)
+
+    mix = parse_mix(args.mix)
+    setup_transport = make_transport()
+    context = LoadContext(args, setup_transport)
+    setup_transport.close()
+
+    recorder = Recorder()
+    budget = Budget(args.requests)
+    start = time.perf_counter()
+    deadline = start + args.duration if args.duration else float('inf')
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        futures = [
+            pool.submit(run_client, index, args, make_transport, context, mix, deadline, budget, recorder)
+            for index in range(args.clients)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    report = {
+        'target': args.target,
+        'clients': args.clients,
+        'seconds': round(elapsed, 3),
+        'mix': mix,
+        'total': summarize('total', all_latencies, sum(recorder.errors.values()), elapsed) if all_latencies else None,
+        'operations': [
+            summarize(name, recorder.latencies[name], recorder.errors[name], elapsed)
+            for name in mix if recorder.latencies[name]
+        ],
+    }
+    return report
+
+
+def print_report(report):
+    print(f"{report['clients']} clients against {report['target']} for {report['seconds']} s", file=sys.stderr)
+    print(f"{'operation':<16} {'requests':>8} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=sys.stderr)
+    for row in report['operations'] + ([report['total']] if report['total'] else []):
+        print(
+            f"{row['operation']:<16} {row['requests']:>8} {row['throughput_rps']:>8} {row['error_rate']:>7.1%} "
+            f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}",
+            file=sys.stderr,
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', default='client', help="'client' for the in-process test client, or a server base URL")
+    parser.add_argument('--clients', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run (0 for no limit)')
+    parser.add_argument('--requests', type=int, help='stop after this many requests in total')
+    parser.add_argument('--mix', nargs='+', metavar='NAME=WEIGHT', help=f'operation weights (default {DEFAULT_MIX})')
+    parser.add_argument('--username', default='seed', help='account used to log in (default: the seed_idscore user)')
+    parser.add_argument('--password', default='seed')
+    parser.add_argument('--search-words', nargs='+', default=['bolt', 'nut', 'screw', 'washer', 'bearing'])
+    parser.add_argument('--timeout', type=float, default=60.0, help='HTTP timeout per request, in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the operation mix')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args(argv)
+    if not args.duration and not args.requests:
+        parser.error("Pass --duration or --requests.")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    print_report(report)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
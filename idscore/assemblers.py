@@ -0,0 +1,160 @@
+import json
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_camel_case
+from .models import Inventory, Placement
+
+
+## Product response assembler shared by allProducts and productResponse
+
+# Product column backing each scalar ProductResponseType field
+PRODUCT_COLUMNS = {
+    'productId': 'productId',
+    'productCode': 'productCode',
+    'qrCode': 'qrCode',
+    'productName': 'productName',
+    'productDescription': 'productDescription',
+    'productCategory': 'productCategory',
+    'category_name': 'productCategory',
+    'reOrderPoint': 'reOrderPoint',
+    'brand': 'brand',
+    'weight': 'weight',
+    'dimensions': 'dimensions',
+    'images': 'images',
+    'createdUser': 'createdUser',
+    'modifiedUser': 'modifiedUser',
+    'createdTime': 'createdTime',
+    'modifiedTime': 'modifiedTime',
+    'rowstatus': 'rowstatus',
+}
+
+# Sub-trees built from related tables
+PRODUCT_RELATIONS = ('inventoryDetails', 'placementDetails')
+
+ALL_PRODUCT_FIELDS = frozenset(PRODUCT_COLUMNS) | frozenset(PRODUCT_RELATIONS)
+
+
+def requested_product_fields(selection):
+    """
+    Maps a ProductResponseType selection (see `selection_tree`) to the
+    response fields that have to be built. `None` means every field.
+    """
+    if selection is None:
+        return ALL_PRODUCT_FIELDS
+    return frozenset(name for name in ALL_PRODUCT_FIELDS if to_camel_case(name) in selection)
+
+
+def product_queryset(queryset, fields=ALL_PRODUCT_FIELDS, warehouseId=None):
+    """
+    Restricts `queryset` to the product columns behind `fields` and attaches
+    the inventories and active placements (with their warehouse and batch)
+    only when those sub-trees are requested, so a whole page of products is
+    loaded in a fixed number of queries. `warehouseId` limits both to one
+    warehouse.
+    """
+    columns = {PRODUCT_COLUMNS[name] for name in fields if name in PRODUCT_COLUMNS}
+    if 'category_name' in fields:
+        # The category name comes from a join rather than a second query
+        queryset = queryset.select_related('productCategory')
+        columns.add('productCategory__name')
+    queryset = queryset.only('productId', *columns)
+
+    inventories = Inventory.objects.select_related('warehouseId')
+    placements = Placement.objects.filter(rowstatus=True).select_related('warehouseId', 'batchId')
+    if warehouseId is not None:
+        inventories = inventories.filter(warehouseId=warehouseId)
+        placements = placements.filter(warehouseId=warehouseId)
+
+    prefetches = []
+    if 'inventoryDetails' in fields:
+        prefetches.append(Prefetch('inventory_set', queryset=inventories))
+    if 'placementDetails' in fields:
+        prefetches.append(Prefetch('placement_set', queryset=placements))
+
+    return queryset.prefetch_related(*prefetches)
+
+
+def assemble_product_responses(products, fields=ALL_PRODUCT_FIELDS):
+    """
+    Builds the ProductResponseType payloads for `products`.
+
+    Args:
+    - products: Product queryset prepared with `product_queryset`.
+    - fields: Response fields to build, as returned by `requested_product_fields`.
+
+    Returns:
+    - responses: List of dictionaries, one per product, in queryset order.
+    """
+    return [product_response(product, fields) for product in products]
+
+
+def product_response(product, fields=ALL_PRODUCT_FIELDS):
+    # Only touch loaded columns; reading a deferred one would cost a query per product
+    response = {
+        name: getattr(product, PRODUCT_COLUMNS[name])
+        for name in fields if name in PRODUCT_COLUMNS and name not in ('productCategory', 'category_name')
+    }
+
+    if 'productCategory' in fields:
+        response['productCategory'] = str(product.productCategory_id) if product.productCategory_id is not None else None
+    if 'category_name' in fields:
+        category = product.productCategory
+        response['category_name'] = category.name if category else None
+    if 'images' in fields:
+        response['images'] = json.loads(product.images) if isinstance(product.images, str) else product.images
+    if 'inventoryDetails' in fields:
+        response['inventoryDetails'] = [inventory_detail(inventory) for inventory in product.inventory_set.all()]
+    if 'placementDetails' in fields:
+        response['placementDetails'] = placement_details(product.placement_set.all())
+
+    return response
+
+
+def inventory_detail(inventory):
+    return {
+        'inventoryId': inventory.inventoryId,
+        'warehouseId': inventory.warehouseId_id,
+        'warehouseName': inventory.warehouseId.warehouseName,
+        'minStockLevel': inventory.minStockLevel,
+        'maxStockLevel': inventory.maxStockLevel,
+        'quantityAvailable': inventory.quantityAvailable,
+        'invreOrderPoint': inventory.invreOrderPoint,
+    }
+
+
+def placement_details(placements):
+    # Group the product's placements by warehouse
+    warehouse_placements = {}
+
+    for placement in placements:
+        warehouseId = placement.warehouseId_id
+        if warehouseId not in warehouse_placements:
+            warehouse_placements[warehouseId] = {
+                'warehouseId': warehouseId,
+                'warehouseName': placement.warehouseId.warehouseName,
+                'placements': []
+            }
+
+        # Each placement carries the single batch it was created from, if still active
+        batch = placement.batchId
+        batches = []
+        if batch.rowstatus:
+            batches.append({
+                'batchId': batch.batchId,
+                'expiryDate': batch.expiryDate,
+                'manufactureDate': batch.manufactureDate,
+                'quantity': batch.quantity,
+                'createdUser': batch.createdUser,
+                'modifiedUser': batch.modifiedUser,
+            })
+
+        warehouse_placements[warehouseId]['placements'].append({
+            'placementId': placement.placementId,
+            'productId': placement.productId_id,
+            'warehouseId': warehouseId,
+            'placementQuantity': placement.placementQuantity,
+            'aile': placement.aile,
+            'bin': placement.bin,
+            'batches': batches,
+        })
+
+    return list(warehouse_placements.values())
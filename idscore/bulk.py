@@ -0,0 +1,240 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Category, Inventory, Product, StockMovement, Warehouse
+from .stock import record_stock_changes
+
+# Products written per transaction
+CHUNK_SIZE = 1_000
+
+# Product columns an upsert row may set, with the value used for new products when omitted
+PRODUCT_DEFAULTS = {
+    'qrCode': '',
+    'productName': None,  # required for new products
+    'productDescription': None,  # required for new products
+    'reOrderPoint': 0,
+    'brand': '',
+    'weight': '',
+    'dimensions': '',
+    'images': '[]',  # stored as JSON text, as createProduct does
+}
+
+
+## Set-based product upsert
+class BulkUpsertResult:
+    """
+    Outcome of `bulk_upsert_products`: counts of written products and one
+    (index, productCode, message) entry per rejected row.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def fail(self, index, row, message):
+        self.errors.append((index, row.get('productCode'), message))
+
+
+def resolve_categories(rows, result):
+    """
+    Maps every productCategory value of `rows` (an id, or a name) to a
+    Category id with a fixed number of queries. Rows naming a category that
+    does not exist yet keep the name in `newCategory`; write_chunk creates
+    it with the products. Rows with an unknown category id are rejected.
+    """
+    ids, names = set(), set()
+    for row in rows.values():
+        value = str(row['productCategory']).strip()
+        (ids if value.isdigit() else names).add(value)
+
+    known = set(Category.objects.filter(pk__in=[int(value) for value in ids]).values_list('pk', flat=True)) if ids else set()
+    resolved = {value: int(value) for value in ids if int(value) in known}
+    if names:
+        resolved.update(Category.objects.filter(name__in=names).values_list('name', 'categoryId'))
+
+    for index, row in list(rows.items()):
+        value = str(row['productCategory']).strip()
+        if value in resolved:
+            row['productCategory'] = resolved[value]
+        elif value in names:
+            row['productCategory'] = None
+            row['newCategory'] = value
+        else:
+            result.fail(index, row, f"Category with id {value} does not exist.")
+            del rows[index]
+
+
+def create_categories(chunk):
+    # Categories named by the chunk that did not exist when the rows were validated
+    names = {row['newCategory'] for row in chunk if row.get('newCategory')}
+    if not names:
+        return
+    # ignore_conflicts: another request may create the same category meanwhile
+    Category.objects.bulk_create([Category(name=name) for name in sorted(names)], ignore_conflicts=True)
+    created = dict(Category.objects.filter(name__in=names).values_list('name', 'categoryId'))
+    for row in chunk:
+        if row.get('newCategory'):
+            row['productCategory'] = created[row['newCategory']]
+
+
+def check_warehouses(rows, result):
+    warehouse_ids = {detail['warehouseId'] for row in rows.values() for detail in row['inventoryDetails']}
+    known = set(Warehouse.objects.filter(pk__in=warehouse_ids).values_list('pk', flat=True))
+    for index, row in list(rows.items()):
+        unknown = sorted({detail['warehouseId'] for detail in row['inventoryDetails']} - known)
+        if unknown:
+            result.fail(index, row, f"Warehouse with id {unknown[0]} does not exist.")
+            del rows[index]
+
+
+def match_products(rows, result):
+    """
+    Finds the existing product of every row by productCode. Rows repeating a
+    productCode of an earlier row, matching several products, or creating a
+    product without its required columns are rejected.
+    """
+    first_index = {}
+    for index, row in list(rows.items()):
+        if row['productCode'] in first_index:
+            result.fail(index, row, f"productCode '{row['productCode']}' already appears in row {first_index[row['productCode']]}.")
+            del rows[index]
+        else:
+            first_index[row['productCode']] = index
+
+    matches = {}
+    for productId, productCode in Product.objects.filter(productCode__in=first_index).order_by('productId').values_list('productId', 'productCode'):
+        matches.setdefault(productCode, []).append(productId)
+
+    for index, row in list(rows.items()):
+        found = matches.get(row['productCode'], [])
+        missing = [name for name in ('productName', 'productDescription') if not found and row.get(name) is None]
+        if len(found) > 1:
+            result.fail(index, row, f"productCode '{row['productCode']}' matches {len(found)} products.")
+            del rows[index]
+        elif missing:
+            result.fail(index, row, f"{missing[0]} is required for a new product.")
+            del rows[index]
+        else:
+            row['productId'] = found[0] if found else None
+
+
+def write_chunk(chunk, username, result):
+    now = timezone.now()
+    create_categories(chunk)
+    new_rows = [row for row in chunk if row['productId'] is None]
+    existing = Product.objects.in_bulk([row['productId'] for row in chunk if row['productId'] is not None])
+
+    created = []
+    for row in new_rows:
+        values = {name: row[name] if row.get(name) is not None else default for name, default in PRODUCT_DEFAULTS.items()}
+        created.append(Product(
+            productCode=row['productCode'], productCategory_id=row['productCategory'],
+            createdUser=username, modifiedUser=username, **values,
+        ))
+    for row, product in zip(new_rows, Product.objects.bulk_create(created)):
+        row['productId'] = product.productId
+
+    updated = []
+    update_fields = {'productCategory', 'modifiedUser', 'modifiedTime', 'rowstatus'}
+    for row in chunk:
+        product = existing.get(row['productId'])
+        if product is None:
+            continue
+        for name in PRODUCT_DEFAULTS:
+            if row.get(name) is not None:
+                setattr(product, name, row[name])
+                update_fields.add(name)
+        product.productCategory_id = row['productCategory']
+        product.modifiedUser = username
+        product.modifiedTime = now  # bulk_update does not apply auto_now
+        product.rowstatus = True
+        updated.append(product)
+    if updated:
+        Product.objects.bulk_update(updated, sorted(update_fields))
+
+    # Inventories keyed by (product, warehouse), which is unique
+    inventories = {}
+    for inventory in Inventory.objects.filter(productId__in=[row['productId'] for row in chunk]):
+        inventories[inventory.productId_id, inventory.warehouseId_id] = inventory
+    before = {pair: inventory.quantityAvailable for pair, inventory in inventories.items()}
+
+    new_inventories, changed_inventories = [], []
+    for row in chunk:
+        for detail in row['inventoryDetails']:
+            values = {
+                'minStockLevel': detail['minStockLevel'],
+                'maxStockLevel': detail['maxStockLevel'],
+                'invreOrderPoint': detail.get('invreOrderPoint'),
+            }
+            if detail.get('quantityAvailable') is not None:
+                values['quantityAvailable'] = detail['quantityAvailable']
+            inventory = inventories.get((row['productId'], detail['warehouseId']))
+            if inventory is None:
+                inventory = Inventory(
+                    productId_id=row['productId'], warehouseId_id=detail['warehouseId'],
+                    createdUser=username, modifiedUser=username, **values,
+                )
+                inventories[row['productId'], detail['warehouseId']] = inventory
+                new_inventories.append(inventory)
+            else:
+                for name, value in values.items():
+                    setattr(inventory, name, value)
+                inventory.modifiedUser = username
+                inventory.modifiedTime = now
+                inventory.rowstatus = True
+                if inventory.pk is not None:
+                    changed_inventories.append(inventory)
+
+    Inventory.objects.bulk_create(new_inventories)
+    if changed_inventories:
+        Inventory.objects.bulk_update(
+            list({id(inventory): inventory for inventory in changed_inventories}.values()),
+            ['minStockLevel', 'maxStockLevel', 'invreOrderPoint', 'quantityAvailable', 'modifiedUser', 'modifiedTime', 'rowstatus'],
+        )
+    after = {pair: inventory.quantityAvailable for pair, inventory in inventories.items()}
+    record_stock_changes(before, after, StockMovement.ADJUSTMENT, username)
+
+    result.created += len(new_rows)
+    result.updated += len(updated)
+
+
+def bulk_upsert_products(rows, username, chunk_size=CHUNK_SIZE):
+    """
+    Creates or updates products, matched by productCode, and their
+    inventories, with a fixed number of queries per chunk.
+
+    Categories, warehouses and existing products are resolved for all rows
+    up front; the writes then run in chunks of `chunk_size`, one transaction
+    per chunk, which also creates the new categories its rows name. A chunk
+    that fails is rolled back and all its rows are reported as errors; the
+    other chunks are kept.
+
+    Args:
+    - rows: Dictionary of row index to product values, with quantities
+      already parsed to integers.
+    - username: User recorded as creator / modifier.
+    - chunk_size: Products written per transaction.
+
+    Returns:
+    - result: BulkUpsertResult.
+    """
+    result = BulkUpsertResult()
+    rows = dict(rows)
+
+    resolve_categories(rows, result)
+    check_warehouses(rows, result)
+    match_products(rows, result)
+
+    pending = sorted(rows.items())
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                write_chunk([row for index, row in chunk], username, result)
+        except Exception as e:
+            for index, row in chunk:
+                result.fail(index, row, f"Not saved: {e}")
+
+    result.errors.sort(key=lambda error: error[0])
+    return result
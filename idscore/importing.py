@@ -0,0 +1,651 @@
+import abc
+import csv
+import datetime
+import gzip
+import io
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+from .models import Batch, Category, Inventory, Placement, Product, StockMovement, Warehouse
+from .stock import record_stock_changes, recompute_inventory
+
+# Rows validated and merged per transaction
+CHUNK_SIZE = 10_000
+# Rejected rows kept with their message; the rest are only counted
+MAX_ERRORS = 20
+# Rows per UPDATE ... CASE statement of bulk_update, which slows down quadratically with longer statements
+UPDATE_BATCH_SIZE = 500
+
+# Stock ledger rows of the quantityAvailable changes an import makes, completed with a SELECT of (product, warehouse, change)
+INSERT_MOVEMENTS = f'''
+    INSERT INTO idscore_stockmovement ("productId_id", "warehouseId_id", quantity, reason, "createdUser", "createdTime")
+    SELECT product_id, warehouse_id, change, '{StockMovement.IMPORT}', %(user)s, %(now)s FROM
+'''
+
+
+## Row parsing
+def text(max_length=None, required=False):
+    def parse(value):
+        value = '' if value is None else str(value).strip()
+        if not value:
+            if required:
+                raise ValueError("is required")
+            return None
+        if max_length and len(value) > max_length:
+            raise ValueError(f"is longer than {max_length} characters")
+        return value
+    return parse
+
+
+def whole_number(required=False):
+    def parse(value):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if required:
+                raise ValueError("is required")
+            return None
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation:
+            number = None
+        if number is None or not number.is_finite() or number != number.to_integral_value():
+            raise ValueError(f"must be a whole number, got '{value}'")
+        return int(number)
+    return parse
+
+
+def iso_date():
+    def parse(value):
+        if value is None or not str(value).strip():
+            return None
+        try:
+            return datetime.date.fromisoformat(str(value).strip())
+        except ValueError:
+            raise ValueError(f"must be a YYYY-MM-DD date, got '{value}'")
+    return parse
+
+
+def json_list():
+    def parse(value):
+        if value is None or isinstance(value, list):
+            return value
+        if not str(value).strip():
+            return None
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ValueError("must be a JSON array")
+        if not isinstance(value, list):
+            raise ValueError("must be a JSON array")
+        return value
+    return parse
+
+
+def open_source(path):
+    # '-' reads stdin; .gz dumps are decompressed on the fly
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(f, fmt):
+    """
+    Streams (line number, raw row dict) pairs from a CSV (with a header line)
+    or NDJSON file. A line that is not a JSON object is yielded as None so it
+    is rejected like any other invalid row.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+class ImportStats:
+    """
+    Running totals of an import, reported after every chunk.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.read = 0
+        self.rejected = 0
+        self.skipped = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def progress(self):
+        return (
+            f"{self.read:,} rows read: {self.inserted:,} inserted, {self.updated:,} updated, "
+            f"{self.skipped:,} skipped, {self.rejected:,} rejected ({self.rate:,.0f} rows/s)"
+        )
+
+
+## Table imports
+class TableImport(abc.ABC):
+    """
+    Validates one kind of ERP row and merges chunks of them into the idscore
+    tables: through COPY into a temporary staging table and set-based SQL on
+    Postgres, through batched ORM reads and bulk writes elsewhere (SQLite in
+    tests).
+
+    Subclasses declare `columns` as (name, parser, staging SQL type) and the
+    `key` columns identifying a row; within a chunk the last row for a key wins.
+    They implement both merges, `merge_sql` and `merge_orm`.
+    """
+    name = None
+    columns = ()
+    key = ()
+    # Extra staging columns filled during the merge
+    resolved = ()
+
+    def parse(self, raw):
+        """
+        Returns:
+        - row: Dictionary of column name to parsed value.
+        """
+        if raw is None:
+            raise ValueError("not a JSON object")
+        row = {}
+        for name, parse, sql_type in self.columns:
+            try:
+                row[name] = parse(raw.get(name))
+            except ValueError as e:
+                raise ValueError(f"{name} {e}")
+        return row
+
+    def chunks(self, rows, stats, chunk_size):
+        """
+        Validates streamed (line, raw) rows and yields them in chunks of at
+        most `chunk_size` rows, unique per key.
+        """
+        chunk = {}
+        for line, raw in rows:
+            stats.read += 1
+            try:
+                row = self.parse(raw)
+            except ValueError as e:
+                stats.reject(line, str(e))
+                continue
+            chunk[tuple(row[name] for name in self.key)] = row
+            if len(chunk) >= chunk_size:
+                yield list(chunk.values())
+                chunk = {}
+        if chunk:
+            yield list(chunk.values())
+
+    def load(self, rows, stamp):
+        """
+        Merges one chunk of parsed rows, in the caller's transaction.
+
+        Returns:
+        - counts: (inserted, updated, skipped) rows.
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                self.stage(cursor, rows)
+                return self.merge_sql(cursor, stamp)
+        return self.merge_orm(rows, stamp)
+
+    ## Postgres
+    @property
+    def staging(self):
+        return f'import_{self.name}'
+
+    def stage(self, cursor, rows):
+        definitions = [f'"{name}" {sql_type}' for name, parse, sql_type in self.columns]
+        definitions += [f'{name} integer' for name in self.resolved]
+        # ON COMMIT DELETE ROWS: each chunk starts from an empty staging table
+        cursor.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS {self.staging} ({", ".join(definitions)}) ON COMMIT DELETE ROWS')
+
+        names = [name for name, parse, sql_type in self.columns]
+        values = [[json.dumps(row[name]) if isinstance(row[name], list) else row[name] for name in names] for row in rows]
+        columns = ', '.join(f'"{name}"' for name in names)
+        raw = cursor.cursor
+        if hasattr(raw, 'copy'):  # psycopg 3
+            with raw.copy(f'COPY {self.staging} ({columns}) FROM STDIN') as copy:
+                for row in values:
+                    copy.write_row(row)
+        else:  # psycopg2; QUOTE_NONNUMERIC keeps '' apart from NULL (an empty unquoted field)
+            buffer = io.StringIO()
+            csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(values)
+            buffer.seek(0)
+            raw.copy_expert(f'COPY {self.staging} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+    def resolve_products_sql(self, cursor):
+        # A productCode refers to the oldest product with that code
+        cursor.execute(f'''
+            UPDATE {self.staging} s SET product_id = m.id
+            FROM (
+                SELECT "productCode", MIN("productId") AS id FROM idscore_product
+                WHERE "productCode" IN (SELECT "productCode" FROM {self.staging}) GROUP BY "productCode"
+            ) m
+            WHERE m."productCode" = s."productCode"
+        ''')
+
+    def drop_unknown_sql(self, cursor):
+        # Rows for an unknown product or warehouse are skipped
+        self.resolve_products_sql(cursor)
+        cursor.execute(f'''
+            DELETE FROM {self.staging} s
+            WHERE s.product_id IS NULL OR NOT EXISTS (SELECT 1 FROM idscore_warehouse w WHERE w."warehouseId" = s."warehouseId")
+        ''')
+        return cursor.rowcount
+
+    @abc.abstractmethod
+    def merge_sql(self, cursor, stamp):
+        """
+        Merges the staged chunk with set-based SQL.
+
+        Returns:
+        - counts: (inserted, updated, skipped) rows.
+        """
+
+    ## Other databases
+    @abc.abstractmethod
+    def merge_orm(self, rows, stamp):
+        """
+        Merges a chunk of parsed rows through the ORM.
+
+        Returns:
+        - counts: (inserted, updated, skipped) rows.
+        """
+
+    def product_ids(self, rows):
+        codes = {row['productCode'] for row in rows}
+        return dict(Product.objects.filter(productCode__in=codes).values('productCode').annotate(id=Min('productId')).values_list('productCode', 'id'))
+
+    def drop_unknown(self, rows):
+        """
+        Returns:
+        - rows: Rows of a known product and warehouse, with `product_id` set.
+        - skipped: Number of rows left out.
+        """
+        products = self.product_ids(rows)
+        warehouses = set(Warehouse.objects.filter(pk__in={row['warehouseId'] for row in rows}).values_list('pk', flat=True))
+        known = []
+        for row in rows:
+            if row['productCode'] in products and row['warehouseId'] in warehouses:
+                known.append({**row, 'product_id': products[row['productCode']]})
+        return known, len(rows) - len(known)
+
+
+class ProductImport(TableImport):
+    name = 'products'
+    columns = (
+        ('productCode', text(100, required=True), 'varchar(100)'),
+        ('productName', text(255, required=True), 'varchar(255)'),
+        ('productDescription', text(), 'text'),
+        ('productCategory', text(255), 'varchar(255)'),  # category name, created when unknown
+        ('qrCode', text(), 'text'),
+        ('reOrderPoint', whole_number(), 'integer'),
+        ('brand', text(100), 'varchar(100)'),
+        ('weight', text(50), 'varchar(50)'),
+        ('dimensions', text(100), 'varchar(100)'),
+        ('images', json_list(), 'jsonb'),
+    )
+    key = ('productCode',)
+    resolved = ('product_id',)
+
+    # Columns left empty in a row keep their current value, or get these on insert
+    defaults = {'productDescription': '', 'qrCode': '', 'reOrderPoint': 0, 'brand': '', 'weight': '', 'dimensions': '', 'images': []}
+
+    def merge_sql(self, cursor, stamp):
+        cursor.execute(f'''
+            INSERT INTO idscore_category (name, rowstatus)
+            SELECT DISTINCT "productCategory", true FROM {self.staging} WHERE "productCategory" IS NOT NULL
+            ON CONFLICT (name) DO NOTHING
+        ''')
+        self.resolve_products_sql(cursor)
+
+        optional = [name for name in self.defaults]
+        cursor.execute(f'''
+            UPDATE idscore_product p SET
+                "productName" = s."productName",
+                {", ".join(f'"{name}" = COALESCE(s."{name}", p."{name}")' for name in optional)},
+                "productCategory_id" = COALESCE(c."categoryId", p."productCategory_id"),
+                "modifiedUser" = %(user)s, "modifiedTime" = %(now)s, rowstatus = true
+            FROM {self.staging} s LEFT JOIN idscore_category c ON c.name = s."productCategory"
+            WHERE p."productId" = s.product_id
+        ''', stamp)
+        updated = cursor.rowcount
+
+        cursor.execute(f'''
+            INSERT INTO idscore_product (
+                "productCode", "productName", {", ".join(f'"{name}"' for name in optional)}, "productCategory_id",
+                "createdUser", "modifiedUser", "createdTime", "modifiedTime", rowstatus
+            )
+            SELECT
+                s."productCode", s."productName", {", ".join(f'COALESCE(s."{name}", %({name})s)' for name in optional if name != 'images')},
+                COALESCE(s.images, '[]'::jsonb), c."categoryId", %(user)s, %(user)s, %(now)s, %(now)s, true
+            FROM {self.staging} s LEFT JOIN idscore_category c ON c.name = s."productCategory"
+            WHERE s.product_id IS NULL
+        ''', {**stamp, **{name: value for name, value in self.defaults.items() if name != 'images'}})
+        inserted = cursor.rowcount
+        return inserted, updated, 0
+
+    def merge_orm(self, rows, stamp):
+        names = {row['productCategory'] for row in rows if row['productCategory']}
+        categories = dict(Category.objects.filter(name__in=names).values_list('name', 'categoryId'))
+        if names - set(categories):
+            Category.objects.bulk_create([Category(name=name) for name in sorted(names - set(categories))], ignore_conflicts=True)
+            categories = dict(Category.objects.filter(name__in=names).values_list('name', 'categoryId'))
+
+        existing = Product.objects.in_bulk(self.product_ids(rows).values())
+        by_code = {product.productCode: product for product in existing.values()}
+        created, updated = [], []
+        for row in rows:
+            category_id = categories.get(row['productCategory'])
+            product = by_code.get(row['productCode'])
+            if product is None:
+                values = {name: row[name] if row[name] is not None else default for name, default in self.defaults.items()}
+                created.append(Product(
+                    productCode=row['productCode'], productName=row['productName'], productCategory_id=category_id,
+                    createdUser=stamp['user'], modifiedUser=stamp['user'], **values,
+                ))
+                continue
+            product.productName = row['productName']
+            for name in self.defaults:
+                if row[name] is not None:
+                    setattr(product, name, row[name])
+            if category_id is not None:
+                product.productCategory_id = category_id
+            product.modifiedUser = stamp['user']
+            product.modifiedTime = stamp['now']  # bulk_update does not apply auto_now
+            product.rowstatus = True
+            updated.append(product)
+
+        Product.objects.bulk_create(created)
+        Product.objects.bulk_update(updated, ['productName', *self.defaults, 'productCategory', 'modifiedUser', 'modifiedTime', 'rowstatus'], batch_size=UPDATE_BATCH_SIZE)
+        return len(created), len(updated), 0
+
+
+class InventoryImport(TableImport):
+    name = 'inventories'
+    columns = (
+        ('productCode', text(100, required=True), 'varchar(100)'),
+        ('warehouseId', whole_number(required=True), 'integer'),
+        ('quantityAvailable', whole_number(), 'integer'),
+        ('minStockLevel', whole_number(), 'integer'),
+        ('maxStockLevel', whole_number(), 'integer'),
+        ('invreOrderPoint', whole_number(), 'integer'),
+    )
+    key = ('productCode', 'warehouseId')
+    resolved = ('product_id', 'inventory_id')
+    levels = ('quantityAvailable', 'minStockLevel', 'maxStockLevel', 'invreOrderPoint')
+
+    def merge_sql(self, cursor, stamp):
+        skipped = self.drop_unknown_sql(cursor)
+        # A (product, warehouse) pair refers to its oldest inventory row
+        cursor.execute(f'''
+            UPDATE {self.staging} s SET inventory_id = i.id
+            FROM (
+                SELECT "productId_id", "warehouseId_id", MIN("inventoryId") AS id FROM idscore_inventory
+                WHERE "productId_id" IN (SELECT product_id FROM {self.staging}) GROUP BY "productId_id", "warehouseId_id"
+            ) i
+            WHERE i."productId_id" = s.product_id AND i."warehouseId_id" = s."warehouseId"
+        ''')
+        cursor.execute(INSERT_MOVEMENTS + f'''(
+                SELECT s.product_id, s."warehouseId" AS warehouse_id, s."quantityAvailable" - COALESCE(i."quantityAvailable", 0) AS change
+                FROM {self.staging} s LEFT JOIN idscore_inventory i ON i."inventoryId" = s.inventory_id
+            ) c WHERE change <> 0
+        ''', stamp)
+        cursor.execute(f'''
+            UPDATE idscore_inventory i SET
+                {", ".join(f'"{name}" = COALESCE(s."{name}", i."{name}")' for name in self.levels)},
+                "modifiedUser" = %(user)s, "modifiedTime" = %(now)s, rowstatus = true
+            FROM {self.staging} s WHERE i."inventoryId" = s.inventory_id
+        ''', stamp)
+        updated = cursor.rowcount
+        cursor.execute(f'''
+            INSERT INTO idscore_inventory (
+                "productId_id", "warehouseId_id", {", ".join(f'"{name}"' for name in self.levels)},
+                "createdUser", "modifiedUser", "createdTime", "modifiedTime", rowstatus
+            )
+            SELECT s.product_id, s."warehouseId", {", ".join(f's."{name}"' for name in self.levels)}, %(user)s, %(user)s, %(now)s, %(now)s, true
+            FROM {self.staging} s WHERE s.inventory_id IS NULL
+        ''', stamp)
+        return cursor.rowcount, updated, skipped
+
+    def merge_orm(self, rows, stamp):
+        rows, skipped = self.drop_unknown(rows)
+        existing = {}
+        for inventory in Inventory.objects.filter(productId__in={row['product_id'] for row in rows}).order_by('-inventoryId'):
+            existing[inventory.productId_id, inventory.warehouseId_id] = inventory
+        before = {pair: inventory.quantityAvailable for pair, inventory in existing.items()}
+
+        created, updated = [], []
+        for row in rows:
+            inventory = existing.get((row['product_id'], row['warehouseId']))
+            if inventory is None:
+                created.append(Inventory(
+                    productId_id=row['product_id'], warehouseId_id=row['warehouseId'],
+                    createdUser=stamp['user'], modifiedUser=stamp['user'], **{name: row[name] for name in self.levels},
+                ))
+                continue
+            for name in self.levels:
+                if row[name] is not None:
+                    setattr(inventory, name, row[name])
+            inventory.modifiedUser = stamp['user']
+            inventory.modifiedTime = stamp['now']
+            inventory.rowstatus = True
+            updated.append(inventory)
+
+        Inventory.objects.bulk_create(created)
+        Inventory.objects.bulk_update(updated, [*self.levels, 'modifiedUser', 'modifiedTime', 'rowstatus'], batch_size=UPDATE_BATCH_SIZE)
+        after = {(inventory.productId_id, inventory.warehouseId_id): inventory.quantityAvailable for inventory in [*created, *updated]}
+        record_stock_changes({pair: before.get(pair) for pair in after}, after, StockMovement.IMPORT, stamp['user'])
+        return len(created), len(updated), skipped
+
+
+class PlacementImport(TableImport):
+    """
+    A row is the stock of a product in one aisle / bin. It updates the oldest
+    active placement there, or creates a placement with a batch of its own;
+    the inventory totals of the touched (product, warehouse) pairs are then
+    recomputed from their placements, as createPlacement does.
+    """
+    name = 'placements'
+    columns = (
+        ('productCode', text(100, required=True), 'varchar(100)'),
+        ('warehouseId', whole_number(required=True), 'integer'),
+        ('aile', text(50, required=True), 'varchar(50)'),
+        ('bin', text(50, required=True), 'varchar(50)'),
+        ('placementQuantity', whole_number(required=True), 'integer'),
+        ('manufactureDate', iso_date(), 'date'),
+        ('expiryDate', iso_date(), 'date'),
+    )
+    key = ('productCode', 'warehouseId', 'aile', 'bin')
+    resolved = ('product_id', 'placement_id', 'batch_id')
+
+    def merge_sql(self, cursor, stamp):
+        skipped = self.drop_unknown_sql(cursor)
+        cursor.execute(f'''
+            UPDATE {self.staging} s SET placement_id = m.id
+            FROM (
+                SELECT "productId_id", "warehouseId_id", aile, bin, MIN("placementId") AS id FROM idscore_placement
+                WHERE rowstatus AND "productId_id" IN (SELECT product_id FROM {self.staging})
+                GROUP BY "productId_id", "warehouseId_id", aile, bin
+            ) m
+            WHERE m."productId_id" = s.product_id AND m."warehouseId_id" = s."warehouseId" AND m.aile = s.aile AND m.bin = s.bin
+        ''')
+        cursor.execute(f'''
+            UPDATE idscore_placement p SET "placementQuantity" = s."placementQuantity", "modifiedUser" = %(user)s, "modifiedTime" = %(now)s
+            FROM {self.staging} s WHERE p."placementId" = s.placement_id
+        ''', stamp)
+        updated = cursor.rowcount
+        # A batch may be split over several placements: its quantity is their total
+        cursor.execute(f'''
+            UPDATE idscore_batch b SET
+                quantity = (SELECT COALESCE(SUM(p."placementQuantity"), 0) FROM idscore_placement p WHERE p."batchId_id" = b."batchId" AND p.rowstatus),
+                "manufactureDate" = COALESCE(s."manufactureDate", b."manufactureDate"),
+                "expiryDate" = COALESCE(s."expiryDate", b."expiryDate"),
+                "modifiedUser" = %(user)s, "modifiedTime" = %(now)s
+            FROM {self.staging} s JOIN idscore_placement p ON p."placementId" = s.placement_id
+            WHERE b."batchId" = p."batchId_id"
+        ''', stamp)
+
+        # New placements: batch ids are drawn from the sequence first so both inserts stay set-based
+        cursor.execute(f'''
+            UPDATE {self.staging} SET batch_id = nextval(pg_get_serial_sequence('idscore_batch', 'batchId'))
+            WHERE placement_id IS NULL
+        ''')
+        cursor.execute(f'''
+            INSERT INTO idscore_batch (
+                "batchId", "productId_id", "manufactureDate", "expiryDate", quantity,
+                "createdUser", "modifiedUser", "createdTime", "modifiedTime", rowstatus
+            )
+            SELECT batch_id, product_id, "manufactureDate", "expiryDate", "placementQuantity", %(user)s, %(user)s, %(now)s, %(now)s, true
+            FROM {self.staging} WHERE batch_id IS NOT NULL
+        ''', stamp)
+        cursor.execute(f'''
+            INSERT INTO idscore_placement (
+                "batchId_id", "productId_id", "warehouseId_id", "placementQuantity", aile, bin,
+                "createdUser", "modifiedUser", "createdTime", "modifiedTime", rowstatus
+            )
+            SELECT batch_id, product_id, "warehouseId", "placementQuantity", aile, bin, %(user)s, %(user)s, %(now)s, %(now)s, true
+            FROM {self.staging} WHERE batch_id IS NOT NULL
+        ''', stamp)
+        inserted = cursor.rowcount
+
+        # The same product locks as recompute_inventory, taken after the placement writes and in id order, so
+        # a concurrent createPlacement / updatePlacement of these products cannot interleave with the totals
+        cursor.execute(f'''
+            SELECT 1 FROM idscore_product WHERE "productId" IN (SELECT product_id FROM {self.staging})
+            ORDER BY "productId" FOR NO KEY UPDATE
+        ''')
+        totals = f'''
+            WITH totals AS (
+                SELECT p."productId_id" AS product_id, p."warehouseId_id" AS warehouse_id, SUM(p."placementQuantity") AS total
+                FROM idscore_placement p
+                WHERE (p."productId_id", p."warehouseId_id") IN (SELECT product_id, "warehouseId" FROM {self.staging})
+                GROUP BY p."productId_id", p."warehouseId_id"
+            )
+        '''
+        cursor.execute(totals + INSERT_MOVEMENTS + '''(
+                SELECT t.product_id, t.warehouse_id, t.total - COALESCE(i."quantityAvailable", 0) AS change
+                FROM totals t LEFT JOIN idscore_inventory i ON i."productId_id" = t.product_id AND i."warehouseId_id" = t.warehouse_id
+            ) c WHERE change <> 0
+        ''', stamp)
+        cursor.execute(totals + '''
+            UPDATE idscore_inventory i SET "quantityAvailable" = t.total, "modifiedUser" = %(user)s, "modifiedTime" = %(now)s
+            FROM totals t WHERE i."productId_id" = t.product_id AND i."warehouseId_id" = t.warehouse_id
+        ''', stamp)
+        cursor.execute(totals + '''
+            INSERT INTO idscore_inventory (
+                "productId_id", "warehouseId_id", "quantityAvailable", "createdUser", "modifiedUser", "createdTime", "modifiedTime", rowstatus
+            )
+            SELECT t.product_id, t.warehouse_id, t.total, %(user)s, %(user)s, %(now)s, %(now)s, true
+            FROM totals t
+            WHERE NOT EXISTS (SELECT 1 FROM idscore_inventory i WHERE i."productId_id" = t.product_id AND i."warehouseId_id" = t.warehouse_id)
+        ''', stamp)
+        return inserted, updated, skipped
+
+    def merge_orm(self, rows, stamp):
+        rows, skipped = self.drop_unknown(rows)
+        existing = {}
+        for placement in Placement.objects.filter(productId__in={row['product_id'] for row in rows}, rowstatus=True).order_by('-placementId'):
+            existing[placement.productId_id, placement.warehouseId_id, placement.aile, placement.bin] = placement
+
+        new_rows, updated = [], []
+        for row in rows:
+            placement = existing.get((row['product_id'], row['warehouseId'], row['aile'], row['bin']))
+            if placement is None:
+                new_rows.append(row)
+                continue
+            placement.placementQuantity = row['placementQuantity']
+            placement.modifiedUser = stamp['user']
+            placement.modifiedTime = stamp['now']
+            updated.append((row, placement))
+        Placement.objects.bulk_update([placement for row, placement in updated], ['placementQuantity', 'modifiedUser', 'modifiedTime'], batch_size=UPDATE_BATCH_SIZE)
+
+        # A batch may be split over several placements: its quantity is their total
+        batches = Batch.objects.in_bulk({placement.batchId_id for row, placement in updated})
+        totals = dict(
+            Placement.objects.filter(batchId__in=batches, rowstatus=True).values('batchId').annotate(total=Sum('placementQuantity')).values_list('batchId', 'total')
+        )
+        for row, placement in updated:
+            batch = batches[placement.batchId_id]
+            batch.quantity = totals.get(batch.pk, 0)
+            batch.manufactureDate = row['manufactureDate'] or batch.manufactureDate
+            batch.expiryDate = row['expiryDate'] or batch.expiryDate
+            batch.modifiedUser = stamp['user']
+            batch.modifiedTime = stamp['now']
+        Batch.objects.bulk_update(batches.values(), ['quantity', 'manufactureDate', 'expiryDate', 'modifiedUser', 'modifiedTime'], batch_size=UPDATE_BATCH_SIZE)
+
+        user = {'createdUser': stamp['user'], 'modifiedUser': stamp['user']}
+        batches = Batch.objects.bulk_create([
+            Batch(productId_id=row['product_id'], manufactureDate=row['manufactureDate'], expiryDate=row['expiryDate'], quantity=row['placementQuantity'], **user)
+            for row in new_rows
+        ])
+        Placement.objects.bulk_create([
+            Placement(
+                batchId=batch, productId_id=row['product_id'], warehouseId_id=row['warehouseId'],
+                placementQuantity=row['placementQuantity'], aile=row['aile'], bin=row['bin'], **user,
+            )
+            for row, batch in zip(new_rows, batches)
+        ])
+
+        recompute_inventory({(row['product_id'], row['warehouseId']) for row in rows}, stamp['user'], StockMovement.IMPORT)
+        return len(new_rows), len(updated), skipped
+
+
+IMPORTS = {table.name: table for table in (ProductImport(), InventoryImport(), PlacementImport())}
+
+
+def import_idscore(kind, rows, username, chunk_size=CHUNK_SIZE, log=None):
+    """
+    Validates and merges streamed ERP rows into the idscore tables, one
+    transaction per chunk, so memory stays bounded by `chunk_size`.
+
+    Args:
+    - kind: 'products', 'inventories' or 'placements'.
+    - rows: Iterable of (line number, raw row dict) pairs, e.g. from `read_rows`.
+    - username: User recorded as creator / modifier.
+    - chunk_size: Rows validated and merged per transaction.
+    - log: Optional callable receiving a progress message after every chunk.
+
+    Returns:
+    - stats: ImportStats.
+    """
+    log = log or (lambda message: None)
+    table = IMPORTS[kind]
+    stats = ImportStats()
+    for chunk in table.chunks(rows, stats, chunk_size):
+        stamp = {'user': username, 'now': timezone.now()}
+        with transaction.atomic():
+            inserted, updated, skipped = table.load(chunk, stamp)
+        stats.inserted += inserted
+        stats.updated += updated
+        stats.skipped += skipped
+        log(stats.progress())
+    return stats
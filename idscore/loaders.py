@@ -0,0 +1,164 @@
+import threading
+from django.db import models
+from .models import Product, Warehouse, Location, Batch, Category
+
+# Guards creating the registry when resolvers of one request run in parallel threads
+_registry_lock = threading.Lock()
+
+
+## Request-scoped DataLoaders
+class ModelLoader:
+    """
+    Batches primary-key lookups for one model within a single request.
+
+    Keys are queued with `prime()` (usually by the resolver that returned the
+    parent rows) and fetched together with one `IN (...)` query the first time
+    any of them is loaded. Every fetched object is cached for the rest of the
+    request, so repeated lookups of the same key never hit the database again.
+
+    Loaders are shared by resolvers running on the async view's thread pool.
+    Every method holds the registry lock while it reads or changes the cache,
+    but the query itself runs without it; keys being fetched by one thread
+    are marked in flight, and other threads wait for that batch instead of
+    fetching them again.
+    """
+
+    def __init__(self, registry, model):
+        self.registry = registry
+        self.model = model
+        self._cache = {}
+        self._pending = set()
+        self._in_flight = {}  # key -> Event set once its batch is cached
+
+    def prime(self, keys):
+        # Queue keys for the next batch without fetching them yet
+        with self.registry.lock:
+            for key in keys:
+                if key is not None and key not in self._cache and key not in self._in_flight:
+                    self._pending.add(key)
+
+    def prime_objects(self, objects):
+        # Cache objects that were already fetched elsewhere in the request;
+        # partially loaded (.only/.defer) objects are queued for a full fetch instead
+        with self.registry.lock:
+            for obj in objects:
+                if obj.get_deferred_fields():
+                    self.prime([obj.pk])
+                    continue
+                self._cache[obj.pk] = obj
+                self._pending.discard(obj.pk)
+        return objects
+
+    def load(self, key):
+        return self.load_many([key])[0]
+
+    def load_many(self, keys):
+        keys = list(keys)
+        while True:
+            self.prime(keys)
+            with self.registry.lock:
+                queued = any(key in self._pending for key in keys)
+            if queued:
+                self.dispatch()
+            with self.registry.lock:
+                batches = {self._in_flight[key] for key in keys if key in self._in_flight}
+                if not batches:
+                    return [self._cache.get(key) for key in keys]
+            # Another thread is fetching some of the keys; a failed batch leaves them
+            # uncached, so they are queued again on the next pass
+            for batch in batches:
+                batch.wait()
+
+    def dispatch(self):
+        # Fetch every queued key in a single query, outside the lock
+        with self.registry.lock:
+            keys, self._pending = self._pending, set()
+            if not keys:
+                return
+            batch = threading.Event()
+            for key in keys:
+                self._in_flight[key] = batch
+        try:
+            found = self.model.objects.in_bulk(keys)
+            with self.registry.lock:
+                for key in keys:
+                    self._cache[key] = found.get(key)
+                # Queue the foreign keys of the fetched rows on their own loaders
+                self.registry.prime_from(found.values())
+        finally:
+            with self.registry.lock:
+                for key in keys:
+                    del self._in_flight[key]
+            batch.set()
+
+    def __repr__(self):
+        return f"<ModelLoader {self.model.__name__} cached={len(self._cache)} pending={len(self._pending)}>"
+
+
+class LoaderRegistry:
+    """
+    Holds one ModelLoader per model for the lifetime of a request.
+    """
+
+    models = (Product, Warehouse, Location, Batch, Category)
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._loaders = {model: ModelLoader(self, model) for model in self.models}
+
+    def for_model(self, model):
+        return self._loaders[model]
+
+    @property
+    def product(self):
+        return self._loaders[Product]
+
+    @property
+    def warehouse(self):
+        return self._loaders[Warehouse]
+
+    @property
+    def location(self):
+        return self._loaders[Location]
+
+    @property
+    def batch(self):
+        return self._loaders[Batch]
+
+    @property
+    def category(self):
+        return self._loaders[Category]
+
+    def prime_from(self, rows):
+        """
+        Queue every foreign key on `rows` that points at a batched model, so the
+        related objects of a whole result set are fetched together.
+        """
+        with self.lock:
+            for row in rows:
+                for field in row._meta.concrete_fields:
+                    if isinstance(field, models.ForeignKey) and field.related_model in self._loaders:
+                        self._loaders[field.related_model].prime([getattr(row, field.attname)])
+        return rows
+
+
+def get_loaders(info):
+    """
+    Returns the LoaderRegistry attached to the current request, creating it on
+    first use.
+
+    Args:
+    - info: GraphQL resolve info whose context is the Django request.
+
+    Returns:
+    - registry: LoaderRegistry shared by every resolver in the request.
+    """
+    context = info.context
+    registry = getattr(context, 'loaders', None)
+    if registry is None:
+        with _registry_lock:
+            registry = getattr(context, 'loaders', None)
+            if registry is None:
+                registry = LoaderRegistry()
+                context.loaders = registry
+    return registry
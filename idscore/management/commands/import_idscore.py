@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from idscore.importing import CHUNK_SIZE, IMPORTS, import_idscore, open_source, read_rows
+from idscore.seeding import SEED_USER
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports an ERP dump of products, inventories or placements (CSV or NDJSON, optionally gzipped) "
+        "into the idscore tables: COPY into a staging table and set-based merges on Postgres, "
+        "batched inserts / updates elsewhere."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTS), help='rows in the file')
+        parser.add_argument('path', help="CSV (with a header line) or NDJSON file, '-' for stdin")
+        parser.add_argument('--format', choices=('csv', 'ndjson'), help='file format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='rows validated and merged per transaction')
+        parser.add_argument('--username', default=SEED_USER, help='user recorded as creator / modifier of the rows')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format csv or --format ndjson.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        try:
+            source = open_source(options['path'])
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        self.stdout.write(f"Importing {options['kind']} from {options['path']} ({fmt}, {connection.vendor})")
+        with source:
+            stats = import_idscore(
+                options['kind'], read_rows(source, fmt), options['username'],
+                chunk_size=options['chunk_size'], log=self.stdout.write,
+            )
+
+        for line, message in stats.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if stats.rejected > len(stats.errors):
+            self.stderr.write(f"... and {stats.rejected - len(stats.errors)} more rejected rows")
+        style = self.style.SUCCESS if not stats.rejected else self.style.WARNING
+        self.stdout.write(style(f"Done in {stats.elapsed:.1f}s: {stats.progress()}"))
@@ -0,0 +1,198 @@
+import json
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from graphql_jwt.shortcuts import get_token
+
+from Authentication.models import Login
+from IDS_GraphQL.capture import REDACTED, UPLOADED_FILE
+from idscore.seeding import SEED_USER
+
+
+def read_capture(paths):
+    entries = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                entries.extend(json.loads(line) for line in f if line.strip())
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        except ValueError as e:
+            raise CommandError(f"{path} is not an NDJSON capture: {e}")
+    entries.sort(key=lambda entry: entry['timestamp'])
+    return entries
+
+
+def fill_variables(value, fills, key=None):
+    """
+    Replaces redacted values with the matching `--fill` value.
+
+    Returns:
+    - value: Variables to send, or None when a placeholder is left.
+    """
+    if isinstance(value, dict):
+        filled = {}
+        for name, item in value.items():
+            item = fill_variables(item, fills, name)
+            if item is None and value[name] is not None:
+                return None
+            filled[name] = item
+        return filled
+    if isinstance(value, list):
+        filled = [fill_variables(item, fills, key) for item in value]
+        return None if any(item is None and original is not None for item, original in zip(filled, value)) else filled
+    if value in (REDACTED, UPLOADED_FILE):
+        return fills.get(key)
+    return value
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+def latency_summary(durations):
+    if not durations:
+        return None
+    return {
+        'count': len(durations),
+        'p50': round(statistics.median(durations), 3),
+        'p95': round(percentile(durations, 0.95), 3),
+        'mean': round(statistics.fmean(durations), 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a GraphQL traffic capture (GRAPHQL_CAPTURE) against the local database at the "
+        "recorded or an accelerated rate and compares latencies with the recording."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('capture', nargs='+', help='NDJSON capture file(s), e.g. graphql-capture.ndjson graphql-capture.ndjson.1')
+        parser.add_argument('--speed', type=float, default=1.0, help='rate relative to the recording (2 = twice as fast, 0 = back to back)')
+        parser.add_argument('--workers', type=int, default=4, help='concurrent replay clients, so overlapping operations still overlap')
+        parser.add_argument('--username', default=SEED_USER, help='user whose token authenticates the replayed operations')
+        parser.add_argument('--fill', nargs='+', default=[], metavar='NAME=VALUE', help='values for redacted variables, by variable name, e.g. password=seed')
+        parser.add_argument('--queries-only', action='store_true', help='skip mutations')
+        parser.add_argument('--limit', type=int, help='replay at most this many operations')
+        parser.add_argument('--output', help='write the comparison as JSON to this file')
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0:
+            raise CommandError("--speed must not be negative.")
+        fills = {}
+        for entry in options['fill']:
+            name, sep, value = entry.partition('=')
+            if not sep:
+                raise CommandError(f"Invalid --fill '{entry}'; expected NAME=VALUE.")
+            fills[name] = value
+
+        entries = read_capture(options['capture'])
+        if options['queries_only']:
+            entries = [entry for entry in entries if entry.get('operationType') != 'mutation']
+        if options['limit']:
+            entries = entries[:options['limit']]
+        if not entries:
+            raise CommandError("Nothing to replay.")
+
+        token = None
+        if any(entry.get('authenticated') for entry in entries):
+            user = Login.objects.filter(username=options['username']).first()
+            if user is None:
+                raise CommandError(f"User '{options['username']}' does not exist; pass --username.")
+            token = get_token(user)
+
+        replayed, skipped = self.replay(entries, fills, token, options['speed'], options['workers'])
+        report = self.compare(entries, replayed)
+        self.print_report(report, len(entries), skipped)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'skipped': skipped, 'operations': report}, f, indent=2)
+                f.write('\n')
+
+    def replay(self, entries, fills, token, speed, workers):
+        """
+        Sends every entry on the recorded schedule, divided by `speed`.
+
+        Returns:
+        - replayed: Dictionary of entry index to (duration ms, failed).
+        - skipped: Number of entries left out because of redacted values.
+        """
+        local = threading.local()
+        replayed = {}
+        skipped = 0
+
+        def send(index, entry, variables):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if entry.get('authenticated') and token else {}
+            body = {'query': entry['query'], 'variables': variables, 'operationName': entry.get('operationName')}
+            started = time.perf_counter()
+            try:
+                response = client.post(entry['path'], json.dumps(body), content_type='application/json', **headers)
+                duration = time.perf_counter() - started
+                failed = response.status_code != 200 or bool(json.loads(response.content).get('errors'))
+            except Exception:
+                duration = time.perf_counter() - started
+                failed = True
+            replayed[index] = (round(duration * 1000, 3), failed)
+
+        first = entries[0]['timestamp']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            for index, entry in enumerate(entries):
+                variables = fill_variables(entry.get('variables') or {}, fills)
+                # A literal redacted from the query text cannot be filled back in
+                if variables is None or entry.get('redactedQuery'):
+                    skipped += 1
+                    continue
+                if speed:
+                    delay = start + (entry['timestamp'] - first) / speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                pool.submit(send, index, entry, variables)
+        return replayed, skipped
+
+    def compare(self, entries, replayed):
+        recorded = defaultdict(list)
+        durations = defaultdict(list)
+        errors = defaultdict(int)
+        for index, entry in enumerate(entries):
+            if index not in replayed:
+                continue
+            key = (entry['path'], entry.get('operationName') or entry['queryHash'][:12])
+            recorded[key].append(entry['duration'])
+            duration, failed = replayed[index]
+            durations[key].append(duration)
+            errors[key] += failed
+
+        report = []
+        for key in sorted(recorded, key=lambda key: -len(recorded[key])):
+            before, after = latency_summary(recorded[key]), latency_summary(durations[key])
+            report.append({
+                'path': key[0],
+                'operation': key[1],
+                'recorded': before,
+                'replayed': after,
+                'errors': errors[key],
+                'p50_ratio': round(after['p50'] / before['p50'], 2) if before['p50'] else None,
+            })
+        return report
+
+    def print_report(self, report, total, skipped):
+        self.stdout.write(f"Replayed {total - skipped} of {total} operations ({skipped} skipped for redacted values)")
+        self.stdout.write(f"{'path':<14} {'operation':<28} {'count':>6} {'rec p50':>9} {'rep p50':>9} {'rec p95':>9} {'rep p95':>9} {'ratio':>6} {'errors':>6}")
+        for row in report:
+            self.stdout.write(
+                f"{row['path']:<14} {row['operation'][:28]:<28} {row['replayed']['count']:>6} "
+                f"{row['recorded']['p50']:>9} {row['replayed']['p50']:>9} {row['recorded']['p95']:>9} {row['replayed']['p95']:>9} "
+                f"{row['p50_ratio'] if row['p50_ratio'] is not None else '-':>6} {row['errors']:>6}"
+            )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from idscore.seeding import SCALES, flush_idscore, seed_idscore
+
+
+class Command(BaseCommand):
+    help = "Seeds the idscore tables with a synthetic dataset (1k, 100k or 1m placements)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='1k', help='dataset size, in placements')
+        parser.add_argument('--placements', type=int, help='exact number of placements (overrides --scale)')
+        parser.add_argument('--seed', type=int, default=0, help='random seed')
+        parser.add_argument('--flush', action='store_true', help='delete existing idscore rows first')
+
+    def handle(self, *args, **options):
+        placements = options['placements'] or SCALES[options['scale']]
+        if placements < 1:
+            raise CommandError("--placements must be positive.")
+
+        if options['flush']:
+            self.stdout.write("Deleting existing idscore rows...")
+            flush_idscore()
+
+        counts = seed_idscore(placements, seed=options['seed'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded " + ", ".join(f"{count} {name}" for name, count in counts.items())
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from idscore.stock import SNAPSHOT_LAG, take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes a stock snapshot for every (product, warehouse) with movements since the previous run. "
+        "Run it periodically (e.g. hourly from cron) so stockAt only sums the movements of one interval."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--at', help=f'ISO datetime the snapshots are taken at (default: {SNAPSHOT_LAG.seconds // 60} minutes ago)',
+        )
+
+    def handle(self, *args, **options):
+        at = None
+        if options['at']:
+            at = parse_datetime(options['at'])
+            if at is None:
+                raise CommandError(f"--at must be an ISO datetime, got '{options['at']}'.")
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+
+        with transaction.atomic():
+            count = take_snapshots(at)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} stock snapshots"))
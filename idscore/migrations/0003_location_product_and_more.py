@@ -0,0 +1,204 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:29
+
+# These models and the categoryId rename were in use before any migration
+# covered them, so deployed databases already have some or all of this
+# schema. Each operation always updates the state, but only touches the
+# database where its table or column is still missing, so the migration
+# applies without --fake on both fresh and existing databases.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def schema_exists(schema_editor, app_label, state, operation):
+    # The table a CreateModel makes, or the column a RenameField renames to.
+    connection = schema_editor.connection
+    if isinstance(operation, migrations.CreateModel):
+        table = state.apps.get_model(app_label, operation.name)._meta.db_table
+        with connection.cursor() as cursor:
+            return table in connection.introspection.table_names(cursor)
+    model = state.apps.get_model(app_label, operation.model_name)
+    column = model._meta.get_field(operation.new_name).column
+    with connection.cursor() as cursor:
+        return column in {c.name for c in connection.introspection.get_table_description(cursor, model._meta.db_table)}
+
+
+class IfMissing(migrations.SeparateDatabaseAndState):
+    """
+    Runs its database operation forwards only while the schema it creates
+    is missing, and backwards only while it is there.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if not schema_exists(schema_editor, app_label, to_state, self.database_operations[0]):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_exists(schema_editor, app_label, from_state, self.database_operations[0]):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def if_missing(operation):
+    return IfMissing(database_operations=[operation], state_operations=[operation])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0002_location_alter_category_image_product_warehouse_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        if_missing(migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('locationId', models.AutoField(primary_key=True, serialize=False)),
+                ('locationName', models.CharField(max_length=255)),
+                ('locationAddress', models.TextField()),
+                ('createdUser', models.CharField(max_length=100)),
+                ('modifiedUser', models.CharField(max_length=100)),
+                ('createdTime', models.DateTimeField(auto_now_add=True)),
+                ('modifiedTime', models.DateTimeField(auto_now=True)),
+                ('rowstatus', models.BooleanField(default=True)),
+            ],
+        )),
+        if_missing(migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('productId', models.AutoField(primary_key=True, serialize=False)),
+                ('productCode', models.CharField(max_length=100)),
+                ('qrCode', models.TextField()),
+                ('productName', models.CharField(max_length=255)),
+                ('productDescription', models.TextField()),
+                ('productCategory', models.IntegerField()),
+                ('reOrderPoint', models.IntegerField()),
+                ('brand', models.CharField(max_length=100)),
+                ('weight', models.CharField(max_length=50)),
+                ('dimensions', models.CharField(max_length=100)),
+                ('images', models.JSONField()),
+                ('createdUser', models.CharField(max_length=100)),
+                ('modifiedUser', models.CharField(max_length=100)),
+                ('createdTime', models.DateTimeField(auto_now_add=True)),
+                ('modifiedTime', models.DateTimeField(auto_now=True)),
+                ('rowstatus', models.BooleanField(default=True)),
+            ],
+        )),
+        if_missing(migrations.RenameField(
+            model_name='category',
+            old_name='category_id',
+            new_name='categoryId',
+        )),
+        if_missing(migrations.CreateModel(
+            name='Features',
+            fields=[
+                ('featureId', models.AutoField(primary_key=True, serialize=False)),
+                ('stockControl', models.BooleanField(default=False)),
+                ('overrideManagerApproval', models.BooleanField(default=False)),
+                ('viewProductDetails', models.BooleanField(default=False)),
+                ('updateStock', models.BooleanField(default=False)),
+                ('deleteProduct', models.BooleanField(default=False)),
+                ('imageSearch', models.BooleanField(default=False)),
+                ('qrScan', models.BooleanField(default=False)),
+                ('qrGeneration', models.BooleanField(default=False)),
+                ('addProduct', models.BooleanField(default=False)),
+                ('approval', models.BooleanField(default=False)),
+                ('requestProduct', models.BooleanField(default=False)),
+                ('notifications', models.BooleanField(default=False)),
+                ('raiseRequest', models.BooleanField(default=False)),
+                ('lowStockItems', models.BooleanField(default=False)),
+                ('expiryDateItems', models.BooleanField(default=False)),
+                ('userId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        )),
+        if_missing(migrations.CreateModel(
+            name='DeleteRequest',
+            fields=[
+                ('deleteId', models.AutoField(primary_key=True, serialize=False)),
+                ('message', models.CharField(max_length=255)),
+                ('approverId', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, max_length=255, null=True)),
+                ('createdTime', models.DateTimeField(auto_now_add=True)),
+                ('modifiedTime', models.DateTimeField(auto_now=True)),
+                ('userId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('productId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.product')),
+            ],
+        )),
+        if_missing(migrations.CreateModel(
+            name='Batch',
+            fields=[
+                ('batchId', models.AutoField(primary_key=True, serialize=False)),
+                ('manufactureDate', models.DateField(null=True)),
+                ('expiryDate', models.DateField(blank=True, null=True)),
+                ('quantity', models.CharField()),
+                ('createdUser', models.CharField(max_length=100)),
+                ('modifiedUser', models.CharField(max_length=100)),
+                ('createdTime', models.DateTimeField(auto_now_add=True)),
+                ('modifiedTime', models.DateTimeField(auto_now=True)),
+                ('rowstatus', models.BooleanField(default=True)),
+                ('productId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.product')),
+            ],
+        )),
+        if_missing(migrations.CreateModel(
+            name='RequestProduct',
+            fields=[
+                ('requestId', models.AutoField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField()),
+                ('approvedManagerId', models.IntegerField(blank=True, null=True)),
+                ('approvedAdminId', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(max_length=255)),
+                ('createdTime', models.DateTimeField(auto_now_add=True)),
+                ('modifiedTime', models.DateTimeField(auto_now=True)),
+                ('productId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.product')),
+                ('userId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        )),
+        if_missing(migrations.CreateModel(
+            name='Warehouse',
+            fields=[
+                ('warehouseId', models.AutoField(primary_key=True, serialize=False)),
+                ('warehouseName', models.CharField(max_length=255)),
+                ('createdUser', models.CharField(max_length=100)),
+                ('modifiedUser', models.CharField(max_length=100)),
+                ('createdTime', models.DateTimeField(auto_now_add=True)),
+                ('modifiedTime', models.DateTimeField(auto_now=True)),
+                ('rowstatus', models.BooleanField(default=True)),
+                ('locationId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.location')),
+            ],
+        )),
+        if_missing(migrations.CreateModel(
+            name='Placement',
+            fields=[
+                ('placementId', models.AutoField(primary_key=True, serialize=False)),
+                ('placementQuantity', models.IntegerField()),
+                ('aile', models.CharField(max_length=50)),
+                ('bin', models.CharField(max_length=50)),
+                ('createdUser', models.CharField(max_length=100)),
+                ('modifiedUser', models.CharField(max_length=100)),
+                ('createdTime', models.DateTimeField(auto_now_add=True)),
+                ('modifiedTime', models.DateTimeField(auto_now=True)),
+                ('rowstatus', models.BooleanField(default=True)),
+                ('batchId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.batch')),
+                ('productId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.product')),
+                ('warehouseId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.warehouse')),
+            ],
+        )),
+        if_missing(migrations.CreateModel(
+            name='Inventory',
+            fields=[
+                ('inventoryId', models.AutoField(primary_key=True, serialize=False)),
+                ('quantityAvailable', models.CharField(blank=True, max_length=50, null=True)),
+                ('minStockLevel', models.CharField(blank=True, max_length=50, null=True)),
+                ('maxStockLevel', models.CharField(blank=True, max_length=50, null=True)),
+                ('invreOrderPoint', models.IntegerField(blank=True, null=True)),
+                ('createdUser', models.CharField(max_length=100)),
+                ('modifiedUser', models.CharField(max_length=100)),
+                ('createdTime', models.DateTimeField(auto_now_add=True)),
+                ('modifiedTime', models.DateTimeField(auto_now=True)),
+                ('rowstatus', models.BooleanField(default=True)),
+                ('productId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.product')),
+                ('warehouseId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.warehouse')),
+            ],
+        )),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0003_location_product_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(fields=['productId', 'rowstatus'], name='batch_product_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(condition=models.Q(('rowstatus', True)), fields=['productId'], name='batch_active_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['productId', 'warehouseId'], name='inventory_product_wh_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placement',
+            index=models.Index(fields=['productId', 'rowstatus'], name='placement_product_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placement',
+            index=models.Index(fields=['productId', 'warehouseId'], name='placement_product_wh_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placement',
+            index=models.Index(condition=models.Q(('rowstatus', True)), fields=['productId'], name='placement_active_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placement',
+            index=models.Index(condition=models.Q(('rowstatus', True)), fields=['placementId'], name='placement_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('rowstatus', True)), fields=['productId'], name='product_active_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Prepares the quantity CharFields for the integer columns of 0006: the
+# ALTER COLUMN ... TYPE integer cast fails on any value that is not a whole
+# number. Kept in its own migration so the data changes are committed before
+# the tables are altered.
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations
+
+CHUNK_SIZE = 5000
+
+
+def to_integer(value):
+    # '12', ' 12 ', '12.0' -> '12'; blanks, fractions ('12.5') and anything else -> None
+    if value is None or not value.strip():
+        return None
+    try:
+        number = Decimal(value.strip())
+    except InvalidOperation:
+        return None
+    if not number.is_finite() or number != number.to_integral_value():
+        return None
+    return str(int(number))
+
+
+def clean_column(model, field, default):
+    changed = []
+    for row in model.objects.only('pk', field).iterator(chunk_size=CHUNK_SIZE):
+        value = getattr(row, field)
+        cleaned = to_integer(value)
+        if cleaned is None:
+            cleaned = default
+        if cleaned != value:
+            setattr(row, field, cleaned)
+            changed.append(row)
+    for start in range(0, len(changed), CHUNK_SIZE):
+        model.objects.bulk_update(changed[start:start + CHUNK_SIZE], [field])
+
+
+def clean_quantities(apps, schema_editor):
+    Inventory = apps.get_model('idscore', 'Inventory')
+    Batch = apps.get_model('idscore', 'Batch')
+    for field in ('quantityAvailable', 'minStockLevel', 'maxStockLevel'):
+        clean_column(Inventory, field, None)
+    clean_column(Batch, 'quantity', '0')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0004_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_quantities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0005_clean_quantities'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='batch',
+            name='quantity',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='maxStockLevel',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='minStockLevel',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='quantityAvailable',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Product.productCategory becomes a ForeignKey to Category. The old integer
+# column is kept under another name until 0008 has copied it across.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0006_integer_quantities'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='product',
+            old_name='productCategory',
+            new_name='legacyProductCategory',
+        ),
+        # Nullable so 0009 can be reversed on a populated table
+        migrations.AlterField(
+            model_name='product',
+            name='legacyProductCategory',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='productCategory',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='idscore.category'),
+        ),
+    ]
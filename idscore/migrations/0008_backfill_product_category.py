@@ -0,0 +1,30 @@
+# Copies the old category ids into the new foreign key in one UPDATE. Ids
+# without a matching Category (products whose category name resolved to
+# nothing before) are left NULL.
+
+from django.db import migrations
+from django.db.models import Exists, F, OuterRef
+
+
+def backfill_product_category(apps, schema_editor):
+    Product = apps.get_model('idscore', 'Product')
+    Category = apps.get_model('idscore', 'Category')
+    Product.objects.filter(
+        Exists(Category.objects.filter(pk=OuterRef('legacyProductCategory')))
+    ).update(productCategory=F('legacyProductCategory'))
+
+
+def restore_legacy_category(apps, schema_editor):
+    Product = apps.get_model('idscore', 'Product')
+    Product.objects.filter(productCategory__isnull=False).update(legacyProductCategory=F('productCategory'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0007_product_category_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_product_category, restore_legacy_category),
+    ]
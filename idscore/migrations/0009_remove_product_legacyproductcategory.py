@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0008_backfill_product_category'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='product',
+            name='legacyProductCategory',
+        ),
+    ]
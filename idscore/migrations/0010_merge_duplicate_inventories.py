@@ -0,0 +1,66 @@
+# Prepares the (product, warehouse) unique constraint of 0011: merges the
+# inventory rows of every duplicated pair into one. The newest active row
+# survives (the newest row when none is active) and takes the stock levels
+# it lacks from the other rows, in the same order. Its quantityAvailable is
+# recomputed from the pair's active placements, as createPlacement does; a
+# pair without active placements keeps the survivor's quantity, or else the
+# first one set in that order. The other rows are then deleted.
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+LEVELS = ('minStockLevel', 'maxStockLevel', 'invreOrderPoint')
+
+
+def merge_duplicate_inventories(apps, schema_editor):
+    Inventory = apps.get_model('idscore', 'Inventory')
+    Placement = apps.get_model('idscore', 'Placement')
+
+    pairs = set(
+        Inventory.objects.values('productId', 'warehouseId').annotate(rows=Count('inventoryId')).filter(rows__gt=1)
+        .values_list('productId', 'warehouseId')
+    )
+    if not pairs:
+        return
+    productIds = {productId for productId, warehouseId in pairs}
+
+    # Survivor first: active before inactive, then newest first
+    groups = {}
+    for inventory in Inventory.objects.filter(productId__in=productIds).order_by('-rowstatus', '-inventoryId'):
+        pair = (inventory.productId_id, inventory.warehouseId_id)
+        if pair in pairs:
+            groups.setdefault(pair, []).append(inventory)
+    totals = {
+        (productId, warehouseId): total
+        for productId, warehouseId, total in Placement.objects.filter(productId__in=productIds, rowstatus=True)
+        .values('productId', 'warehouseId').annotate(total=Sum('placementQuantity'))
+        .values_list('productId', 'warehouseId', 'total')
+    }
+
+    survivors, duplicates = [], []
+    for pair, rows in groups.items():
+        survivor, others = rows[0], rows[1:]
+        for name in LEVELS:
+            if getattr(survivor, name) is None:
+                setattr(survivor, name, next((getattr(row, name) for row in others if getattr(row, name) is not None), None))
+        if pair in totals:
+            survivor.quantityAvailable = totals[pair]
+        elif survivor.quantityAvailable is None:
+            survivor.quantityAvailable = next((row.quantityAvailable for row in others if row.quantityAvailable is not None), None)
+        survivors.append(survivor)
+        duplicates.extend(row.pk for row in others)
+
+    Inventory.objects.bulk_update(survivors, ['quantityAvailable', *LEVELS], batch_size=500)
+    for start in range(0, len(duplicates), 500):
+        Inventory.objects.filter(pk__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0009_remove_product_legacyproductcategory'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_inventories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0010_merge_duplicate_inventories'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='inventory',
+            constraint=models.UniqueConstraint(fields=('productId', 'warehouseId'), name='inventory_product_wh_uniq'),
+        ),
+        migrations.RemoveIndex(
+            model_name='inventory',
+            name='inventory_product_wh_idx',
+        ),
+    ]
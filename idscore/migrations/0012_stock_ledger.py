@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0011_inventory_product_warehouse_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('movementId', models.AutoField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField()),
+                ('reason', models.CharField(choices=[('placement', 'Placement'), ('transfer', 'Transfer'), ('adjustment', 'Adjustment'), ('import', 'Import'), ('opening', 'Opening balance')], max_length=20)),
+                ('createdUser', models.CharField(max_length=100)),
+                ('createdTime', models.DateTimeField(default=django.utils.timezone.now)),
+                ('productId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.product')),
+                ('warehouseId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['productId', 'warehouseId', 'createdTime'], name='movement_pair_time_idx'), models.Index(fields=['createdTime'], name='movement_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('snapshotId', models.AutoField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField()),
+                ('takenAt', models.DateTimeField()),
+                ('productId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.product')),
+                ('warehouseId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='idscore.warehouse')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('productId', 'warehouseId', 'takenAt'), name='snapshot_pair_time_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Starts the stock ledger: one opening movement per inventory row holding
+# stock, dated when its quantityAvailable was last written, so the sum of a
+# pair's movements equals its quantityAvailable from now on.
+
+from django.db import migrations
+
+CHUNK_SIZE = 5000
+
+
+def open_ledger(apps, schema_editor):
+    Inventory = apps.get_model('idscore', 'Inventory')
+    StockMovement = apps.get_model('idscore', 'StockMovement')
+    movements = []
+    inventories = Inventory.objects.exclude(quantityAvailable__isnull=True).exclude(quantityAvailable=0)
+    for productId, warehouseId, quantity, modifiedTime in inventories.values_list(
+        'productId', 'warehouseId', 'quantityAvailable', 'modifiedTime'
+    ).iterator(chunk_size=CHUNK_SIZE):
+        movements.append(StockMovement(
+            productId_id=productId, warehouseId_id=warehouseId, quantity=quantity,
+            reason='opening', createdUser='migration', createdTime=modifiedTime,
+        ))
+        if len(movements) >= CHUNK_SIZE:
+            StockMovement.objects.bulk_create(movements)
+            movements = []
+    StockMovement.objects.bulk_create(movements)
+
+
+def close_ledger(apps, schema_editor):
+    apps.get_model('idscore', 'StockMovement').objects.filter(reason='opening').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0012_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(open_ledger, close_ledger),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0013_opening_stock_movements'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('rowstatus', True), models.Q(('quantityAvailable__lt', models.F('minStockLevel')), ('quantityAvailable__lte', models.F('invreOrderPoint')), _connector='OR')), fields=['inventoryId'], name='inventory_low_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('rowstatus', True), models.Q(('quantityAvailable__lt', models.F('minStockLevel')), ('quantityAvailable__lte', models.F('invreOrderPoint')), _connector='OR')), fields=['warehouseId', 'inventoryId'], name='inventory_low_stock_wh_idx'),
+        ),
+    ]
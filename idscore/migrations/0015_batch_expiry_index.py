@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0014_inventory_low_stock_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(condition=models.Q(('rowstatus', True)), fields=['expiryDate', 'batchId'], name='batch_active_expiry_idx'),
+        ),
+    ]
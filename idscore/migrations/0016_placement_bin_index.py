@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idscore', '0015_batch_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='placement',
+            index=models.Index(condition=models.Q(('rowstatus', True)), fields=['warehouseId', 'aile', 'bin'], name='placement_active_bin_idx'),
+        ),
+    ]
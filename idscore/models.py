@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.postgres.fields import ArrayField
 from Authentication.models import Login
 
@@ -16,7 +17,7 @@ class Product(models.Model):
     qrCode = models.TextField()  # QR code for the product
     productName = models.CharField(max_length=255)  # Name of the product
     productDescription = models.TextField()  # Description of the product
-    productCategory = models.IntegerField()  # Category ID for the product
+    productCategory = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)  # Category of the product
     reOrderPoint = models.IntegerField()  # Reorder point quantity
     brand = models.CharField(max_length=100)  # Brand name of the product
     weight = models.CharField(max_length=50)  # Weight of the product
@@ -28,16 +29,28 @@ class Product(models.Model):
     modifiedTime = models.DateTimeField(auto_now=True)  # Timestamp when last modified
     rowstatus = models.BooleanField(default=True)  # Boolean field for row status
 
+    class Meta:
+        indexes = [
+            # Active products in id order (allProducts, products connection)
+            models.Index(fields=['productId'], condition=models.Q(rowstatus=True), name='product_active_idx'),
+        ]
+
     def __str__(self):
         return self.productName  # String representation of the product
     
+# Active inventories below their minimum stock level or at their reorder point (lowStockItems); the
+# query must use this exact condition for the database to pick the partial indexes built on it
+LOW_STOCK = models.Q(rowstatus=True) & (
+    models.Q(quantityAvailable__lt=models.F('minStockLevel')) | models.Q(quantityAvailable__lte=models.F('invreOrderPoint'))
+)
+
 # Model for inventory
 class Inventory(models.Model):
     inventoryId = models.AutoField(primary_key=True)  # Auto-incrementing primary key
     productId = models.ForeignKey(Product, on_delete=models.CASCADE)  # Foreign key to Product table
-    quantityAvailable = models.CharField(max_length=50,null=True, blank=True)  # Available quantity in inventory
-    minStockLevel = models.CharField(max_length=50,null=True, blank=True)  # Minimum stock level
-    maxStockLevel = models.CharField(max_length=50,null=True, blank=True)  # Maximum stock level
+    quantityAvailable = models.IntegerField(null=True, blank=True)  # Available quantity in inventory
+    minStockLevel = models.IntegerField(null=True, blank=True)  # Minimum stock level
+    maxStockLevel = models.IntegerField(null=True, blank=True)  # Maximum stock level
     invreOrderPoint = models.IntegerField(null=True, blank=True)  # Allow null values
     warehouseId = models.ForeignKey('Warehouse', on_delete=models.CASCADE)  # Foreign key to Warehouse table
     createdUser = models.CharField(max_length=100)  # User who created the inventory entry
@@ -46,6 +59,17 @@ class Inventory(models.Model):
     modifiedTime = models.DateTimeField(auto_now=True)  # Timestamp when last modified
     rowstatus = models.BooleanField(default=True)  # Boolean field for row status
 
+    class Meta:
+        constraints = [
+            # One inventory row per product and warehouse; its unique index also serves the (product, warehouse) lookups
+            models.UniqueConstraint(fields=['productId', 'warehouseId'], name='inventory_product_wh_uniq'),
+        ]
+        indexes = [
+            # Low stock inventories in id order, of all warehouses or of one (lowStockItems)
+            models.Index(fields=['inventoryId'], condition=LOW_STOCK, name='inventory_low_stock_idx'),
+            models.Index(fields=['warehouseId', 'inventoryId'], condition=LOW_STOCK, name='inventory_low_stock_wh_idx'),
+        ]
+
     def __str__(self):
         return f"Inventory for {self.productId.productName}"  # String representation of the inventory entry
 
@@ -86,13 +110,21 @@ class Batch(models.Model):
     productId = models.ForeignKey(Product, on_delete=models.CASCADE)  # Foreign key to Product table
     manufactureDate = models.DateField(null=True)  # Date of batch manufacturing
     expiryDate = models.DateField(null=True, blank=True)  # Expiry date of the batch
-    quantity = models.CharField()  # Quantity of products in the batch
+    quantity = models.IntegerField(default=0)  # Quantity of products in the batch
     createdUser = models.CharField(max_length=100)  # User who created the batch
     modifiedUser = models.CharField(max_length=100)  # User who last modified the batch
     createdTime = models.DateTimeField(auto_now_add=True)  # Timestamp when created
     modifiedTime = models.DateTimeField(auto_now=True)  # Timestamp when last modified
     rowstatus = models.BooleanField(default=True)  # Boolean field for row status
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['productId', 'rowstatus'], name='batch_product_status_idx'),
+            models.Index(fields=['productId'], condition=models.Q(rowstatus=True), name='batch_active_product_idx'),
+            # Active batches by expiry date, with the id as keyset tie-breaker (expiringBatches)
+            models.Index(fields=['expiryDate', 'batchId'], condition=models.Q(rowstatus=True), name='batch_active_expiry_idx'),
+        ]
+
     def __str__(self):
         return f'Batch {self.batchId} for {self.productId}'  # String representation of the batch
 
@@ -111,10 +143,68 @@ class Placement(models.Model):
     modifiedTime = models.DateTimeField(auto_now=True)  # Timestamp when last modified
     rowstatus = models.BooleanField(default=True)  # Boolean field for row status
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['productId', 'rowstatus'], name='placement_product_status_idx'),
+            models.Index(fields=['productId', 'warehouseId'], name='placement_product_wh_idx'),
+            # Active placements of a product (placementDetails prefetch) and in id order (placementDetails query)
+            models.Index(fields=['productId'], condition=models.Q(rowstatus=True), name='placement_active_product_idx'),
+            models.Index(fields=['placementId'], condition=models.Q(rowstatus=True), name='placement_active_idx'),
+            # Active placements of a bin, and of a warehouse in aisle / bin order (binContents, aisleMap)
+            models.Index(fields=['warehouseId', 'aile', 'bin'], condition=models.Q(rowstatus=True), name='placement_active_bin_idx'),
+        ]
+
     def __str__(self):
         return f'Placement {self.placementId} - Product: {self.productId}, Warehouse: {self.warehouseId}'  # String representation of the placement entry
 
 
+# Append-only ledger of quantityAvailable changes per product and warehouse
+class StockMovement(models.Model):
+    PLACEMENT = 'placement'  # createPlacement / updatePlacement within a warehouse
+    TRANSFER = 'transfer'  # placement or inventory moved to another warehouse
+    ADJUSTMENT = 'adjustment'  # quantityAvailable set by an inventory or product mutation
+    IMPORT = 'import'  # import_idscore
+    OPENING = 'opening'  # balance when the ledger was started
+    REASONS = [(PLACEMENT, 'Placement'), (TRANSFER, 'Transfer'), (ADJUSTMENT, 'Adjustment'), (IMPORT, 'Import'), (OPENING, 'Opening balance')]
+
+    movementId = models.AutoField(primary_key=True)  # Auto-incrementing primary key
+    productId = models.ForeignKey(Product, on_delete=models.CASCADE)  # Foreign key to Product table
+    warehouseId = models.ForeignKey(Warehouse, on_delete=models.CASCADE)  # Foreign key to Warehouse table
+    quantity = models.IntegerField()  # Signed change of quantityAvailable
+    reason = models.CharField(max_length=20, choices=REASONS)  # What caused the change
+    createdUser = models.CharField(max_length=100)  # User who made the change
+    createdTime = models.DateTimeField(default=timezone.now)  # When the change happened
+
+    class Meta:
+        indexes = [
+            # Movements of a pair after its latest snapshot (stockAt)
+            models.Index(fields=['productId', 'warehouseId', 'createdTime'], name='movement_pair_time_idx'),
+            # Movements since the previous snapshot run (snapshot_stock)
+            models.Index(fields=['createdTime'], name='movement_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'Movement {self.movementId}: {self.quantity:+d} of {self.productId_id} in {self.warehouseId_id}'
+
+
+# Stock of a product in a warehouse at a point in time, written by `manage.py snapshot_stock`
+class StockSnapshot(models.Model):
+    snapshotId = models.AutoField(primary_key=True)  # Auto-incrementing primary key
+    productId = models.ForeignKey(Product, on_delete=models.CASCADE)  # Foreign key to Product table
+    warehouseId = models.ForeignKey(Warehouse, on_delete=models.CASCADE)  # Foreign key to Warehouse table
+    quantity = models.IntegerField()  # Sum of the pair's movements up to takenAt
+    takenAt = models.DateTimeField()  # Movements created up to this time are included
+
+    class Meta:
+        constraints = [
+            # Also the index of the latest-snapshot lookup (stockAt)
+            models.UniqueConstraint(fields=['productId', 'warehouseId', 'takenAt'], name='snapshot_pair_time_uniq'),
+        ]
+
+    def __str__(self):
+        return f'Snapshot of {self.productId_id} in {self.warehouseId_id} at {self.takenAt}: {self.quantity}'
+
+
 class DeleteRequest(models.Model):
     deleteId = models.AutoField(primary_key=True)
     userId = models.ForeignKey('Authentication.Login', on_delete=models.CASCADE)  
@@ -0,0 +1,119 @@
+import base64
+import json
+import graphene
+from graphene import relay
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from graphql import GraphQLError
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+## Keyset (cursor) pagination for the idscore connections
+class CountableConnection(relay.Connection):
+    """
+    Relay connection with an optional `totalCount`; the COUNT query only runs
+    when the client selects the field.
+    """
+
+    class Meta:
+        abstract = True
+
+    totalCount = graphene.Int()
+
+    def resolve_totalCount(self, info):
+        return self.queryset.count()
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise GraphQLError(f"Invalid cursor '{cursor}'.")
+    if not isinstance(values, list) or len(values) != 2:
+        raise GraphQLError(f"Invalid cursor '{cursor}'.")
+    return values
+
+
+class Page:
+    """
+    One page of rows cut from a queryset with keyset conditions on
+    (sort key, primary key), so deep pages cost the same as the first one.
+    """
+
+    def __init__(self, queryset, order_by=None, allowed_order=(), first=None, after=None, last=None, before=None):
+        model = queryset.model
+        self.pk_name = model._meta.pk.name
+        self.queryset = queryset  # unsliced, used for totalCount
+
+        # Resolve the sort key; only indexed keys are allowed so the range scan stays cheap
+        order_by = order_by or self.pk_name
+        self.descending = order_by.startswith('-')
+        self.key = order_by.lstrip('-')
+        if self.key != self.pk_name and self.key not in allowed_order:
+            raise GraphQLError(f"Cannot order by '{order_by}'.")
+
+        if first is not None and last is not None:
+            raise GraphQLError("Pass either 'first' or 'last', not both.")
+        for name, value in (('first', first), ('last', last)):
+            if value is not None and value < 0:
+                raise GraphQLError(f"'{name}' must be a non-negative integer.")
+        if first is None and last is None:
+            first = DEFAULT_PAGE_SIZE
+
+        ordering = [self._order(self.key), self._order(self.pk_name)]
+        rows = queryset.order_by(*ordering)
+        if after is not None:
+            rows = rows.filter(self._seek(decode_cursor(after), forward=True))
+        if before is not None:
+            rows = rows.filter(self._seek(decode_cursor(before), forward=False))
+
+        if first is not None:
+            size = min(first, MAX_PAGE_SIZE)
+            fetched = list(rows[:size + 1])
+            self.rows = fetched[:size]
+            self.has_next_page = len(fetched) > size
+            self.has_previous_page = after is not None
+        else:
+            # Walk backwards from `before` (or the end) and restore the order afterwards
+            size = min(last, MAX_PAGE_SIZE)
+            fetched = list(rows.reverse()[:size + 1])
+            self.rows = fetched[:size][::-1]
+            self.has_previous_page = len(fetched) > size
+            self.has_next_page = before is not None
+
+        self.cursors = [encode_cursor([getattr(row, self.key), row.pk]) for row in self.rows]
+
+    def _order(self, field):
+        return f'-{field}' if self.descending else field
+
+    def _seek(self, values, forward):
+        key_value, pk_value = values
+        op = 'gt' if forward != self.descending else 'lt'
+        if self.key == self.pk_name:
+            return Q(**{f'{self.pk_name}__{op}': pk_value})
+        return Q(**{f'{self.key}__{op}': key_value}) | Q(**{self.key: key_value, f'{self.pk_name}__{op}': pk_value})
+
+    def connection(self, connection_type, nodes=None):
+        """
+        Wraps the page in `connection_type`; `nodes` replaces the rows as edge
+        nodes when the GraphQL type is not the model itself.
+        """
+        nodes = self.rows if nodes is None else nodes
+        edges = [connection_type.Edge(node=node, cursor=cursor) for node, cursor in zip(nodes, self.cursors)]
+        connection = connection_type(
+            edges=edges,
+            page_info=relay.PageInfo(
+                start_cursor=self.cursors[0] if self.cursors else None,
+                end_cursor=self.cursors[-1] if self.cursors else None,
+                has_previous_page=self.has_previous_page,
+                has_next_page=self.has_next_page,
+            ),
+        )
+        connection.queryset = self.queryset
+        return connection
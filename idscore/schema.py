@@ -1,30 +1,99 @@
 import json
 import graphene
+from graphene import relay
 from graphene_django import DjangoObjectType
-from .models import Product, Inventory, Warehouse, Batch, Location, Category, Placement, DeleteRequest, RequestProduct, Features
+from .models import Product, Inventory, Warehouse, Batch, Location, Category, Placement, DeleteRequest, RequestProduct, Features, StockMovement, LOW_STOCK
 from graphql_jwt.decorators import login_required
+from graphene.types.resolver import dict_or_attr_resolver
+from .loaders import get_loaders
+from .assemblers import product_queryset, assemble_product_responses, requested_product_fields
+from .selections import selection_tree
+from .pagination import CountableConnection, Page
+from .bulk import bulk_upsert_products
+from .stock import inventory_levels, record_stock_changes, recompute_inventory, stock_at
 import jwt
+import datetime
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from graphql import GraphQLError
+from django.utils import timezone
+from decimal import Decimal, InvalidOperation
+from django.conf import settings as django_settings
+
+
+def resolve_product_category(productCategory):
+    """
+    Returns the Category for a productCategory argument: a category id, or a
+    name, in which case the category is created when it does not exist yet.
+    """
+    try:
+        categoryId = int(productCategory)
+    except ValueError:
+        category, created = Category.objects.get_or_create(name=productCategory)
+        return category
+    try:
+        return Category.objects.get(pk=categoryId)
+    except Category.DoesNotExist:
+        raise ValueError(f"Category with id {categoryId} does not exist.")
+
+
+def parse_quantity(value, name):
+    """
+    Converts a quantity argument to the integer stored in the database.
+    Quantities are still sent and returned as strings, as they were when the
+    columns were CharFields; a blank string means no value.
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"{name} must be a whole number, got '{value}'.")
+    if not number.is_finite() or number != number.to_integral_value():
+        raise ValueError(f"{name} must be a whole number, got '{value}'.")
+    return int(number)
+
 
 # Define GraphQL Types for Django Models
 
 class ProductType(DjangoObjectType):
+    # Still the category id, as before the column became a foreign key
+    productCategory = graphene.Int()
+    category = graphene.Field(lambda: CategoryType)
+
     class Meta:
         model = Product
+
+    def resolve_productCategory(self, info):
+        return self.productCategory_id
+
+    def resolve_category(self, info):
+        if self.productCategory_id is None:
+            return None
+        return get_loaders(info).category.load(self.productCategory_id)
     
 class InventoryType(DjangoObjectType):
     invreOrderPoint = graphene.Int()  # Make it nullable
     warehouseName = graphene.String()
     warehouseId = graphene.Int()   
+    # Integer columns, kept as String in the API for existing clients
+    quantityAvailable = graphene.String()
+    minStockLevel = graphene.String()
+    maxStockLevel = graphene.String()
 
     class Meta:
         model = Inventory
     
     def resolve_warehouseId(self, info):
-        return self.warehouseId.pk  # Return the primary key of the warehouse
+        return self.warehouseId_id  # Return the primary key of the warehouse without fetching it
     
     def resolve_warehouseName(self, info):
-        # Resolve warehousename from the related Warehouse object
-        return self.warehouseId.warehouseName if self.warehouseId else None
+        # Resolve warehousename from the related Warehouse object through the request loader
+        warehouse = get_loaders(info).warehouse.load(self.warehouseId_id)
+        return warehouse.warehouseName if warehouse else None
+
+    def resolve_productId(self, info):
+        return get_loaders(info).product.load(self.productId_id)
 
 
 class LocationType(DjangoObjectType):
@@ -39,16 +108,24 @@ class WarehouseType(DjangoObjectType):
     location = graphene.Field(LocationType)
 
     def resolve_location(self, info):
-        return self.locationId
+        return get_loaders(info).location.load(self.locationId_id)
+
+    def resolve_locationId(self, info):
+        return get_loaders(info).location.load(self.locationId_id)
 
 class CategoryType(DjangoObjectType):
     class Meta:
         model = Category
 
 class BatchType(DjangoObjectType):
+    quantity = graphene.String(required=True)  # Integer column, kept as String in the API
+
     class Meta:
         model = Batch
 
+    def resolve_productId(self, info):
+        return get_loaders(info).product.load(self.productId_id)
+
 
 class PlacementType(DjangoObjectType):
     productId = graphene.Field(ProductType)
@@ -99,7 +176,7 @@ class CreateCategory(graphene.Mutation):
         try:
             category = Category(name=name, image=image, rowstatus=rowstatus)
             category.save()
-            return CreateCategory(category=category, status_code=200, message="Category created successfully.")
+            return CreateCategory(category=category, statusCode=200, message="Category created successfully.")
         except Exception as e:
             return CreateCategory(statusCode=400, message=str(e))
 
@@ -133,7 +210,7 @@ class UpdateCategory(graphene.Mutation):
                 category.rowstatus = rowstatus
 
             category.save()
-            return UpdateCategory(category=category, status_code=200, message="Category updated successfully.")
+            return UpdateCategory(category=category, statusCode=200, message="Category updated successfully.")
         except Exception as e:
             return UpdateCategory(statusCode=400, message=str(e))
 
@@ -153,7 +230,7 @@ class DeleteCategory(graphene.Mutation):
             category = Category.objects.get(pk=categoryId)
             category.rowstatus = False  # Soft delete by setting rowstatus to False
             category.save()
-            return DeleteCategory(category_id=categoryId, status_code=200, message="Category deleted successfully.")
+            return DeleteCategory(categoryId=categoryId, statusCode=200, message="Category deleted successfully.")
         except Category.DoesNotExist:
             raise Exception(f"Category with id {categoryId} does not exist.")
         except Exception as e:
@@ -186,32 +263,39 @@ class CreateInventory(graphene.Mutation):
 
             # Set default values or handle None
             invreOrderPoint = kwargs.get('invreOrderPoint', None)
-            quantityAvailable = kwargs.get('quantityAvailable', None)
+            quantityAvailable = parse_quantity(kwargs.get('quantityAvailable', None), 'quantityAvailable')
+            minStockLevel = parse_quantity(kwargs['minStockLevel'], 'minStockLevel')
+            maxStockLevel = parse_quantity(kwargs['maxStockLevel'], 'maxStockLevel')
 
-            # Use get_or_create to handle unique constraint
-            inventory, created = Inventory.objects.get_or_create(
-                productId=product,
-                warehouseId=warehouse,
-                defaults={
-                    'quantityAvailable': quantityAvailable,
-                    'minStockLevel': kwargs['minStockLevel'],
-                    'maxStockLevel': kwargs['maxStockLevel'],
-                    'invreOrderPoint': invreOrderPoint,
-                    'createdUser': username,
-                    'modifiedUser': username,
-                    'rowstatus': kwargs['rowstatus']
-                }
-            )
+            with transaction.atomic():
+                before = inventory_levels([product.pk])
 
-            if not created:
-                # If the inventory entry already exists, update it
-                inventory.quantityAvailable = quantityAvailable if quantityAvailable is not None else inventory.quantityAvailable
-                inventory.minStockLevel = kwargs['minStockLevel']
-                inventory.maxStockLevel = kwargs['maxStockLevel']
-                inventory.invreOrderPoint = invreOrderPoint
-                inventory.modifiedUser = username
-                inventory.rowstatus = kwargs['rowstatus']
-                inventory.save()
+                # Use get_or_create to handle unique constraint
+                inventory, created = Inventory.objects.get_or_create(
+                    productId=product,
+                    warehouseId=warehouse,
+                    defaults={
+                        'quantityAvailable': quantityAvailable,
+                        'minStockLevel': minStockLevel,
+                        'maxStockLevel': maxStockLevel,
+                        'invreOrderPoint': invreOrderPoint,
+                        'createdUser': username,
+                        'modifiedUser': username,
+                        'rowstatus': kwargs['rowstatus']
+                    }
+                )
+
+                if not created:
+                    # If the inventory entry already exists, update it
+                    inventory.quantityAvailable = quantityAvailable if quantityAvailable is not None else inventory.quantityAvailable
+                    inventory.minStockLevel = minStockLevel
+                    inventory.maxStockLevel = maxStockLevel
+                    inventory.invreOrderPoint = invreOrderPoint
+                    inventory.modifiedUser = username
+                    inventory.rowstatus = kwargs['rowstatus']
+                    inventory.save()
+
+                record_stock_changes(before, inventory_levels([product.pk]), StockMovement.ADJUSTMENT, username)
 
             # Fetch all inventories related to the product
             inventories = Inventory.objects.filter(productId=product)
@@ -262,21 +346,28 @@ class UpdateInventory(graphene.Mutation):
             username = get_username_from_token(token)
 
             if 'quantityAvailable' in kwargs:
-                inventory.quantityAvailable = kwargs['quantityAvailable']
+                inventory.quantityAvailable = parse_quantity(kwargs['quantityAvailable'], 'quantityAvailable')
             if 'minStockLevel' in kwargs:
-                inventory.minStockLevel = kwargs['minStockLevel']
+                inventory.minStockLevel = parse_quantity(kwargs['minStockLevel'], 'minStockLevel')
             if 'maxStockLevel' in kwargs:
-                inventory.maxStockLevel = kwargs['maxStockLevel']
+                inventory.maxStockLevel = parse_quantity(kwargs['maxStockLevel'], 'maxStockLevel')
             if 'invreOrderPoint' in kwargs:
                 inventory.invreOrderPoint = kwargs['invreOrderPoint']
+            # Moving the inventory to another warehouse is a transfer of its stock
+            reason = StockMovement.ADJUSTMENT
             if 'warehouseId' in kwargs:
                 warehouse = Warehouse.objects.get(pk=kwargs['warehouseId'])
+                if warehouse.pk != inventory.warehouseId_id:
+                    reason = StockMovement.TRANSFER
                 inventory.warehouseId = warehouse
             inventory.modifiedUser = username
             if 'rowstatus' in kwargs:
                 inventory.rowstatus = kwargs['rowstatus']
 
-            inventory.save()
+            with transaction.atomic():
+                before = inventory_levels([inventory.productId_id])
+                inventory.save()
+                record_stock_changes(before, inventory_levels([inventory.productId_id]), reason, username)
 
             # Fetch all inventories related to the product
             inventories = Inventory.objects.filter(productId=inventory.productId)
@@ -342,55 +433,54 @@ class CreateProduct(graphene.Mutation):
             # Convert the images list to a JSON string
             images_json = json.dumps(images)
 
-            # Check if productcategory is an integer
-            try:
-                productCategory_id = int(productCategory)
-            except ValueError:
-                # If productcategory cannot be converted to an integer, treat it as a string
-                category, created = Category.objects.get_or_create(name=productCategory)
-                productCategory_id = category.categoryId
-
-            # Create the Product instance
-            product = Product(
-                productCode=productCode,
-                qrCode=qrCode,
-                productName=productName,
-                productDescription=productDescription,
-                productCategory=productCategory_id,
-                reOrderPoint=reOrderPoint,
-                brand=brand,
-                weight=weight,
-                dimensions=dimensions,
-                images=images_json,
-                createdUser=username,
-                modifiedUser=username
-            )
-            product.save()
-
-            # Create Inventory instances related to the Product
-            for inventory_detail in inventory_details:
-                warehouse = Warehouse.objects.get(pk=inventory_detail['warehouseId'])
-                quantityAvailable = inventory_detail.get('quantityAvailable', None)  # Default to None if not provided
-                inventory, created = Inventory.objects.get_or_create(
-                    productId=product,
-                    warehouseId=warehouse,
-                    defaults={
-                        'quantityAvailable': quantityAvailable,
-                        'minStockLevel': inventory_detail['minStockLevel'],
-                        'maxStockLevel': inventory_detail['maxStockLevel'],
-                        'invreOrderPoint': inventory_detail['invreOrderPoint'],
-                        'createdUser': username,
-                        'modifiedUser': username
-                    }
+            category = resolve_product_category(productCategory)
+
+            with transaction.atomic():
+                # Create the Product instance
+                product = Product(
+                    productCode=productCode,
+                    qrCode=qrCode,
+                    productName=productName,
+                    productDescription=productDescription,
+                    productCategory=category,
+                    reOrderPoint=reOrderPoint,
+                    brand=brand,
+                    weight=weight,
+                    dimensions=dimensions,
+                    images=images_json,
+                    createdUser=username,
+                    modifiedUser=username
                 )
-                if not created:
-                    # If inventory entry already exists, update it
-                    inventory.quantityAvailable = quantityAvailable
-                    inventory.minStockLevel = inventory_detail['minStockLevel']
-                    inventory.maxStockLevel = inventory_detail['maxStockLevel']
-                    inventory.invreOrderPoint = inventory_detail['invreOrderPoint']
-                    inventory.modifiedUser = username
-                    inventory.save()
+                product.save()
+
+                # Create Inventory instances related to the Product
+                for inventory_detail in inventory_details:
+                    warehouse = Warehouse.objects.get(pk=inventory_detail['warehouseId'])
+                    quantityAvailable = parse_quantity(inventory_detail.get('quantityAvailable', None), 'quantityAvailable')  # Default to None if not provided
+                    minStockLevel = parse_quantity(inventory_detail['minStockLevel'], 'minStockLevel')
+                    maxStockLevel = parse_quantity(inventory_detail['maxStockLevel'], 'maxStockLevel')
+                    inventory, created = Inventory.objects.get_or_create(
+                        productId=product,
+                        warehouseId=warehouse,
+                        defaults={
+                            'quantityAvailable': quantityAvailable,
+                            'minStockLevel': minStockLevel,
+                            'maxStockLevel': maxStockLevel,
+                            'invreOrderPoint': inventory_detail['invreOrderPoint'],
+                            'createdUser': username,
+                            'modifiedUser': username
+                        }
+                    )
+                    if not created:
+                        # If inventory entry already exists, update it
+                        inventory.quantityAvailable = quantityAvailable
+                        inventory.minStockLevel = minStockLevel
+                        inventory.maxStockLevel = maxStockLevel
+                        inventory.invreOrderPoint = inventory_detail['invreOrderPoint']
+                        inventory.modifiedUser = username
+                        inventory.save()
+
+                record_stock_changes({}, inventory_levels([product.pk]), StockMovement.ADJUSTMENT, username)
 
             return CreateProduct(statusCode=200, message="Product and inventories created successfully.")
         except Exception as e:
@@ -435,12 +525,7 @@ class UpdateProduct(graphene.Mutation):
             if productDescription:
                 product.productDescription = productDescription
             if productCategory:
-                try:
-                    productCategory_id = int(productCategory)
-                except ValueError:
-                    category, created = Category.objects.get_or_create(name=productCategory)
-                    productCategory_id = category.category_id
-                product.productCategory = productCategory_id
+                product.productCategory = resolve_product_category(productCategory)
             if reOrderPoint is not None:
                 product.reOrderPoint = reOrderPoint
             if brand:
@@ -457,19 +542,22 @@ class UpdateProduct(graphene.Mutation):
 
             # Update related Inventory instances
             if inventory_details:
-                for inventory_detail in inventory_details:
-                    warehouse = Warehouse.objects.get(pk=inventory_detail['warehouseId'])
-                    inventory, created = Inventory.objects.update_or_create(
-                        productId=product,
-                        warehouseId=warehouse,
-                        defaults={
-                            'quantityAvailable': inventory_detail['quantityAvailable'],
-                            'minStockLevel': inventory_detail['minStockLevel'],
-                            'maxStockLevel': inventory_detail['maxStockLevel'],
-                            'invreOrderPoint': inventory_detail['invreOrderPoint'],
-                            'modifiedUser': username
-                        }
-                    )
+                with transaction.atomic():
+                    before = inventory_levels([product.pk])
+                    for inventory_detail in inventory_details:
+                        warehouse = Warehouse.objects.get(pk=inventory_detail['warehouseId'])
+                        inventory, created = Inventory.objects.update_or_create(
+                            productId=product,
+                            warehouseId=warehouse,
+                            defaults={
+                                'quantityAvailable': parse_quantity(inventory_detail.get('quantityAvailable'), 'quantityAvailable'),
+                                'minStockLevel': parse_quantity(inventory_detail['minStockLevel'], 'minStockLevel'),
+                                'maxStockLevel': parse_quantity(inventory_detail['maxStockLevel'], 'maxStockLevel'),
+                                'invreOrderPoint': inventory_detail['invreOrderPoint'],
+                                'modifiedUser': username
+                            }
+                        )
+                    record_stock_changes(before, inventory_levels([product.pk]), StockMovement.ADJUSTMENT, username)
 
             return UpdateProduct(statusCode=200, message="Product and inventories updated successfully.")
         except Product.DoesNotExist:
@@ -496,11 +584,8 @@ class DeleteProduct(graphene.Mutation):
             product.rowstatus = False  
             product.save()
 
-            # Soft delete related Inventory instances
-            inventories = Inventory.objects.filter(productId=product)
-            for inventory in inventories:
-                inventory.rowstatus = False
-                inventory.save()
+            # Soft delete related Inventory instances in one UPDATE (auto_now is not applied by update())
+            Inventory.objects.filter(productId=product).update(rowstatus=False, modifiedTime=timezone.now())
 
             return DeleteProduct(productId=productId, statusCode=200, message="Product deleted successfully.")
         except Product.DoesNotExist:
@@ -509,6 +594,82 @@ class DeleteProduct(graphene.Mutation):
             return DeleteProduct(statusCode=400, message=str(e))
 
 
+# Mutation for creating / updating many Products and their Inventories at once
+
+class ProductInput(graphene.InputObjectType):
+    productCode = graphene.String(required=True)
+    qrCode = graphene.String()
+    productName = graphene.String()  # required for new products
+    productDescription = graphene.String()  # required for new products
+    productCategory = graphene.String(required=True)
+    reOrderPoint = graphene.Int()
+    brand = graphene.String()
+    weight = graphene.String()
+    dimensions = graphene.String()
+    images = graphene.List(graphene.String)
+    inventoryDetails = graphene.List(graphene.NonNull(InventoryInputType))
+
+
+class BulkRowErrorType(graphene.ObjectType):
+    index = graphene.Int()  # position of the row in `products`
+    productCode = graphene.String()
+    message = graphene.String()
+
+
+class BulkUpsertProducts(graphene.Mutation):
+    class Arguments:
+        products = graphene.List(graphene.NonNull(ProductInput), required=True)
+
+    statusCode = graphene.Int()
+    message = graphene.String()
+    created = graphene.Int()
+    updated = graphene.Int()
+    errors = graphene.List(BulkRowErrorType)
+
+    @login_required
+    def mutate(self, info, products):
+        max_rows = getattr(django_settings, 'GRAPHQL_BULK_UPSERT_MAX_ROWS', 5000)
+        if len(products) > max_rows:
+            return BulkUpsertProducts(statusCode=400, message=f"At most {max_rows} products can be upserted at once.", created=0, updated=0, errors=[])
+        try:
+            # Get the username from the token
+            token = info.context.META.get('HTTP_AUTHORIZATION').split(' ')[1]
+            username = get_username_from_token(token)
+
+            # Rows that fail validation are reported and left out; the others are still written
+            rows, errors = {}, []
+            for index, product in enumerate(products):
+                try:
+                    row = {name: product.get(name) for name in ProductInput._meta.fields if name != 'inventoryDetails'}
+                    if row['images'] is not None:
+                        row['images'] = json.dumps(row['images'])
+                    row['inventoryDetails'] = [{
+                        'warehouseId': detail['warehouseId'],
+                        'quantityAvailable': parse_quantity(detail.get('quantityAvailable'), 'quantityAvailable'),
+                        'minStockLevel': parse_quantity(detail['minStockLevel'], 'minStockLevel'),
+                        'maxStockLevel': parse_quantity(detail['maxStockLevel'], 'maxStockLevel'),
+                        'invreOrderPoint': detail.get('invreOrderPoint'),
+                    } for detail in product.get('inventoryDetails') or []]
+                    rows[index] = row
+                except ValueError as e:
+                    errors.append((index, product.get('productCode'), str(e)))
+
+            result = bulk_upsert_products(rows, username)
+            errors = sorted(errors + result.errors, key=lambda error: error[0])
+            if not errors:
+                statusCode, message = 200, "Products upserted successfully."
+            elif len(errors) < len(products):
+                statusCode, message = 207, f"{len(errors)} of {len(products)} products were not saved."
+            else:
+                statusCode, message = 400, "No products were saved."
+            return BulkUpsertProducts(
+                statusCode=statusCode, message=message, created=result.created, updated=result.updated,
+                errors=[BulkRowErrorType(index=index, productCode=productCode, message=error) for index, productCode, error in errors],
+            )
+        except Exception as e:
+            return BulkUpsertProducts(statusCode=400, message=str(e), created=0, updated=0, errors=[])
+
+
 # Mutation for Creating Warehouses
 
 class CreateWarehouse(graphene.Mutation):
@@ -607,14 +768,46 @@ class PlacementType(graphene.ObjectType):
     modifiedTime = graphene.DateTime()    
     batches = graphene.List(BatchDetailType)
 
+    # productId and warehouseId hold primary keys; the objects come from the request loaders
+    def resolve_productId(self, info):
+        return get_loaders(info).product.load(dict_or_attr_resolver('productId', None, self, info))
+
+    def resolve_warehouseId(self, info):
+        return get_loaders(info).warehouse.load(dict_or_attr_resolver('warehouseId', None, self, info))
+
 class PlacementDetailType(graphene.ObjectType):
     warehouseId = graphene.Int()
     productId = graphene.Int()
     warehouseName = graphene.String()
     placements = graphene.List(PlacementType)
 
+
+def placement_to_type(placement, batch):
+    # Build the PlacementType for a Placement row and its already loaded Batch
+    return PlacementType(
+        placementId=placement.pk,
+        productId=placement.productId_id,
+        warehouseId=placement.warehouseId_id,
+        placementQuantity=placement.placementQuantity,
+        aile=placement.aile,
+        bin=placement.bin,
+        createdUser=placement.createdUser,
+        modifiedUser=placement.modifiedUser,
+        createdTime=placement.createdTime,
+        modifiedTime=placement.modifiedTime,
+        batches=[
+            BatchDetailType(
+                batchId=batch.pk,
+                manufactureDate=batch.manufactureDate,
+                expiryDate=batch.expiryDate,
+                quantity=batch.quantity,
+                createdUser=batch.createdUser,
+                modifiedUser=batch.modifiedUser
+            )
+        ]
+    )
+
 from django.db import transaction
-from django.db.models import Sum
 
 class CreatePlacement(graphene.Mutation):
     placementDetails = graphene.List(PlacementDetailType)
@@ -644,7 +837,7 @@ class CreatePlacement(graphene.Mutation):
                 productId=product,
                 manufactureDate=manufactureDate,
                 expiryDate=expiryDate,
-                quantity=quantity,
+                quantity=parse_quantity(quantity, 'quantity') or 0,
                 createdUser=username,
                 modifiedUser=username
             )
@@ -652,8 +845,8 @@ class CreatePlacement(graphene.Mutation):
             # Create Placement objects
             created_placements = cls.create_placements(batch, product, placements, username)
 
-            # Update or create Inventory entries
-            cls.update_inventory(product, placements, username)
+            # Recompute the Inventory totals of the warehouses placed in
+            recompute_inventory({(product.pk, placement_input.warehouseId) for placement_input in placements}, username)
 
             # Retrieve all placement details related to the productId after creation
             placement_details = cls.get_placement_details(product)
@@ -684,49 +877,15 @@ class CreatePlacement(graphene.Mutation):
             created_placements.append(placement)
         return created_placements
 
-    @classmethod
-    def update_inventory(cls, product, placements, username):
-        from collections import defaultdict
-
-        # Calculate total quantities per warehouse
-        warehouse_totals = defaultdict(int)
-        for placement_input in placements:
-            warehouse_totals[placement_input.warehouseId] += int(placement_input.placementQuantity)
-
-        # Update or create Inventory entries
-        for warehouseId, total_quantity in warehouse_totals.items():
-            warehouse = Warehouse.objects.get(pk=warehouseId)
-
-            # Calculate total quantity for the warehouse and product
-            total_quantity = Placement.objects.filter(productId=product, warehouseId=warehouse).aggregate(total_quantity=Sum('placementQuantity'))['total_quantity']
-
-            # Update or create the inventory entry
-            inventory, created = Inventory.objects.update_or_create(
-                productId=product,
-                warehouseId=warehouse,
-                defaults={
-                    'quantityAvailable': str(total_quantity),
-                    'createdUser': username,
-                    'modifiedUser': username
-                }
-            )
-            if not created:
-                # Update existing Inventory entry
-                inventory.quantityAvailable = str(total_quantity)
-                inventory.modifiedUser = username
-                inventory.save()
-
-        return
-
     @classmethod
     def get_placement_details(cls, product):
     # Retrieve all placements related to the product
-        placements = Placement.objects.filter(productId=product)
+        placements = Placement.objects.filter(productId=product).select_related('warehouseId', 'batchId')
         warehouse_details = {}
 
         for placement in placements:
-            warehouse_id = placement.warehouseId.pk
-            product_id = placement.productId.pk
+            warehouse_id = placement.warehouseId_id
+            product_id = placement.productId_id
             if warehouse_id not in warehouse_details:
                 warehouse_details[warehouse_id] = {
                 'warehouseId': warehouse_id,
@@ -738,6 +897,8 @@ class CreatePlacement(graphene.Mutation):
             batch = placement.batchId
             placement_detail = {
             'placementId': placement.pk,
+            'productId': product_id,
+            'warehouseId': warehouse_id,
             'placementQuantity': placement.placementQuantity,
             'aile': placement.aile,
             'bin': placement.bin,
@@ -783,15 +944,15 @@ class UpdatePlacement(graphene.Mutation):
             # Update the Batch object
             batch.manufactureDate = manufactureDate
             batch.expiryDate = expiryDate
-            batch.quantity = quantity
+            batch.quantity = parse_quantity(quantity, 'quantity') or 0
             batch.modifiedUser = username
             batch.save()
 
             # Update the Placement objects
-            updated_placements = cls.update_placements(batch, product, placements, username)
+            affected_pairs, moved = cls.update_placements(batch, product, placements, username)
 
-            # Update or create Inventory entries
-            cls.update_inventory(product, placements, username)
+            # Recompute the Inventory totals of the warehouses placed in, and of the ones placements moved out of
+            recompute_inventory(affected_pairs, username, StockMovement.TRANSFER if moved else StockMovement.PLACEMENT)
 
             # Retrieve all placement details related to the productId after update
             placement_details = cls.get_placement_details(product)
@@ -808,10 +969,14 @@ class UpdatePlacement(graphene.Mutation):
 
     @classmethod
     def update_placements(cls, batch, product, placements, username):
-        updated_placements = []
+        # (product, warehouse) pairs of the placements before and after the update, and whether any changed warehouse
+        affected_pairs = set()
+        moved = False
         for placement_input in placements:
             warehouse = Warehouse.objects.get(pk=placement_input.warehouseId)
             placement = Placement.objects.get(pk=placement_input.placementId)
+            affected_pairs.add((placement.productId_id, placement.warehouseId_id))
+            moved = moved or placement.warehouseId_id != warehouse.pk
             placement.batchId = batch
             placement.productId = product
             placement.warehouseId = warehouse
@@ -820,52 +985,18 @@ class UpdatePlacement(graphene.Mutation):
             placement.bin = placement_input.bin
             placement.modifiedUser = username
             placement.save()
-            updated_placements.append(placement)
-        return updated_placements
-
-    @classmethod
-    def update_inventory(cls, product, placements, username):
-        from collections import defaultdict
-
-        # Calculate total quantities per warehouse
-        warehouse_totals = defaultdict(int)
-        for placement_input in placements:
-            warehouse_totals[placement_input.warehouseId] += int(placement_input.placementQuantity)
-
-        # Update or create Inventory entries
-        for warehouseId, total_quantity in warehouse_totals.items():
-            warehouse = Warehouse.objects.get(pk=warehouseId)
-
-            # Calculate total quantity for the warehouse and product
-            total_quantity = Placement.objects.filter(productId=product, warehouseId=warehouse).aggregate(total_quantity=Sum('placementQuantity'))['total_quantity']
-
-            # Update or create the inventory entry
-            inventory, created = Inventory.objects.update_or_create(
-                productId=product,
-                warehouseId=warehouse,
-                defaults={
-                    'quantityAvailable': str(total_quantity),
-                    'createdUser': username,
-                    'modifiedUser': username
-                }
-            )
-            if not created:
-                # Update existing Inventory entry
-                inventory.quantityAvailable = str(total_quantity)
-                inventory.modifiedUser = username
-                inventory.save()
-
-        return
+            affected_pairs.add((product.pk, warehouse.pk))
+        return affected_pairs, moved
 
     @classmethod
     def get_placement_details(cls, product):
         # Retrieve all placements related to the product
-        placements = Placement.objects.filter(productId=product)
+        placements = Placement.objects.filter(productId=product).select_related('warehouseId', 'batchId')
         warehouse_details = {}
 
         for placement in placements:
-            warehouse_id = placement.warehouseId.pk
-            product_id = placement.productId.pk
+            warehouse_id = placement.warehouseId_id
+            product_id = placement.productId_id
             if warehouse_id not in warehouse_details:
                 warehouse_details[warehouse_id] = {
                     'warehouseId': warehouse_id,
@@ -877,6 +1008,8 @@ class UpdatePlacement(graphene.Mutation):
             batch = placement.batchId
             placement_detail = {
                 'placementId': placement.pk,
+                'productId': product_id,
+                'warehouseId': warehouse_id,
                 'placementQuantity': placement.placementQuantity,
                 'aile': placement.aile,
                 'bin': placement.bin,
@@ -960,9 +1093,17 @@ class DeletePlacement(graphene.Mutation):
     @login_required
     def mutate(self, info, placementId):
         try:
-            placement = Placement.objects.get(pk=placementId)
-            placement.rowstatus = False  # Soft delete by setting rowstatus to False
-            placement.save()
+            token = info.context.META.get('HTTP_AUTHORIZATION').split(' ')[1]
+            username = get_username_from_token(token)
+
+            with transaction.atomic():
+                placement = Placement.objects.get(pk=placementId)
+                placement.rowstatus = False  # Soft delete by setting rowstatus to False
+                placement.modifiedUser = username
+                placement.save()
+
+                # The deleted placement no longer counts towards the stock of its product in its warehouse
+                recompute_inventory({(placement.productId_id, placement.warehouseId_id)}, username)
 
             return DeletePlacement(statusCode=200, message="Placement deleted successfully.")
         except Placement.DoesNotExist:
@@ -1146,6 +1287,89 @@ class ProductResponseType(graphene.ObjectType):
     # batchDetails = graphene.List(BatchDetailType)  # Uncomment if needed
 
 
+class ExpiringBatchType(graphene.ObjectType):
+    batchId = graphene.Int()
+    manufactureDate = graphene.Date()
+    expiryDate = graphene.Date()
+    daysLeft = graphene.Int()
+    quantity = graphene.Int()  # Remaining quantity: total of the batch's active placements (in the warehouse, if filtered)
+    product = graphene.Field(ProductType)
+    placements = graphene.List(PlacementType)
+
+    def resolve_product(self, info):
+        return get_loaders(info).product.load(self.productId)
+
+
+def expiring_batch_to_type(batch, today):
+    # Build the ExpiringBatchType for a Batch row with its prefetched `active_placements`
+    node = ExpiringBatchType(
+        batchId=batch.pk,
+        manufactureDate=batch.manufactureDate,
+        expiryDate=batch.expiryDate,
+        daysLeft=(batch.expiryDate - today).days,
+        quantity=sum(placement.placementQuantity for placement in batch.active_placements),
+        placements=[placement_to_type(placement, batch) for placement in batch.active_placements],
+    )
+    node.productId = batch.productId_id
+    return node
+
+
+class BinContentsType(graphene.ObjectType):
+    warehouseId = graphene.Int()
+    aile = graphene.String()
+    bin = graphene.String()
+    quantity = graphene.Int()  # Total of the bin's active placements
+    placements = graphene.List(PlacementType)
+
+
+def bins_to_types(info, placements, warehouseId):
+    # Group active placements, ordered by aisle and bin, into one BinContentsType per bin; their
+    # batches, products and warehouses are fetched once for all bins through the request loaders
+    loaders = get_loaders(info)
+    placements = loaders.prime_from(list(placements))
+    bins = {}
+    for placement in placements:
+        bins.setdefault((placement.aile, placement.bin), []).append(placement_to_type(placement, loaders.batch.load(placement.batchId_id)))
+    return [
+        BinContentsType(
+            warehouseId=warehouseId, aile=aile, bin=bin, placements=nodes,
+            quantity=sum(node.placementQuantity for node in nodes),
+        )
+        for (aile, bin), nodes in bins.items()
+    ]
+
+
+# Connection types for the paginated list queries
+
+class ProductResponseConnection(CountableConnection):
+    class Meta:
+        node = ProductResponseType
+
+class InventoryConnection(CountableConnection):
+    class Meta:
+        node = InventoryType
+
+class WarehouseConnection(CountableConnection):
+    class Meta:
+        node = WarehouseType
+
+class LocationConnection(CountableConnection):
+    class Meta:
+        node = LocationType
+
+class CategoryConnection(CountableConnection):
+    class Meta:
+        node = CategoryType
+
+class PlacementConnection(CountableConnection):
+    class Meta:
+        node = PlacementType
+
+class ExpiringBatchConnection(CountableConnection):
+    class Meta:
+        node = ExpiringBatchType
+
+
 # Root Query class to define all queries
 
 class Query(graphene.ObjectType):
@@ -1174,47 +1398,42 @@ class Query(graphene.ObjectType):
     placementDetails = graphene.List(PlacementDetailType)
     placementById = graphene.Field(PlacementDetailType, placementId=graphene.Int(required=True))
 
+    # Cursor-paginated versions of the list queries (first/after/last/before, optional totalCount)
+    products = relay.ConnectionField(ProductResponseConnection, orderBy=graphene.String(), categoryId=graphene.Int())
+    inventories = relay.ConnectionField(InventoryConnection, orderBy=graphene.String())
+    warehouses = relay.ConnectionField(WarehouseConnection, orderBy=graphene.String())
+    locations = relay.ConnectionField(LocationConnection, orderBy=graphene.String())
+    categories = relay.ConnectionField(CategoryConnection, orderBy=graphene.String())
+    placements = relay.ConnectionField(PlacementConnection, orderBy=graphene.String())
+    lowStockItems = relay.ConnectionField(InventoryConnection, warehouseId=graphene.Int(), categoryId=graphene.Int())
+    expiringBatches = relay.ConnectionField(ExpiringBatchConnection, withinDays=graphene.Int(required=True), warehouseId=graphene.Int())
+
+    # What is stored in one bin, and in every bin of a warehouse
+    binContents = graphene.Field(BinContentsType, warehouseId=graphene.Int(required=True), aile=graphene.String(required=True), bin=graphene.String(required=True))
+    aisleMap = graphene.List(BinContentsType, warehouseId=graphene.Int(required=True))
+
+    # Stock of a product in a warehouse at a point in time (default: now), from the stock ledger
+    stock_at = graphene.Int(productId=graphene.Int(required=True), warehouseId=graphene.Int(required=True), at=graphene.DateTime())
 
     @login_required
     def resolve_placementDetails(self, info):
         from collections import defaultdict
 
-        # Fetch all placements with rowstatus=True
-        placements = Placement.objects.filter(rowstatus=True)
+        loaders = get_loaders(info)
+
+        # Fetch all placements with rowstatus=True and queue their warehouses and batches
+        placements = loaders.prime_from(list(Placement.objects.filter(rowstatus=True).order_by('placementId')))
 
         # Group placements by warehouse
         warehouse_placements = defaultdict(list)
         for placement in placements:
-            warehouse_placements[placement.warehouseId.pk].append(placement)
+            warehouse_placements[placement.warehouseId_id].append(placement)
 
         # Create the response format
         response = []
         for warehouseId, placements in warehouse_placements.items():
-            warehouse = Warehouse.objects.get(pk=warehouseId)
-            placement_list = []
-            for placement in placements:
-                batch = placement.batchId  # Assuming Placement model has a ForeignKey to Batch model
-                placement_detail = PlacementType(
-                    placementId=placement.pk,
-                    placementQuantity=placement.placementQuantity,
-                    aile=placement.aile,
-                    bin=placement.bin,
-                    createdUser=placement.createdUser,
-                    modifiedUser=placement.modifiedUser,
-                    createdTime=placement.createdTime,
-                    modifiedTime=placement.modifiedTime,
-                    batches=[
-                        BatchDetailType(
-                            batchId=batch.pk,
-                            manufactureDate=batch.manufactureDate,
-                            expiryDate=batch.expiryDate,
-                            quantity=batch.quantity,
-                            createdUser=batch.createdUser,
-                            modifiedUser=batch.modifiedUser
-                        )
-                    ]
-                )
-                placement_list.append(placement_detail)
+            warehouse = loaders.warehouse.load(warehouseId)
+            placement_list = [placement_to_type(placement, loaders.batch.load(placement.batchId_id)) for placement in placements]
             response.append(PlacementDetailType(
                 warehouseId=warehouseId,
                 warehouseName=warehouse.warehouseName,
@@ -1227,31 +1446,11 @@ class Query(graphene.ObjectType):
     def resolve_placementById(self, info, placementId):
         try:
             # Fetch the placement by placementId
-            placement = Placement.objects.get(pk=placementId, rowstatus=True)
+            placement = Placement.objects.select_related('warehouseId', 'batchId').get(pk=placementId, rowstatus=True)
 
             # Create the response format
             warehouse = placement.warehouseId
-            batch = placement.batchId  # Assuming Placement model has a ForeignKey to Batch model
-            placement_detail = PlacementType(
-                placementId=placement.pk,
-                placementQuantity=placement.placementQuantity,
-                aile=placement.aile,
-                bin=placement.bin,
-                createdUser=placement.createdUser,
-                modifiedUser=placement.modifiedUser,
-                createdTime=placement.createdTime,
-                modifiedTime=placement.modifiedTime,
-                batches=[
-                    BatchDetailType(
-                        batchId=batch.pk,
-                        manufactureDate=batch.manufactureDate,
-                        expiryDate=batch.expiryDate,
-                        quantity=batch.quantity,
-                        createdUser=batch.createdUser,
-                        modifiedUser=batch.modifiedUser
-                    )
-                ]
-            )
+            placement_detail = placement_to_type(placement, placement.batchId)
 
             return PlacementDetailType(
                 warehouseId=warehouse.pk,
@@ -1280,17 +1479,17 @@ class Query(graphene.ObjectType):
     # Fetch all warehouses 
     @login_required                       
     def resolve_all_warehouses(self, info, **kwargs):
-        return Warehouse.objects.all()
+        return get_loaders(info).prime_from(list(Warehouse.objects.order_by('warehouseId')))
 
     # Fetch all locations
     @login_required                       
     def resolve_all_locations(self, info, **kwargs):
-        return Location.objects.all()
+        return Location.objects.order_by('locationId')
 
     # Fetch a single warehouse by id 
     @login_required                       
     def resolve_warehouse(self, info, id, **kwargs):
-        return Warehouse.objects.get(pk=id)
+        return get_loaders(info).prime_from([Warehouse.objects.get(pk=id)])[0]
 
     # Fetch a single location by id 
     @login_required                       
@@ -1300,97 +1499,10 @@ class Query(graphene.ObjectType):
     # Fetch all products and related inventories where rowstatus=True
     @login_required             
     def resolve_all_products(self, info):
-        try:
-            products = Product.objects.filter(rowstatus=True)
-            product_responses = []
-
-            for product in products:
-            # Fetch inventories associated with the product
-                inventory_details = []
-                inventories = Inventory.objects.filter(productId=product)
-                for inventory in inventories:
-                    inventory_details.append({
-                    'inventoryId': inventory.inventoryId,
-                    'warehouseId': inventory.warehouseId.pk,
-                    'warehouseName': inventory.warehouseId.warehouseName,
-                    'minStockLevel': inventory.minStockLevel,
-                    'maxStockLevel': inventory.maxStockLevel,
-                    'quantityAvailable': str(inventory.quantityAvailable),  # Ensure quantityAvailable is a string
-                    'invreOrderPoint': inventory.invreOrderPoint,
-                })
-
-            # Fetch category name using the category ID
-                category = Category.objects.get(pk=product.productCategory)
-                category_name = category.name
-
-            # Initialize response structure
-                response = {
-                'productId': product.pk,
-                'productCode': product.productCode,
-                'qrCode': product.qrCode,
-                'productName': product.productName,
-                'productDescription': product.productDescription,
-                'productCategory': str(product.productCategory),
-                'category_name': category_name,
-                'reOrderPoint': product.reOrderPoint,
-                'brand': product.brand,
-                'weight': product.weight,
-                'dimensions': product.dimensions,
-                'images': json.loads(product.images) if isinstance(product.images, str) else product.images,
-                'createdUser': product.createdUser,
-                'modifiedUser': product.modifiedUser,
-                'createdTime': product.createdTime,
-                'modifiedTime': product.modifiedTime,
-                'rowstatus': product.rowstatus,
-                'inventoryDetails': inventory_details,
-                'placementDetails': [],  # Initialize placement details as a list
-            }
-
-            # Fetch placements associated with the product
-                placements = Placement.objects.filter(productId=product, rowstatus=True)
-
-                warehouse_placements = {}
-
-                for placement in placements:
-                    warehouseId = placement.warehouseId.pk
-                    if warehouseId not in warehouse_placements:
-                        warehouse_placements[warehouseId] = {
-                        'warehouseId': warehouseId,
-                        'warehouseName': placement.warehouseId.warehouseName,
-                        'placements': []
-                    }
-
-                    placement_detail = {
-                    'placementId': placement.placementId,
-                    'placementQuantity': placement.placementQuantity,
-                    'aile': placement.aile,
-                    'bin': placement.bin,
-                    'batches': []
-                }
-
-                # Fetch batches associated with this placement
-                    batches = Batch.objects.filter(placement=placement, rowstatus=True)
-                    for batch in batches:
-                        batch_detail = {
-                        'batchId': batch.batchId,  # Ensure batchId is serialized correctly
-                        'expiryDate': batch.expiryDate,
-                        'manufactureDate': batch.manufactureDate,
-                        'quantity': batch.quantity,
-                        'createdUser': batch.createdUser,
-                        'modifiedUser': batch.modifiedUser,
-                    }
-                        placement_detail['batches'].append(batch_detail)
-
-                    warehouse_placements[warehouseId]['placements'].append(placement_detail)
-
-                response['placementDetails'] = list(warehouse_placements.values())
-
-                product_responses.append(ProductResponseType(**response))
-
-            return product_responses
-
-        except Product.DoesNotExist:
-            return None
+        fields = requested_product_fields(selection_tree(info))
+        products = list(product_queryset(Product.objects.filter(rowstatus=True).order_by('productId'), fields))
+        get_loaders(info).product.prime_objects(products)
+        return [ProductResponseType(**response) for response in assemble_product_responses(products, fields)]
 
 
 
@@ -1473,115 +1585,127 @@ class Query(graphene.ObjectType):
     # Fetch all categories where rowstatus=True
     @login_required                       
     def resolve_all_categories(self, info):
-        return Category.objects.filter(rowstatus=True)
+        return Category.objects.filter(rowstatus=True).order_by('categoryId')
         
     # Fetch a single inventory by id 
     @login_required                       
     def resolve_inventory(self, info, id):
-        return Inventory.objects.get(pk=id)
+        return get_loaders(info).prime_from([Inventory.objects.get(pk=id)])[0]
     
     # Fetch all inventories where rowstatus=True
     @login_required                       
     def resolve_all_inventories(self, info):
-        return Inventory.objects.all()
+        return get_loaders(info).prime_from(list(Inventory.objects.order_by('inventoryId')))
     
     @login_required                       
     def resolve_inventory_by_product(self, info, productId):
-        return Inventory.objects.filter(productId=productId)
+        return get_loaders(info).prime_from(list(Inventory.objects.filter(productId=productId)))
    
     @login_required    
     def resolve_product_response(self, info, productId=None):
-        try:
-            if productId is None:
-                raise Exception("Either productid or productcode must be provided")
+        if productId is None:
+            raise Exception("Either productid or productcode must be provided")
 
-        # Fetch the product
-            product = Product.objects.get(pk=productId, rowstatus=True)
+        # Fetch the product with only the inventories, placements and batches the query asks for
+        fields = requested_product_fields(selection_tree(info))
+        products = list(product_queryset(Product.objects.filter(pk=productId, rowstatus=True), fields))
+        get_loaders(info).product.prime_objects(products)
+        responses = assemble_product_responses(products, fields)
+        return ProductResponseType(**responses[0]) if responses else None
 
-        # Fetch inventories associated with the product
-            inventory_details = []
-            inventories = Inventory.objects.filter(productId=product)
-            for inventory in inventories:
-                inventory_details.append({
-                'inventoryId': inventory.inventoryId,
-                'warehouseId': inventory.warehouseId.pk,
-                'warehouseName': inventory.warehouseId.warehouseName,
-                'minStockLevel': inventory.minStockLevel,
-                'maxStockLevel': inventory.maxStockLevel,
-                'quantityAvailable': str(inventory.quantityAvailable),  # Ensure quantityavailable is string
-                'invreOrderPoint': inventory.invreOrderPoint,
-            })
-
-        # Fetch category name using the category ID
-            category = Category.objects.get(pk=product.productCategory)
-            category_name = category.name
-
-        # Initialize response structure
-            response = {
-            'productId': product.pk,
-            'productCode': product.productCode,
-            'qrCode': product.qrCode,
-            'productName': product.productName,
-            'productDescription': product.productDescription,
-            'productCategory': str(product.productCategory),
-            'category_name': category_name,
-            'reOrderPoint': product.reOrderPoint,
-            'brand': product.brand,
-            'weight': product.weight,
-            'dimensions': product.dimensions,
-            'images': json.loads(product.images),
-            'createdUser': product.createdUser,
-            'modifiedUser': product.modifiedUser,
-            'createdTime': product.createdTime,
-            'modifiedTime': product.modifiedTime,
-            'rowstatus': product.rowstatus,
-            'inventoryDetails': inventory_details,
-            'placementDetails': [],  # Initialize placement details as a list
-        }
 
-        # Fetch placements associated with the product
-            placements = Placement.objects.filter(productId=product, rowstatus=True)
 
-            warehouse_placements = {}
+    # Paginated products, built with the same assembler as allProducts
+    @login_required
+    def resolve_products(self, info, orderBy=None, categoryId=None, **kwargs):
+        fields = requested_product_fields(selection_tree(info).get('edges', {}).get('node', {}))
+        products = Product.objects.filter(rowstatus=True)
+        if categoryId is not None:
+            products = products.filter(productCategory=categoryId)
+        page = Page(product_queryset(products, fields), orderBy, **kwargs)
+        get_loaders(info).product.prime_objects(page.rows)
+        nodes = [ProductResponseType(**response) for response in assemble_product_responses(page.rows, fields)]
+        return page.connection(ProductResponseConnection, nodes)
 
-            for placement in placements:
-                warehouseId = placement.warehouseId.pk
-                if warehouseId not in warehouse_placements:
-                    warehouse_placements[warehouseId] = {
-                    'warehouseId': warehouseId,
-                    'warehouseName': placement.warehouseId.warehouseName,
-                    'placements': []
-                }
+    @login_required
+    def resolve_inventories(self, info, orderBy=None, **kwargs):
+        page = Page(Inventory.objects.all(), orderBy, **kwargs)
+        get_loaders(info).prime_from(page.rows)
+        return page.connection(InventoryConnection)
 
-                placement_detail = {
-                'placementId': placement.placementId,
-                'placementQuantity': placement.placementQuantity,
-                'aile': placement.aile,
-                'bin': placement.bin,
-                'batches': []
-            }
+    @login_required
+    def resolve_warehouses(self, info, orderBy=None, **kwargs):
+        page = Page(Warehouse.objects.all(), orderBy, **kwargs)
+        get_loaders(info).prime_from(page.rows)
+        return page.connection(WarehouseConnection)
 
-            # Fetch batches associated with this placement
-                batches = Batch.objects.filter(placement=placement, rowstatus=True)
-                for batch in batches:
-                    batch_detail = {
-                    'batchId': batch.batchId,  # Ensure batchid is serialized correctly
-                    'expiryDate': batch.expiryDate,
-                    'manufactureDate': batch.manufactureDate,
-                    'quantity': batch.quantity,
-                    'createdUser': batch.createdUser,
-                    'modifiedUser': batch.modifiedUser,
-                }
-                    placement_detail['batches'].append(batch_detail)
+    @login_required
+    def resolve_locations(self, info, orderBy=None, **kwargs):
+        return Page(Location.objects.all(), orderBy, **kwargs).connection(LocationConnection)
 
-                warehouse_placements[warehouseId]['placements'].append(placement_detail)
+    @login_required
+    def resolve_categories(self, info, orderBy=None, **kwargs):
+        page = Page(Category.objects.filter(rowstatus=True), orderBy, ('name',), **kwargs)
+        return page.connection(CategoryConnection)
 
-            response['placementDetails'] = list(warehouse_placements.values())
+    # Paginated active placements, one edge per placement with its batch
+    @login_required
+    def resolve_placements(self, info, orderBy=None, **kwargs):
+        loaders = get_loaders(info)
+        page = Page(Placement.objects.filter(rowstatus=True), orderBy, **kwargs)
+        loaders.prime_from(page.rows)
+        nodes = [placement_to_type(placement, loaders.batch.load(placement.batchId_id)) for placement in page.rows]
+        return page.connection(PlacementConnection, nodes)
+
+    # Inventories below their minimum stock level or at their reorder point, compared in SQL on the partial low stock indexes
+    @login_required
+    def resolve_lowStockItems(self, info, warehouseId=None, categoryId=None, **kwargs):
+        inventories = Inventory.objects.filter(LOW_STOCK)
+        if warehouseId is not None:
+            inventories = inventories.filter(warehouseId=warehouseId)
+        if categoryId is not None:
+            inventories = inventories.filter(productId__productCategory=categoryId)
+        page = Page(inventories, **kwargs)
+        get_loaders(info).prime_from(page.rows)
+        return page.connection(InventoryConnection)
+
+    # Active batches expiring from today to `withinDays` days ahead, soonest first: a range scan of the
+    # active expiry index, with the page's placements in one prefetch and products through the loader
+    @login_required
+    def resolve_expiringBatches(self, info, withinDays, warehouseId=None, **kwargs):
+        if withinDays < 0:
+            raise GraphQLError("'withinDays' must be a non-negative integer.")
+        today = timezone.localdate()
+        placements = Placement.objects.filter(rowstatus=True).order_by('placementId')
+        batches = Batch.objects.filter(rowstatus=True, expiryDate__gte=today, expiryDate__lte=today + datetime.timedelta(days=withinDays))
+        if warehouseId is not None:
+            placements = placements.filter(warehouseId=warehouseId)
+            batches = batches.filter(Exists(placements.filter(batchId=OuterRef('pk'))))
+        batches = batches.prefetch_related(Prefetch('placement_set', queryset=placements, to_attr='active_placements'))
+        page = Page(batches, 'expiryDate', ('expiryDate',), **kwargs)
+        loaders = get_loaders(info)
+        loaders.prime_from(page.rows)
+        loaders.prime_from([placement for batch in page.rows for placement in batch.active_placements])
+        nodes = [expiring_batch_to_type(batch, today) for batch in page.rows]
+        return page.connection(ExpiringBatchConnection, nodes)
+
+    # Active placements of one bin from the active bin index; an empty bin has no placements
+    @login_required
+    def resolve_binContents(self, info, warehouseId, aile, bin):
+        placements = Placement.objects.filter(rowstatus=True, warehouseId=warehouseId, aile=aile, bin=bin).order_by('placementId')
+        bins = bins_to_types(info, placements, warehouseId)
+        return bins[0] if bins else BinContentsType(warehouseId=warehouseId, aile=aile, bin=bin, quantity=0, placements=[])
 
-            return ProductResponseType(**response)
+    # Every occupied bin of a warehouse in aisle / bin order, read along the active bin index
+    @login_required
+    def resolve_aisleMap(self, info, warehouseId):
+        placements = Placement.objects.filter(rowstatus=True, warehouseId=warehouseId).order_by('aile', 'bin', 'placementId')
+        return bins_to_types(info, placements, warehouseId)
 
-        except Product.DoesNotExist:
-            return None
+    # Latest snapshot at or before `at` plus the movements since, two indexed queries
+    @login_required
+    def resolve_stock_at(self, info, productId, warehouseId, at=None):
+        return stock_at(productId, warehouseId, at)
 
 
 
@@ -1591,6 +1715,7 @@ class Mutation(graphene.ObjectType):
     update_product = UpdateProduct.Field()
     create_product = CreateProduct.Field()
     delete_product = DeleteProduct.Field()
+    bulk_upsert_products = BulkUpsertProducts.Field()
 
     create_warehouse = CreateWarehouse.Field()
     create_location = CreateLocation.Field()
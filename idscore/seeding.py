@@ -0,0 +1,225 @@
+import datetime
+import random
+from collections import defaultdict
+from itertools import accumulate
+
+from django.db import transaction
+from django.utils import timezone
+
+from Authentication.models import Login
+from .models import Category, Location, Warehouse, Product, Inventory, Batch, Placement, StockMovement, StockSnapshot
+
+# Named dataset sizes, as number of placements
+SCALES = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+SEED_USER = 'seed'
+CHUNK_SIZE = 5_000
+
+
+## Synthetic idscore dataset
+class DatasetShape:
+    """
+    Row counts derived from the number of placements, following the fan-out
+    seen in the warehouses: about 4 placements per batch, 10 per product,
+    a product stocked in 1-4 warehouses and a few products holding most of
+    the stock. Any count can be overridden by keyword.
+    """
+
+    def __init__(self, placements, **counts):
+        self.placements = max(placements, 1)
+        self.products = max(self.placements // 10, 1)
+        self.batches = max(self.placements // 4, 1)
+        self.warehouses = max(3, min(200, self.placements // 5_000))
+        self.locations = max(1, self.warehouses // 3)
+        self.categories = max(5, min(50, self.products // 200))
+        for name, count in counts.items():
+            if not hasattr(self, name):
+                raise TypeError(f"Unknown dataset count '{name}'.")
+            setattr(self, name, max(count, 1))
+
+    def as_dict(self):
+        return {
+            'placements': self.placements,
+            'products': self.products,
+            'batches': self.batches,
+            'warehouses': self.warehouses,
+            'locations': self.locations,
+            'categories': self.categories,
+        }
+
+
+def _bulk_create(model, rows):
+    # Keeps memory flat for the 1M-placement scale; returns the saved objects (with pks)
+    saved = []
+    for start in range(0, len(rows), CHUNK_SIZE):
+        saved.extend(model.objects.bulk_create(rows[start:start + CHUNK_SIZE]))
+    return saved
+
+
+def get_seed_user():
+    user = Login.objects.filter(username=SEED_USER).first()
+    if user is None:
+        user = Login.objects.create_user(
+            SEED_USER, phone_num='0000000000', email='seed@example.com', password=SEED_USER,
+            designation='Seeder', location='Local', business_unit='IDS', role='admin', status='active',
+        )
+    return user
+
+
+def flush_idscore():
+    # Children first so the cascades have nothing left to walk
+    for model in (StockSnapshot, StockMovement, Placement, Batch, Inventory, Product, Warehouse, Location, Category):
+        model.objects.all().delete()
+
+
+@transaction.atomic
+def seed_idscore(placements, seed=0, log=None, **counts):
+    """
+    Generates a synthetic Category / Location / Warehouse / Product /
+    Inventory / Batch / Placement dataset.
+
+    Args:
+    - placements: Number of placements to create; every other count follows from it.
+    - seed: Random seed, so the same arguments always produce the same data.
+    - log: Optional callable receiving progress messages.
+    - counts: Overrides for the derived counts (products, batches, warehouses,
+      locations, categories).
+
+    Returns:
+    - counts: Dictionary of rows created per model.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    shape = DatasetShape(placements, **counts)
+    user = get_seed_user().username
+    now = timezone.now()
+    today = now.date()
+    stamp = {'createdUser': user, 'modifiedUser': user}
+
+    log(f"Seeding {shape.as_dict()}")
+
+    categories = _bulk_create(Category, [
+        Category(name=f'Category {i:03d}', image=f'https://example.com/categories/{i}.png')
+        for i in range(shape.categories)
+    ])
+
+    locations = _bulk_create(Location, [
+        Location(locationName=f'Location {i:03d}', locationAddress=f'{i} Industrial Estate', **stamp)
+        for i in range(shape.locations)
+    ])
+
+    warehouses = _bulk_create(Warehouse, [
+        Warehouse(locationId=locations[i % len(locations)], warehouseName=f'Warehouse {i:03d}', **stamp)
+        for i in range(shape.warehouses)
+    ])
+    log(f"Created {len(categories)} categories, {len(locations)} locations, {len(warehouses)} warehouses")
+
+    products = _bulk_create(Product, [
+        Product(
+            productCode=f'SKU-{i:07d}',
+            qrCode=f'QR-{i:07d}',
+            productName=f'Product {i:07d}',
+            productDescription=f'Synthetic product {i}',
+            productCategory=categories[rng.randrange(len(categories))],
+            reOrderPoint=rng.choice((5, 10, 20, 50)),
+            brand=f'Brand {rng.randrange(100):02d}',
+            weight=f'{rng.randint(1, 5000)}g',
+            dimensions=f'{rng.randint(5, 80)}x{rng.randint(5, 80)}x{rng.randint(5, 80)}',
+            images=[f'https://example.com/products/{i}.png'],
+            rowstatus=rng.random() > 0.02,
+            **stamp,
+        )
+        for i in range(shape.products)
+    ])
+    log(f"Created {len(products)} products")
+
+    # Popular products get most of the batches (Zipf-like weights)
+    cum_weights = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(products))))
+    home_warehouses = [rng.sample(warehouses, rng.randint(1, min(4, len(warehouses)))) for _ in products]
+
+    batch_products = rng.choices(range(len(products)), cum_weights=cum_weights, k=shape.batches)
+    batches = []
+    for product_index in batch_products:
+        manufactured = today - datetime.timedelta(days=rng.randint(0, 720))
+        batches.append(Batch(
+            productId=products[product_index],
+            manufactureDate=manufactured,
+            expiryDate=manufactured + datetime.timedelta(days=rng.randint(30, 1095)),
+            quantity=0,
+            rowstatus=rng.random() > 0.02,
+            **stamp,
+        ))
+    batches = _bulk_create(Batch, batches)
+    log(f"Created {len(batches)} batches")
+
+    # Every batch gets at least one placement, the rest are spread at random
+    batch_indexes = list(range(len(batches))) + [rng.randrange(len(batches)) for _ in range(shape.placements - len(batches))]
+    batch_totals = defaultdict(int)
+    stock = defaultdict(int)
+    created = 0
+    for start in range(0, len(batch_indexes), CHUNK_SIZE):
+        rows = []
+        for batch_index in batch_indexes[start:start + CHUNK_SIZE]:
+            product_index = batch_products[batch_index]
+            warehouse = rng.choice(home_warehouses[product_index])
+            quantity = rng.randint(1, 200)
+            active = rng.random() > 0.02
+            # Deleted placements hold no stock
+            if active:
+                batch_totals[batch_index] += quantity
+                stock[product_index, warehouse.warehouseId] += quantity
+            rows.append(Placement(
+                batchId=batches[batch_index],
+                productId=products[product_index],
+                warehouseId=warehouse,
+                placementQuantity=quantity,
+                aile=f'A{rng.randint(1, 40):02d}',
+                bin=f'B{rng.randint(1, 300):03d}',
+                rowstatus=active,
+                **stamp,
+            ))
+        Placement.objects.bulk_create(rows)
+        created += len(rows)
+        log(f"Created {created} placements")
+
+    for batch_index, batch in enumerate(batches):
+        batch.quantity = batch_totals[batch_index]
+    for start in range(0, len(batches), CHUNK_SIZE):
+        Batch.objects.bulk_update(batches[start:start + CHUNK_SIZE], ['quantity'])
+
+    inventories = _bulk_create(Inventory, [
+        Inventory(
+            productId=products[product_index],
+            warehouseId_id=warehouse_id,
+            quantityAvailable=quantity,
+            minStockLevel=products[product_index].reOrderPoint,
+            maxStockLevel=products[product_index].reOrderPoint * 20,
+            invreOrderPoint=products[product_index].reOrderPoint,
+            **stamp,
+        )
+        for (product_index, warehouse_id), quantity in stock.items()
+    ])
+    log(f"Created {len(inventories)} inventory rows")
+
+    # The seeded stock enters the ledger as opening movements
+    _bulk_create(StockMovement, [
+        StockMovement(
+            productId_id=inventory.productId_id, warehouseId_id=inventory.warehouseId_id, quantity=inventory.quantityAvailable,
+            reason=StockMovement.OPENING, createdUser=user,
+        )
+        for inventory in inventories if inventory.quantityAvailable
+    ])
+
+    return {
+        'categories': len(categories),
+        'locations': len(locations),
+        'warehouses': len(warehouses),
+        'products': len(products),
+        'batches': len(batches),
+        'placements': created,
+        'inventories': len(inventories),
+    }
@@ -0,0 +1,37 @@
+from graphql import GraphQLObjectType, get_named_type
+from graphql.execution.collect_fields import collect_sub_fields
+
+
+## Selection-set lookahead
+def selection_tree(info):
+    """
+    Returns the fields requested below the field being resolved.
+
+    Fragment spreads, inline fragments and @skip/@include directives are
+    applied the same way the executor applies them.
+
+    Args:
+    - info: GraphQL resolve info of the current field.
+
+    Returns:
+    - tree: Nested dictionary keyed by schema field name (aliases are merged),
+      e.g. {'productName': {}, 'inventoryDetails': {'warehouseName': {}}}.
+    """
+    return _collect(info, get_named_type(info.return_type), info.field_nodes)
+
+
+def _collect(info, parent_type, field_nodes):
+    tree = {}
+    if not isinstance(parent_type, GraphQLObjectType):
+        return tree
+
+    sub_fields = collect_sub_fields(info.schema, info.fragments, info.variable_values, parent_type, field_nodes)
+    for nodes in sub_fields.values():
+        name = nodes[0].name.value
+        field = parent_type.fields.get(name)
+        if field is None:
+            # Meta fields such as __typename
+            continue
+        tree.setdefault(name, {}).update(_collect(info, get_named_type(field.type), nodes))
+
+    return tree
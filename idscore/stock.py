@@ -0,0 +1,170 @@
+import datetime
+
+from django.db.models import Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Inventory, Placement, Product, StockMovement, StockSnapshot
+
+# Snapshots stop this far behind the clock, so movements of still-open transactions are not left out
+SNAPSHOT_LAG = datetime.timedelta(minutes=5)
+SNAPSHOT_CHUNK_SIZE = 5_000
+
+
+## Stock movement ledger
+def inventory_levels(productIds):
+    """
+    Returns:
+    - levels: Dictionary of (product id, warehouse id) to quantityAvailable
+      for the inventories of `productIds`.
+    """
+    return {
+        (productId, warehouseId): quantity or 0
+        for productId, warehouseId, quantity in Inventory.objects.filter(productId__in=productIds).values_list(
+            'productId', 'warehouseId', 'quantityAvailable'
+        )
+    }
+
+
+def record_stock_changes(before, after, reason, username):
+    """
+    Writes one StockMovement per (product id, warehouse id) pair whose
+    quantity differs between `before` and `after`; a missing pair or None
+    counts as 0. Call in the transaction that changed the quantities.
+
+    Returns:
+    - movements: The saved StockMovement rows.
+    """
+    now = timezone.now()
+    movements = []
+    for pair in sorted(set(before) | set(after)):
+        change = (after.get(pair) or 0) - (before.get(pair) or 0)
+        if change:
+            movements.append(StockMovement(
+                productId_id=pair[0], warehouseId_id=pair[1], quantity=change, reason=reason,
+                createdUser=username, createdTime=now,
+            ))
+    return StockMovement.objects.bulk_create(movements)
+
+
+def stock_at(productId, warehouseId, at=None):
+    """
+    Stock of a product in a warehouse at `at` (default: now): its latest
+    snapshot up to then plus the movements after it, so the cost depends on
+    the snapshot interval rather than on the length of the history.
+    """
+    at = at or timezone.now()
+    snapshot = (
+        StockSnapshot.objects.filter(productId=productId, warehouseId=warehouseId, takenAt__lte=at)
+        .order_by('-takenAt').values_list('takenAt', 'quantity').first()
+    )
+    movements = StockMovement.objects.filter(productId=productId, warehouseId=warehouseId, createdTime__lte=at)
+    if snapshot is not None:
+        movements = movements.filter(createdTime__gt=snapshot[0])
+    return (snapshot[1] if snapshot else 0) + (movements.aggregate(total=Sum('quantity'))['total'] or 0)
+
+
+def take_snapshots(at=None):
+    """
+    Writes a StockSnapshot at `at` (default: SNAPSHOT_LAG ago) for every
+    pair with movements since the previous run: its previous snapshot plus
+    those movements. Runs periodically (`manage.py snapshot_stock`), each
+    run covering the movements created since the last one.
+
+    Returns:
+    - count: Number of snapshots written.
+    """
+    at = at or timezone.now() - SNAPSHOT_LAG
+    last = StockSnapshot.objects.aggregate(last=Max('takenAt'))['last']
+    if last is not None and last >= at:
+        return 0
+
+    movements = StockMovement.objects.filter(createdTime__lte=at)
+    if last is not None:
+        movements = movements.filter(createdTime__gt=last)
+    previous = (
+        StockSnapshot.objects.filter(productId=OuterRef('productId'), warehouseId=OuterRef('warehouseId'))
+        .order_by('-takenAt').values('quantity')[:1]
+    )
+    changes = (
+        movements.values('productId', 'warehouseId')
+        .annotate(change=Sum('quantity'), previous=Coalesce(Subquery(previous), Value(0)))
+        .values_list('productId', 'warehouseId', 'change', 'previous')
+        .order_by()
+    )
+
+    count = 0
+    snapshots = []
+    for productId, warehouseId, change, previous_quantity in changes.iterator(chunk_size=SNAPSHOT_CHUNK_SIZE):
+        snapshots.append(StockSnapshot(productId_id=productId, warehouseId_id=warehouseId, quantity=previous_quantity + change, takenAt=at))
+        if len(snapshots) >= SNAPSHOT_CHUNK_SIZE:
+            count += len(StockSnapshot.objects.bulk_create(snapshots))
+            snapshots = []
+    count += len(StockSnapshot.objects.bulk_create(snapshots))
+    return count
+
+
+## Inventory totals
+def lock_products(productIds):
+    # Row locks of the products, in id order; evaluated for the locks only
+    list(Product.objects.select_for_update(no_key=True).filter(pk__in=productIds).order_by('pk').values_list('pk', flat=True))
+
+
+def recompute_inventory(pairs, username, reason=StockMovement.PLACEMENT):
+    """
+    Sets quantityAvailable of every (product id, warehouse id) pair to the
+    total of its active placements, creating the missing Inventory rows, with one
+    grouped aggregate and one upsert, and records the changes in the stock
+    ledger.
+
+    Must run in the transaction that changed the placements. The products
+    are locked first, in id order so concurrent calls cannot deadlock: a
+    concurrent placement change of the same product waits for this
+    transaction to commit, and its aggregate then sees these placements
+    too, so no total is computed from a stale snapshot. The lock is FOR NO
+    KEY UPDATE, which does not conflict with the FOR KEY SHARE locks the
+    placement and batch inserts already took on the products through their
+    foreign keys; FOR UPDATE would wait on them and deadlock two concurrent
+    calls for the same product.
+
+    Args:
+    - pairs: Iterable of (product id, warehouse id).
+    - username: User recorded as modifier (and creator of new rows).
+    - reason: StockMovement reason of the changes.
+
+    Returns:
+    - totals: Dictionary of (product id, warehouse id) to quantityAvailable.
+    """
+    pairs = {(int(productId), int(warehouseId)) for productId, warehouseId in pairs}
+    if not pairs:
+        return {}
+    productIds = {productId for productId, warehouseId in pairs}
+    lock_products(productIds)
+    before = inventory_levels(productIds)
+
+    # Pairs without active placements left (e.g. all moved to another warehouse or deleted) hold no stock
+    totals = dict.fromkeys(pairs, 0)
+    pair_filter = Q()
+    for productId, warehouseId in pairs:
+        pair_filter |= Q(productId=productId, warehouseId=warehouseId)
+    for productId, warehouseId, total in (
+        Placement.objects.filter(pair_filter, rowstatus=True).values('productId', 'warehouseId')
+        .annotate(total=Sum('placementQuantity')).values_list('productId', 'warehouseId', 'total')
+    ):
+        totals[productId, warehouseId] = total
+
+    now = timezone.now()
+    Inventory.objects.bulk_create(
+        [
+            Inventory(
+                productId_id=productId, warehouseId_id=warehouseId, quantityAvailable=total,
+                createdUser=username, modifiedUser=username, createdTime=now, modifiedTime=now,
+            )
+            for (productId, warehouseId), total in sorted(totals.items())
+        ],
+        update_conflicts=True,
+        unique_fields=['productId', 'warehouseId'],
+        update_fields=['quantityAvailable', 'modifiedUser', 'modifiedTime'],
+    )
+    record_stock_changes({pair: before.get(pair) for pair in pairs}, totals, reason, username)
+    return totals
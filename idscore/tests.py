@@ -1,3 +1,789 @@
-from django.test import TestCase
+import datetime
+import importlib
+import io
+import json
+import threading
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from graphql_jwt.shortcuts import get_token
+
+from IDS_GraphQL.testing import QueryCountMixin
+
+from .importing import import_idscore, read_rows
+from .loaders import LoaderRegistry
+from .models import Batch, Category, Inventory, Location, Placement, Product, StockMovement, Warehouse
+from .pagination import MAX_PAGE_SIZE
+from .schema import idscore_schema
+from .seeding import flush_idscore, get_seed_user, seed_idscore
+from .stock import recompute_inventory, stock_at, take_snapshots
+
+PLACEMENT_FIELDS = 'warehouseId warehouseName placements { placementId placementQuantity aile bin batches { batchId expiryDate quantity } }'
+PRODUCT_FIELDS = (
+    'productId productCode productName categoryName reOrderPoint brand images '
+    'inventoryDetails { inventoryId warehouseName quantityAvailable minStockLevel } '
+    f'placementDetails {{ {PLACEMENT_FIELDS} }}'
+)
+
+BULK_UPSERT = (
+    'mutation ($products: [ProductInput!]!) { bulkUpsertProducts(products: $products) '
+    '{ statusCode message created updated errors { index productCode message } } }'
+)
+
+
+# Each operation runs against both datasets; its query count must not change
+class IdscoreQueryCountTests(QueryCountMixin, TestCase):
+    sizes = (
+        {'placements': 40, 'warehouses': 3, 'locations': 1, 'categories': 2},
+        {'placements': 400, 'warehouses': 8, 'locations': 3, 'categories': 6},
+    )
+
+    def seed(self, size):
+        flush_idscore()
+        seed_idscore(**size)
+
+    def get_user(self):
+        return get_seed_user()
+
+    def first_pk(self, model):
+        return model.objects.order_by('pk').values_list('pk', flat=True).first()
+
+    def warehouse_pks(self):
+        return list(Warehouse.objects.order_by('pk').values_list('pk', flat=True)[:2])
+
+    ## Queries
+    def test_all_products(self):
+        self.assertConstantQueries(idscore_schema, f'{{ allProducts {{ {PRODUCT_FIELDS} }} }}')
+
+    def test_product_response(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            f'query ($id: Int) {{ productResponse(productId: $id) {{ {PRODUCT_FIELDS} }} }}',
+            lambda: {'id': self.first_pk(Product)},
+        )
+
+    def test_products_connection(self):
+        self.assertConstantQueries(
+            idscore_schema, f'{{ products(first: 20) {{ totalCount edges {{ cursor node {{ {PRODUCT_FIELDS} }} }} }} }}'
+        )
+
+    def test_products_by_category(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            f'query ($category: Int) {{ products(first: 20, categoryId: $category) {{ edges {{ node {{ {PRODUCT_FIELDS} }} }} }} }}',
+            lambda: {'category': self.first_pk(Category)},
+        )
+
+    def test_all_categories(self):
+        self.assertConstantQueries(idscore_schema, '{ allCategories { categoryId name image } }')
+
+    def test_categories_connection(self):
+        self.assertConstantQueries(idscore_schema, '{ categories(first: 5, orderBy: "name") { edges { node { name } } } }')
+
+    def test_category(self):
+        self.assertConstantQueries(
+            idscore_schema, 'query ($id: Int!) { category(id: $id) { categoryId name } }', lambda: {'id': self.first_pk(Category)}
+        )
+
+    def test_all_inventories(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            '{ allInventories { inventoryId quantityAvailable warehouseId warehouseName productId { productName } } }',
+        )
+
+    def test_inventories_connection(self):
+        self.assertConstantQueries(
+            idscore_schema, '{ inventories(first: 20) { edges { node { quantityAvailable warehouseName productId { productName } } } } }'
+        )
+
+    def test_inventory(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'query ($id: Int!) { inventory(id: $id) { inventoryId warehouseName productId { productName } } }',
+            lambda: {'id': self.first_pk(Inventory)},
+        )
+
+    def test_inventory_by_product(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'query ($id: Int!) { inventoryByProduct(productId: $id) { inventoryId quantityAvailable warehouseName } }',
+            lambda: {'id': self.first_pk(Product)},
+        )
+
+    def empty_stock(self):
+        # Every other inventory runs out, so each dataset has a page of low stock items
+        Inventory.objects.filter(pk__in=list(Inventory.objects.order_by('pk').values_list('pk', flat=True)[::2])).update(quantityAvailable=0, minStockLevel=5)
+        return {}
+
+    def test_low_stock_items(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            '{ lowStockItems(first: 20) { totalCount edges { node { quantityAvailable minStockLevel warehouseName productId { productName } } } } }',
+            self.empty_stock,
+        )
+
+    def test_low_stock_items_filter(self):
+        self.seed(self.sizes[0])
+        warehouse = self.first_pk(Warehouse)
+        Inventory.objects.filter(warehouseId=warehouse).update(quantityAvailable=5, minStockLevel=10, invreOrderPoint=None)
+        Inventory.objects.exclude(warehouseId=warehouse).update(quantityAvailable=10, minStockLevel=10, invreOrderPoint=9)
+        low = Inventory.objects.order_by('pk').exclude(warehouseId=warehouse).first()
+        low.invreOrderPoint = 11
+        low.save()
+
+        query = 'query ($w: Int) { lowStockItems(warehouseId: $w, first: 500) { edges { node { inventoryId } } } }'
+        for variables, expected in (
+            ({'w': warehouse}, Inventory.objects.filter(warehouseId=warehouse)),
+            ({'w': low.warehouseId_id}, Inventory.objects.filter(pk=low.pk)),
+            ({}, Inventory.objects.filter(warehouseId=warehouse) | Inventory.objects.filter(pk=low.pk)),
+        ):
+            result, statements = self.execute(idscore_schema, query, variables)
+            ids = [int(edge['node']['inventoryId']) for edge in result.data['lowStockItems']['edges']]
+            self.assertEqual(ids, list(expected.order_by('pk').values_list('pk', flat=True)))
+
+    def test_expiring_batches(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            '{ expiringBatches(withinDays: 3650, first: 20) { totalCount edges { node { batchId expiryDate daysLeft quantity '
+            'product { productName } placements { aile bin placementQuantity warehouseId { warehouseName } } } } } }',
+        )
+
+    def test_expiring_batches_window(self):
+        self.seed(self.sizes[0])
+        today = timezone.localdate()
+        Batch.objects.update(expiryDate=today + datetime.timedelta(days=90))
+        placement = Placement.objects.order_by('pk').first()
+        soon = placement.batchId
+        Batch.objects.filter(pk=soon.pk).update(expiryDate=today + datetime.timedelta(days=3))
+        Batch.objects.exclude(pk=soon.pk).filter(pk=self.first_pk(Batch) + 1).update(expiryDate=today - datetime.timedelta(days=1))
+
+        query = 'query ($w: Int) { expiringBatches(withinDays: 7, warehouseId: $w) { edges { node { batchId daysLeft quantity placements { placementId } } } } }'
+        result, statements = self.execute(idscore_schema, query, {'w': placement.warehouseId_id})
+        nodes = [edge['node'] for edge in result.data['expiringBatches']['edges']]
+        placements = Placement.objects.filter(batchId=soon, warehouseId=placement.warehouseId_id, rowstatus=True)
+        self.assertEqual(nodes, [{
+            'batchId': soon.pk, 'daysLeft': 3, 'quantity': sum(placements.values_list('placementQuantity', flat=True)),
+            'placements': [{'placementId': pk} for pk in placements.order_by('pk').values_list('pk', flat=True)],
+        }])
+        other = Warehouse.objects.exclude(placement__batchId=soon).order_by('pk').first()
+        result, statements = self.execute(idscore_schema, query, {'w': other.pk})
+        self.assertEqual(result.data['expiringBatches']['edges'], [])
+
+    def first_bin(self):
+        placement = Placement.objects.filter(rowstatus=True).order_by('pk').first()
+        return {'w': placement.warehouseId_id, 'aile': placement.aile, 'bin': placement.bin}
+
+    def test_bin_contents(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'query ($w: Int!, $aile: String!, $bin: String!) { binContents(warehouseId: $w, aile: $aile, bin: $bin) { quantity '
+            'placements { placementQuantity productId { productName } batches { batchId expiryDate quantity } } } }',
+            self.first_bin,
+        )
+
+    def test_aisle_map(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'query ($w: Int!) { aisleMap(warehouseId: $w) { aile bin quantity placements { placementQuantity productId { productName } '
+            'batches { batchId expiryDate } warehouseId { warehouseName } } } }',
+            lambda: {'w': self.first_pk(Warehouse)},
+        )
+
+    def test_aisle_map_groups_bins(self):
+        self.seed(self.sizes[0])
+        warehouse = self.first_pk(Warehouse)
+        result, statements = self.execute(idscore_schema, 'query ($w: Int!) { aisleMap(warehouseId: $w) { aile bin quantity placements { placementId } } }', {'w': warehouse})
+        bins = result.data['aisleMap']
+        placements = Placement.objects.filter(rowstatus=True, warehouseId=warehouse)
+        self.assertEqual([(row['aile'], row['bin']) for row in bins], sorted(set(placements.values_list('aile', 'bin'))))
+        self.assertEqual(sum(row['quantity'] for row in bins), sum(placements.values_list('placementQuantity', flat=True)))
+
+        result, statements = self.execute(
+            idscore_schema, 'query ($w: Int!) { binContents(warehouseId: $w, aile: "none", bin: "none") { quantity placements { placementId } } }', {'w': warehouse},
+        )
+        self.assertEqual(result.data['binContents'], {'quantity': 0, 'placements': []})
+
+    def test_all_warehouses(self):
+        self.assertConstantQueries(
+            idscore_schema, '{ allWarehouses { warehouseId warehouseName locationId { locationName } location { locationName } } }'
+        )
+
+    def test_warehouses_connection(self):
+        self.assertConstantQueries(idscore_schema, '{ warehouses(first: 5) { edges { node { warehouseName location { locationName } } } } }')
+
+    def test_warehouse(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'query ($id: ID!) { warehouse(id: $id) { warehouseName location { locationName } } }',
+            lambda: {'id': self.first_pk(Warehouse)},
+        )
+
+    def test_all_locations(self):
+        self.assertConstantQueries(idscore_schema, '{ allLocations { locationId locationName locationAddress } }')
+
+    def test_locations_connection(self):
+        self.assertConstantQueries(idscore_schema, '{ locations(first: 5) { edges { node { locationName } } } }')
+
+    def test_location(self):
+        self.assertConstantQueries(
+            idscore_schema, 'query ($id: ID!) { location(id: $id) { locationName } }', lambda: {'id': self.first_pk(Location)}
+        )
+
+    def test_placement_details(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            f'{{ placementDetails {{ productId {PLACEMENT_FIELDS} }} }}',
+        )
+
+    def test_placement_details_with_objects(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            '{ placementDetails { placements { productId { productName } warehouseId { warehouseName location { locationName } } } } }',
+        )
+
+    def test_placement_by_id(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            f'query ($id: Int!) {{ placementById(placementId: $id) {{ {PLACEMENT_FIELDS} }} }}',
+            lambda: {'id': self.first_pk(Placement)},
+        )
+
+    def test_placements_connection(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            '{ placements(first: 20) { edges { node { placementId aile bin productId { productName } warehouseId { warehouseName } } } } }',
+        )
+
+    ## Mutations
+    def test_create_placement(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($productId: Int!, $placements: [PlacementInputType]!) { createPlacement(productId: $productId, quantity: "10", '
+            f'placements: $placements) {{ statusCode placementDetails {{ {PLACEMENT_FIELDS} }} }} }}',
+            lambda: {'productId': self.first_pk(Product), 'placements': [
+                {'warehouseId': warehouse, 'placementQuantity': '5', 'aile': 'A01', 'bin': 'B001'} for warehouse in self.warehouse_pks()
+            ]},
+        )
+
+    def test_update_placement(self):
+        def variables():
+            placement = Placement.objects.order_by('pk').first()
+            return {'placementId': placement.pk, 'productId': placement.productId_id, 'placements': [
+                {'placementId': placement.pk, 'warehouseId': placement.warehouseId_id, 'placementQuantity': '7', 'aile': 'A02', 'bin': 'B002'}
+            ]}
+
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($placementId: Int!, $productId: Int!, $placements: [PlacementInputType]!) { updatePlacement(placementId: $placementId, '
+            f'productId: $productId, quantity: "7", placements: $placements) {{ statusCode placementDetails {{ {PLACEMENT_FIELDS} }} }} }}',
+            variables,
+        )
+
+    def test_update_placement_moves_stock(self):
+        # Moving a placement also recomputes the inventory of the warehouse it left
+        self.seed(self.sizes[0])
+        placement = Placement.objects.order_by('pk').first()
+        source = placement.warehouseId_id
+        target = Warehouse.objects.exclude(pk=source).order_by('pk').first().pk
+        result, statements = self.execute(
+            idscore_schema,
+            'mutation ($placementId: Int!, $productId: Int!, $placements: [PlacementInputType]!) { updatePlacement(placementId: $placementId, '
+            'productId: $productId, quantity: "7", placements: $placements) { statusCode } }',
+            {'placementId': placement.pk, 'productId': placement.productId_id, 'placements': [
+                {'placementId': placement.pk, 'warehouseId': target, 'placementQuantity': '7', 'aile': 'A02', 'bin': 'B002'}
+            ]},
+        )
+        self.assertEqual(result.data['updatePlacement']['statusCode'], 200)
+        for warehouse in (source, target):
+            total = sum(Placement.objects.filter(productId=placement.productId_id, warehouseId=warehouse).values_list('placementQuantity', flat=True))
+            inventory = Inventory.objects.get(productId=placement.productId_id, warehouseId=warehouse)
+            self.assertEqual(inventory.quantityAvailable, total)
+        self.assertTrue(StockMovement.objects.filter(productId=placement.productId_id, reason=StockMovement.TRANSFER).exists())
+
+    def test_placements_with_product_category(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            '{ placements(first: 20) { edges { node { productId { productName productCategory category { name } } } } } }',
+        )
+
+    def test_delete_placement(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($id: Int!) { deletePlacement(placementId: $id) { statusCode } }', lambda: {'id': self.first_pk(Placement)}
+        )
+
+    def test_create_product(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($category: String!, $inventory: [InventoryInputType]!) { createProduct(productCode: "T-1", productName: "Test", '
+            'productDescription: "Test", productCategory: $category, qrCode: "QR", brand: "B", weight: "1", dimensions: "1", reOrderPoint: 5, '
+            'images: ["a.png"], inventoryDetails: $inventory) { statusCode } }',
+            lambda: {'category': str(self.first_pk(Category)), 'inventory': [
+                {'warehouseId': warehouse, 'minStockLevel': '1', 'maxStockLevel': '9', 'quantityAvailable': '3', 'invreOrderPoint': 1}
+                for warehouse in self.warehouse_pks()
+            ]},
+        )
+
+    def test_update_product(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($id: ID!) { updateProduct(productId: $id, productName: "Renamed") { statusCode } }', lambda: {'id': self.first_pk(Product)}
+        )
+
+    def test_delete_product(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($id: ID!) { deleteProduct(productId: $id) { statusCode } }', lambda: {'id': self.first_pk(Product)}
+        )
+
+    def bulk_products(self, count, new=0):
+        # `count` seeded products (matched by productCode) followed by `new` unknown ones
+        codes = list(Product.objects.order_by('pk').values_list('productCode', flat=True)[:count])
+        codes += [f'NEW-{i}' for i in range(new)]
+        return [{
+            'productCode': code, 'productName': 'Bulk', 'productDescription': 'Bulk', 'productCategory': 'Bulk category',
+            'inventoryDetails': [{'warehouseId': warehouse, 'minStockLevel': '1', 'maxStockLevel': '9', 'quantityAvailable': '4'}
+                                 for warehouse in self.warehouse_pks()],
+        } for code in codes]
+
+    def test_bulk_upsert_products(self):
+        self.assertConstantQueries(
+            idscore_schema, BULK_UPSERT, lambda: {'products': self.bulk_products(5, new=5)},
+        )
+
+    def test_bulk_upsert_products_set_based(self):
+        self.seed(self.sizes[-1])
+        Category.objects.create(name='Bulk category')
+        result, few = self.execute(idscore_schema, BULK_UPSERT, {'products': self.bulk_products(2, new=2)})
+        self.assertEqual(result.data['bulkUpsertProducts']['statusCode'], 200)
+        result, many = self.execute(idscore_schema, BULK_UPSERT, {'products': self.bulk_products(10, new=10)})
+        self.assertEqual((result.data['bulkUpsertProducts']['created'], result.data['bulkUpsertProducts']['updated']), (8, 12))
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(Inventory.objects.filter(productId__productCode='NEW-9', quantityAvailable=4).count(), len(self.warehouse_pks()))
+
+    def test_bulk_upsert_products_row_errors(self):
+        self.seed(self.sizes[0])
+        products = self.bulk_products(1, new=1)
+        products.append(dict(products[1]))  # repeated productCode
+        products.append({**products[1], 'productCode': 'NEW-bad', 'inventoryDetails': [{'warehouseId': 1, 'minStockLevel': '1.5', 'maxStockLevel': '9'}]})
+        products.append({'productCode': 'NEW-unnamed', 'productCategory': 'Bulk category'})
+        result, statements = self.execute(idscore_schema, BULK_UPSERT, {'products': products})
+        payload = result.data['bulkUpsertProducts']
+        self.assertEqual((payload['statusCode'], payload['created'], payload['updated']), (207, 1, 1))
+        self.assertEqual([error['index'] for error in payload['errors']], [2, 3, 4])
+        self.assertFalse(Product.objects.filter(productCode__in=['NEW-bad', 'NEW-unnamed']).exists())
+
+    def test_bulk_upsert_products_new_categories(self):
+        # Categories are created with the products that name them, not for rejected rows
+        self.seed(self.sizes[0])
+        products = self.bulk_products(0, new=1)
+        products[0]['productCategory'] = 'Created with a product'
+        products.append({'productCode': 'NEW-unnamed', 'productCategory': 'Never created'})
+        result, statements = self.execute(idscore_schema, BULK_UPSERT, {'products': products})
+        payload = result.data['bulkUpsertProducts']
+        self.assertEqual((payload['created'], [error['index'] for error in payload['errors']]), (1, [1]))
+        category = Category.objects.get(name='Created with a product')
+        self.assertEqual(Product.objects.get(productCode=products[0]['productCode']).productCategory_id, category.pk)
+        self.assertFalse(Category.objects.filter(name='Never created').exists())
+
+    def test_create_inventory(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($p: ID!, $w: ID!) { createInventory(productId: $p, warehouseId: $w, minStockLevel: "1", maxStockLevel: "9") { statusCode } }',
+            lambda: {'p': self.first_pk(Product), 'w': self.first_pk(Warehouse)},
+        )
+
+    def test_update_inventory(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($id: ID!) { updateInventory(inventoryId: $id, quantityAvailable: "7") { statusCode } }',
+            lambda: {'id': self.first_pk(Inventory)},
+        )
+
+    ## Stock ledger
+    def test_stock_at(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'query ($p: Int!, $w: Int!) { stockAt(productId: $p, warehouseId: $w) }',
+            lambda: dict(zip('pw', Inventory.objects.order_by('pk').values_list('productId', 'warehouseId').first())),
+        )
+
+    def test_stock_ledger_follows_mutations(self):
+        # The movements of every pair add up to its quantityAvailable, before and after a snapshot
+        self.seed(self.sizes[0])
+        inventory = Inventory.objects.order_by('pk').first()
+        pair = {'productId': inventory.productId_id, 'warehouseId': inventory.warehouseId_id}
+        taken = timezone.now()
+        self.assertGreater(take_snapshots(taken), 0)
+
+        result, statements = self.execute(
+            idscore_schema, 'mutation ($id: ID!) { updateInventory(inventoryId: $id, quantityAvailable: "12345") { statusCode } }', {'id': inventory.pk},
+        )
+        self.assertEqual(result.data['updateInventory']['statusCode'], 200)
+        result, statements = self.execute(
+            idscore_schema,
+            'mutation ($p: Int!, $w: Int!) { createPlacement(productId: $p, quantity: "5", placements: [{ warehouseId: $w, placementQuantity: "5", '
+            'aile: "A09", bin: "B009" }]) { statusCode } }',
+            {'p': pair['productId'], 'w': pair['warehouseId']},
+        )
+        self.assertEqual(result.data['createPlacement']['statusCode'], 200)
+
+        for productId, warehouseId, quantity in Inventory.objects.values_list('productId', 'warehouseId', 'quantityAvailable'):
+            moved = StockMovement.objects.filter(productId=productId, warehouseId=warehouseId).aggregate(total=Sum('quantity'))['total']
+            self.assertEqual(moved or 0, quantity or 0)
+        inventory.refresh_from_db()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(stock_at(at=timezone.now(), **pair), inventory.quantityAvailable)
+        self.assertEqual(len(queries), 2)
+        before = StockMovement.objects.filter(createdTime__lte=taken, **pair).aggregate(total=Sum('quantity'))['total']
+        self.assertEqual(stock_at(at=taken, **pair), before)
+
+    def test_delete_placement_updates_stock(self):
+        self.seed(self.sizes[0])
+        placement = Placement.objects.filter(rowstatus=True, placementQuantity__gt=0).order_by('pk').first()
+        pair = {'productId': placement.productId_id, 'warehouseId': placement.warehouseId_id}
+        before = Inventory.objects.get(**pair).quantityAvailable
+
+        result, statements = self.execute(
+            idscore_schema, 'mutation ($id: Int!) { deletePlacement(placementId: $id) { statusCode } }', {'id': placement.pk},
+        )
+        self.assertEqual(result.data['deletePlacement']['statusCode'], 200)
+
+        active = Placement.objects.filter(rowstatus=True, **pair).aggregate(total=Sum('placementQuantity'))['total'] or 0
+        self.assertEqual(Inventory.objects.get(**pair).quantityAvailable, active)
+        self.assertEqual(active, before - placement.placementQuantity)
+        movement = StockMovement.objects.filter(**pair).latest('pk')
+        self.assertEqual((movement.quantity, movement.reason), (-placement.placementQuantity, StockMovement.PLACEMENT))
+
+    def test_create_location(self):
+        self.assertConstantQueries(idscore_schema, 'mutation { createLocation(locationName: "L", locationAddress: "A") { statusCode } }')
+
+    def test_create_warehouse(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($id: ID!) { createWarehouse(locationId: $id, warehouseName: "W") { statusCode } }', lambda: {'id': self.first_pk(Location)}
+        )
+
+    def test_create_category(self):
+        self.assertConstantQueries(idscore_schema, 'mutation { createCategory(name: "New category") { statusCode } }')
+
+    def test_update_category(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($id: ID!) { updateCategory(categoryId: $id, name: "Renamed") { statusCode } }', lambda: {'id': self.first_pk(Category)}
+        )
+
+    def test_delete_category(self):
+        self.assertConstantQueries(
+            idscore_schema,
+            'mutation ($id: ID!) { deleteCategory(categoryId: $id) { statusCode } }', lambda: {'id': self.first_pk(Category)}
+        )
+
+    ## ERP import
+    def import_csv(self, kind, lines):
+        with CaptureQueriesContext(connection) as captured:
+            stats = import_idscore(kind, read_rows(io.StringIO('\n'.join(lines)), 'csv'), 'seed')
+        return stats, len(captured.captured_queries)
+
+    def test_import_products_and_placements(self):
+        self.seed(self.sizes[0])
+        warehouse = self.first_pk(Warehouse)
+        existing = Product.objects.order_by('pk').first()
+        reOrderPoint, category = existing.reOrderPoint, existing.productCategory_id
+
+        stats, statements = self.import_csv('products', [
+            'productCode,productName,productCategory,reOrderPoint',
+            f'{existing.productCode},Renamed,,',
+            'ERP-1,New product,ERP category,7',
+            'ERP-2,Rejected,,1.5',
+        ])
+        self.assertEqual((stats.inserted, stats.updated, stats.rejected), (1, 1, 1))
+        existing.refresh_from_db()
+        # Empty columns keep their value
+        self.assertEqual((existing.productName, existing.reOrderPoint, existing.productCategory_id), ('Renamed', reOrderPoint, category))
+        self.assertEqual(Product.objects.get(productCode='ERP-1').productCategory.name, 'ERP category')
+
+        stats, statements = self.import_csv('placements', [
+            'productCode,warehouseId,aile,bin,placementQuantity,expiryDate',
+            f'ERP-1,{warehouse},A01,B001,5,2030-01-31',
+            f'ERP-1,{warehouse},A01,B002,7,',
+            f'UNKNOWN,{warehouse},A01,B001,1,',
+        ])
+        self.assertEqual((stats.inserted, stats.updated, stats.skipped), (2, 0, 1))
+        stats, statements = self.import_csv('placements', [
+            'productCode,warehouseId,aile,bin,placementQuantity', f'ERP-1,{warehouse},A01,B001,9',
+        ])
+        self.assertEqual((stats.inserted, stats.updated), (0, 1))
+        inventory = Inventory.objects.get(productId__productCode='ERP-1', warehouseId=warehouse)
+        self.assertEqual(inventory.quantityAvailable, 16)
+        self.assertEqual(
+            list(StockMovement.objects.filter(productId__productCode='ERP-1').order_by('pk').values_list('reason', 'quantity')),
+            [(StockMovement.IMPORT, 12), (StockMovement.IMPORT, 4)],
+        )
+        self.assertEqual(Placement.objects.get(productId__productCode='ERP-1', bin='B001').batchId.quantity, 9)
+
+    def test_import_is_set_based(self):
+        self.seed(self.sizes[0])
+        warehouses = self.warehouse_pks()
+        for count in (4, 40):
+            Product.objects.filter(productCode__startswith='ERP-').delete()
+            self.import_csv('products', ['productCode,productName'] + [f'ERP-{i},Product {i}' for i in range(count)])
+            header = ['productCode,warehouseId,aile,bin,placementQuantity']
+            rows = [f'ERP-{i},{warehouses[i % 2]},A01,B{i:03d},3' for i in range(count)]
+            stats, statements = self.import_csv('placements', header + rows)
+            self.assertEqual(stats.inserted, count)
+            if count == 4:
+                baseline = statements
+        self.assertEqual(statements, baseline)
+
+    ## Catalogue export
+    def export(self, query=''):
+        response = Client().get(f'/idsdetails/export/{query}', HTTP_AUTHORIZATION=f'Bearer {get_token(self.get_user())}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_export_products(self):
+        self.seed(self.sizes[0])
+        warehouse = self.first_pk(Warehouse)
+        lines = self.export('?format=ndjson')
+        self.assertEqual(len(lines), Product.objects.filter(rowstatus=True).count())
+        self.assertEqual(json.loads(lines[0])['productId'], Product.objects.filter(rowstatus=True).order_by('pk').first().pk)
+
+        for line in self.export(f'?warehouseId={warehouse}'):
+            product = json.loads(line)
+            self.assertTrue(product['inventoryDetails'] or product['placementDetails'])
+            self.assertEqual({detail['warehouseId'] for detail in product['inventoryDetails'] + product['placementDetails']}, {warehouse})
+
+        header, *rows = self.export(f'?format=csv&warehouseId={warehouse}')
+        self.assertTrue(header.startswith('productId,productCode'))
+        self.assertTrue(rows)
+        self.assertEqual(self.export('?modifiedSince=2999-01-01'), [])
+
+    def test_export_products_queries_per_chunk(self):
+        # A chunk of products costs the same queries however many products the catalogue has
+        self.seed(self.sizes[0])
+        with CaptureQueriesContext(connection) as small:
+            self.export()
+        self.seed(self.sizes[-1])
+        with CaptureQueriesContext(connection) as large:
+            self.export()
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_export_requires_login(self):
+        self.assertEqual(Client().get('/idsdetails/export/').status_code, 401)
+
+
+# Related rows of sibling fields are fetched through the request's DataLoaders
+class LoaderTests(QueryCountMixin, TestCase):
+    INVENTORY_FIELDS = 'warehouseName productId { productName category { name } }'
+
+    def setUp(self):
+        seed_idscore(placements=40, warehouses=3, locations=1, categories=2)
+
+    def get_user(self):
+        return get_seed_user()
+
+    def table_queries(self, statements, table):
+        return [sql for sql in statements if f'FROM "{table}"' in sql]
+
+    def test_list_items_batch_their_related_rows(self):
+        result, statements = self.execute(idscore_schema, f'{{ allInventories {{ {self.INVENTORY_FIELDS} }} }}')
+        self.assertIsNone(result.errors)
+        self.assertGreater(len({item['productId']['productName'] for item in result.data['allInventories']}), 1)
+        for table in ('idscore_product', 'idscore_warehouse', 'idscore_category'):
+            self.assertEqual(len(self.table_queries(statements, table)), 1, table)
+
+    def test_sibling_root_fields_share_the_cache(self):
+        single, single_statements = self.execute(idscore_schema, f'{{ allInventories {{ {self.INVENTORY_FIELDS} }} }}')
+        both, statements = self.execute(
+            idscore_schema, f'{{ first: allInventories {{ {self.INVENTORY_FIELDS} }} second: allInventories {{ {self.INVENTORY_FIELDS} }} }}'
+        )
+        self.assertIsNone(both.errors)
+        self.assertEqual(both.data['first'], single.data['allInventories'])
+        self.assertEqual(both.data['second'], single.data['allInventories'])
+        # Only the second inventory list is read again; its products, warehouses and categories are cached
+        self.assertEqual(len(statements), len(single_statements) + 1)
+        self.assertEqual(len(self.table_queries(statements, 'idscore_product')), 1)
+
+    def test_sibling_fields_load_each_key_once(self):
+        inventories = list(Inventory.objects.order_by('pk')[:2])
+        result, statements = self.execute(
+            idscore_schema,
+            'query ($a: Int!, $b: Int!) { a: inventory(id: $a) { productId { productName } } '
+            'b: inventory(id: $b) { productId { productName } } again: inventory(id: $a) { productId { productName } } }',
+            {'a': inventories[0].pk, 'b': inventories[1].pk},
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data['a'], result.data['again'])
+        expected = 1 if inventories[0].productId_id == inventories[1].productId_id else 2
+        self.assertEqual(len(self.table_queries(statements, 'idscore_product')), expected)
+
+
+    def test_batches_are_fetched_outside_the_lock(self):
+        loader = LoaderRegistry().category
+        fetching, release = threading.Event(), threading.Event()
+        batches, results = [], {}
+
+        def in_bulk(keys):
+            batches.append(set(keys))
+            fetching.set()
+            release.wait(5)
+            return {key: Category(pk=key, name=f'Category {key}') for key in keys}
+
+        def load(name):
+            results[name] = loader.load(1).name
+
+        with mock.patch.object(Category.objects, 'in_bulk', in_bulk):
+            first = threading.Thread(target=load, args=('first',))
+            first.start()
+            self.assertTrue(fetching.wait(5))
+            # Other loaders stay usable while the query runs; the same key waits for the running batch
+            self.assertTrue(loader.registry.lock.acquire(timeout=1))
+            loader.registry.lock.release()
+            second = threading.Thread(target=load, args=('second',))
+            second.start()
+            release.set()
+            first.join(5)
+            second.join(5)
+
+        self.assertEqual(batches, [{1}])
+        self.assertEqual(results, {'first': 'Category 1', 'second': 'Category 1'})
+
+
+# Keyset pages of the categories connection, walked in both directions
+class PaginationTests(QueryCountMixin, TestCase):
+    QUERY = (
+        'query ($first: Int, $after: String, $last: Int, $before: String, $orderBy: String) '
+        '{ categories(first: $first, after: $after, last: $last, before: $before, orderBy: $orderBy) '
+        '{ edges { node { name } } pageInfo { startCursor endCursor hasNextPage hasPreviousPage } } }'
+    )
+
+    def setUp(self):
+        Category.objects.bulk_create(Category(name=f'Category {number:03}') for number in range(10))
+        self.names = [f'Category {number:03}' for number in range(10)]
+
+    def get_user(self):
+        return get_seed_user()
+
+    def page(self, **variables):
+        result, _ = self.execute(idscore_schema, self.QUERY, variables)
+        self.assertIsNone(result.errors)
+        connection = result.data['categories']
+        return [edge['node']['name'] for edge in connection['edges']], connection['pageInfo']
+
+    def test_first_and_after_walk_forwards(self):
+        names, info = self.page(first=4, orderBy='name')
+        self.assertEqual(names, self.names[:4])
+        self.assertEqual((info['hasPreviousPage'], info['hasNextPage']), (False, True))
+
+        names, info = self.page(first=4, after=info['endCursor'], orderBy='name')
+        self.assertEqual(names, self.names[4:8])
+        self.assertEqual((info['hasPreviousPage'], info['hasNextPage']), (True, True))
+
+        names, info = self.page(first=4, after=info['endCursor'], orderBy='name')
+        self.assertEqual(names, self.names[8:])
+        self.assertEqual((info['hasPreviousPage'], info['hasNextPage']), (True, False))
+
+    def test_last_and_before_walk_backwards(self):
+        names, info = self.page(last=4, orderBy='name')
+        self.assertEqual(names, self.names[6:])
+        self.assertEqual((info['hasPreviousPage'], info['hasNextPage']), (True, False))
+
+        names, info = self.page(last=4, before=info['startCursor'], orderBy='name')
+        self.assertEqual(names, self.names[2:6])
+        self.assertEqual((info['hasPreviousPage'], info['hasNextPage']), (True, True))
+
+        names, info = self.page(last=4, before=info['startCursor'], orderBy='name')
+        self.assertEqual(names, self.names[:2])
+        self.assertEqual((info['hasPreviousPage'], info['hasNextPage']), (False, True))
+
+    def test_after_and_before_bound_a_range(self):
+        _, start = self.page(first=2, orderBy='name')
+        _, end = self.page(last=2, orderBy='name')
+        names, _ = self.page(first=100, after=start['endCursor'], before=end['startCursor'], orderBy='name')
+        self.assertEqual(names, self.names[2:8])
+
+    def test_descending_order(self):
+        names, info = self.page(first=3, orderBy='-name')
+        self.assertEqual(names, self.names[::-1][:3])
+        names, _ = self.page(first=3, after=info['endCursor'], orderBy='-name')
+        self.assertEqual(names, self.names[::-1][3:6])
+
+    def test_page_size_is_clamped(self):
+        Category.objects.bulk_create(Category(name=f'Extra {number:04}') for number in range(MAX_PAGE_SIZE))
+        names, info = self.page(first=MAX_PAGE_SIZE + 100)
+        self.assertEqual(len(names), MAX_PAGE_SIZE)
+        self.assertTrue(info['hasNextPage'])
+        names, info = self.page(last=MAX_PAGE_SIZE + 100)
+        self.assertEqual(len(names), MAX_PAGE_SIZE)
+        self.assertTrue(info['hasPreviousPage'])
+
+    def test_invalid_arguments(self):
+        for variables, message in (
+            ({'first': 2, 'last': 2}, "Pass either 'first' or 'last', not both."),
+            ({'first': -1}, "'first' must be a non-negative integer."),
+            ({'first': 2, 'after': 'not-a-cursor'}, "Invalid cursor 'not-a-cursor'."),
+            ({'first': 2, 'orderBy': 'image'}, "Cannot order by 'image'."),
+        ):
+            with self.subTest(variables=variables):
+                result, _ = self.execute(idscore_schema, self.QUERY, variables)
+                self.assertEqual([error.message for error in result.errors], [message])
+
+
+class CleanQuantitiesMigrationTests(SimpleTestCase):
+
+    def test_to_integer(self):
+        to_integer = importlib.import_module('idscore.migrations.0005_clean_quantities').to_integer
+        cases = {
+            '12': '12', ' 12 ': '12', '12.0': '12', '-3': '-3',
+            '12.5': None, '0.1': None, '': None, '  ': None, None: None, 'twelve': None, 'NaN': None, 'Infinity': None,
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(to_integer(value), expected)
+
+
+# Row locks only exist on Postgres; SQLite serializes writers instead
+@skipUnless(connection.vendor == 'postgresql', "needs Postgres row locks")
+class ConcurrentPlacementTests(TransactionTestCase):
+
+    def setUp(self):
+        seed_idscore(40, warehouses=3, locations=1, categories=2)
+        self.pair = Placement.objects.order_by('pk').values_list('productId', 'warehouseId').first()
+
+    def place(self, barrier, errors):
+        # createPlacement's writes on a connection of its own; both transactions insert before either recomputes
+        productId, warehouseId = self.pair
+        try:
+            with transaction.atomic():
+                batch = Batch.objects.create(productId_id=productId, quantity=5, createdUser='t', modifiedUser='t')
+                Placement.objects.create(
+                    batchId=batch, productId_id=productId, warehouseId_id=warehouseId, placementQuantity=5,
+                    aile='C01', bin='D001', createdUser='t', modifiedUser='t',
+                )
+                barrier.wait(timeout=10)
+                recompute_inventory({self.pair}, 't')
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_concurrent_placements_of_a_product(self):
+        barrier, errors = threading.Barrier(2), []
+        threads = [threading.Thread(target=self.place, args=(barrier, errors)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+
+        # Neither a deadlock nor a total computed without the other transaction's placement
+        self.assertEqual(errors, [])
+        productId, warehouseId = self.pair
+        total = Placement.objects.filter(productId=productId, warehouseId=warehouseId).aggregate(total=Sum('placementQuantity'))['total']
+        self.assertEqual(Inventory.objects.get(productId=productId, warehouseId=warehouseId).quantityAvailable, total)
+        moved = StockMovement.objects.filter(productId=productId, warehouseId=warehouseId).aggregate(total=Sum('quantity'))['total']
+        self.assertEqual(moved, total)
@@ -1,3 +1,155 @@
-from django.shortcuts import render
+import csv
+import datetime
+import json
 
-# Create your views here.
+from django.contrib.auth import authenticate
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef, Q
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import require_GET
+from graphql_jwt.exceptions import JSONWebTokenError
+
+from .assemblers import product_queryset, product_response
+from .models import Inventory, Placement, Product
+
+# Products fetched (and their inventories / placements prefetched) per round trip
+EXPORT_CHUNK_SIZE = 500
+
+CSV_HEADER = (
+    'productId', 'productCode', 'productName', 'categoryName', 'brand', 'reOrderPoint', 'modifiedTime',
+    'warehouseId', 'warehouseName', 'quantityAvailable', 'minStockLevel', 'maxStockLevel', 'placedQuantity', 'bins',
+)
+
+
+## Streaming catalogue export
+class Echo:
+    # File-like object for csv.writer that hands back each line instead of storing it
+    def write(self, value):
+        return value
+
+
+def parse_int(value, name):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got '{value}'.")
+
+
+def parse_since(value):
+    if value is None:
+        return None
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"modifiedSince must be an ISO date or datetime, got '{value}'.")
+        since = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def export_queryset(warehouseId=None, categoryId=None, since=None):
+    """
+    Active products in id order, with only the inventories and placements of
+    `warehouseId` when given.
+
+    Args:
+    - warehouseId: Only products with an inventory or active placement there.
+    - categoryId: Only products of this category.
+    - since: Only products whose row, inventories or placements changed since then.
+    """
+    products = Product.objects.filter(rowstatus=True)
+    if categoryId is not None:
+        products = products.filter(productCategory=categoryId)
+    if warehouseId is not None:
+        products = products.filter(
+            Exists(Inventory.objects.filter(productId=OuterRef('pk'), warehouseId=warehouseId))
+            | Exists(Placement.objects.filter(productId=OuterRef('pk'), warehouseId=warehouseId, rowstatus=True))
+        )
+    if since is not None:
+        products = products.filter(
+            Q(modifiedTime__gte=since)
+            | Exists(Inventory.objects.filter(productId=OuterRef('pk'), modifiedTime__gte=since))
+            | Exists(Placement.objects.filter(productId=OuterRef('pk'), modifiedTime__gte=since))
+        )
+    return product_queryset(products.order_by('productId'), warehouseId=warehouseId)
+
+
+def csv_rows(response):
+    # One row per warehouse the product is stocked or placed in, or one row without a warehouse
+    inventories = {detail['warehouseId']: detail for detail in response['inventoryDetails']}
+    placements = {detail['warehouseId']: detail for detail in response['placementDetails']}
+    product = [
+        response['productId'], response['productCode'], response['productName'], response['category_name'],
+        response['brand'], response['reOrderPoint'], response['modifiedTime'].isoformat(),
+    ]
+    for warehouseId in sorted(set(inventories) | set(placements)) or [None]:
+        inventory = inventories.get(warehouseId, {})
+        placed = placements.get(warehouseId, {'placements': []})
+        yield product + [
+            warehouseId,
+            inventory.get('warehouseName') or placed.get('warehouseName'),
+            inventory.get('quantityAvailable'),
+            inventory.get('minStockLevel'),
+            inventory.get('maxStockLevel'),
+            sum(placement['placementQuantity'] for placement in placed['placements']),
+            ' '.join(f"{placement['aile']}/{placement['bin']}" for placement in placed['placements']),
+        ]
+
+
+def ndjson_lines(products):
+    for product in products:
+        yield json.dumps(product_response(product), cls=DjangoJSONEncoder) + '\n'
+
+
+def csv_lines(products):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for product in products:
+        for row in csv_rows(product_response(product)):
+            yield writer.writerow(row)
+
+
+@require_GET
+def export_products(request):
+    """
+    Streams the active catalogue as NDJSON (one allProducts-shaped object
+    per product) or CSV (one row per product and warehouse).
+
+    Products are read with a server-side cursor where the database has one,
+    EXPORT_CHUNK_SIZE at a time with their inventories and placements
+    prefetched per chunk, so memory does not grow with the catalogue.
+
+    Query parameters: format (ndjson or csv), warehouseId, categoryId and
+    modifiedSince (ISO date or datetime).
+    """
+    try:
+        user = authenticate(request=request)
+    except JSONWebTokenError as e:
+        return JsonResponse({'message': str(e)}, status=401)
+    if user is None:
+        return JsonResponse({'message': "You do not have permission to perform this action"}, status=401)
+
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return HttpResponseBadRequest("format must be ndjson or csv.")
+    try:
+        products = export_queryset(
+            warehouseId=parse_int(request.GET.get('warehouseId'), 'warehouseId'),
+            categoryId=parse_int(request.GET.get('categoryId'), 'categoryId'),
+            since=parse_since(request.GET.get('modifiedSince')),
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    if fmt == 'csv':
+        response = StreamingHttpResponse(csv_lines(products), content_type='text/csv')
+    else:
+        response = StreamingHttpResponse(ndjson_lines(products), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="products-{timezone.now():%Y%m%d%H%M%S}.{fmt}"'
+    return response